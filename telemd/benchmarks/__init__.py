@@ -0,0 +1,11 @@
+"""
+Benchmarks for the telemd hot path.
+
+Times each pipeline stage in isolation on synthetic traffic and the whole
+CAN processing loop end to end; see run.py.
+"""
+
+from .harness import compare, measure
+from .traffic import synthetic_frames, write_capture
+
+__all__ = ['compare', 'measure', 'synthetic_frames', 'write_capture']
@@ -0,0 +1,107 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure(func, ops=1, repeat=7, min_time=0.2):
+    """Time func() over `repeat` runs and return per-op timings (median and best).
+
+    The number of calls per run is calibrated so each run lasts at least
+    `min_time`; `ops` is how many operations one call performs (e.g. frames
+    in a batch), so results are always per single operation.
+    """
+    func()  # Warm up caches and lazy initialisation
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed * 1.2)))
+
+    runs = [elapsed]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append(time.perf_counter() - start)
+    per_op = [run / (number * ops) for run in runs]
+    return {
+        "ns_per_op": statistics.median(per_op) * 1e9,
+        "best_ns_per_op": min(per_op) * 1e9,
+        "ops_per_s": 1.0 / statistics.median(per_op),
+        "calls": number * repeat,
+    }
+
+
+def environment():
+    """Where the numbers came from, so baselines from different machines aren't confused"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "commit": commit,
+    }
+
+
+def save(path, results):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(results, baseline, threshold=0.10, key="best_ns_per_op"):
+    """[(name, baseline ns, current ns, change)] for benchmarks in both; change > threshold is a regression.
+
+    Compares best runs by default: scheduling noise only ever adds time, so
+    the fastest run is the steadiest estimate of what the code costs.
+    """
+    rows = []
+    for name in sorted(results):
+        if name in baseline:
+            old, new = baseline[name][key], results[name][key]
+            rows.append((name, old, new, new / old - 1.0 if old else 0.0))
+    return rows, [row for row in rows if row[3] > threshold]
+
+
+def format_ns(ns):
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} µs"
+    return f"{ns:.0f} ns"
+
+
+def print_results(results):
+    width = max((len(name) for name in results), default=0)
+    for name in sorted(results):
+        result = results[name]
+        line = f"{name:<{width}}  {format_ns(result['ns_per_op']):>10}/op  {result['ops_per_s']:>12,.0f} op/s"
+        if "note" in result:
+            line += f"  {result['note']}"
+        print(line)
+
+
+def print_comparison(rows, threshold):
+    width = max((len(row[0]) for row in rows), default=0)
+    for name, old, new, change in rows:
+        flag = "  REGRESSION" if change > threshold else ("  faster" if change < -threshold else "")
+        print(f"{name:<{width}}  {format_ns(old):>10} -> {format_ns(new):>10}  {change:+7.1%}{flag}")
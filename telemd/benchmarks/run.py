@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark the telemd hot path.
+
+    python -m benchmarks.run                          # everything, printed
+    python -m benchmarks.run --json results.json      # also save machine-readable results
+    python -m benchmarks.run --compare baseline.json  # exit 1 if anything got >10% slower
+    python -m benchmarks.run --stage decode --stage e2e
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import compare, load, print_comparison, print_results, save
+from benchmarks.stages import STAGES, run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark decode, cache update, snapshot/encode, "
+                                                 "WebSocket frame build and the full pipeline.")
+    parser.add_argument("--stage", action="append", choices=list(STAGES) + ["e2e"],
+                        help="Run only this stage (repeatable); default is all of them")
+    parser.add_argument("--json", metavar="PATH", help="Write results as JSON (usable as a --compare baseline)")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a baseline saved with --json")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent slowdown counted as a regression (default: 10)")
+    parser.add_argument("--e2e-seconds", type=float, default=10.0,
+                        help="Seconds of synthetic traffic replayed end to end (default: 10)")
+    args = parser.parse_args(argv)
+
+    results = run(args.stage, args.e2e_seconds)
+    print_results(results)
+    if args.json:
+        save(args.json, results)
+        print(f"Saved results to {args.json}")
+
+    if args.compare:
+        threshold = args.threshold / 100
+        rows, regressions = compare(results, load(args.compare), threshold)
+        print(f"\nCompared with {args.compare}:")
+        print_comparison(rows, threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:g}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
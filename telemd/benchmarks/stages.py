@@ -0,0 +1,382 @@
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import core  # noqa: F401  (imports core before networking, which needs it first)
+from core import backend
+from core.backend import build_decode_plan, build_history
+from core.broadcaster import TelemetryBroadcaster
+from core.field_mappings import CAN_DECODERS, CELL_TEMPERATURE_IDS, CELL_VOLTAGE_IDS, CellDataAggregator
+from core.shared_values import SharedValueReader, SharedValueTable
+from core.value_store import SlotStore, WindowAggregator, build_field_layout
+from data_logging.logger import CSVTimeSeriesLogger, LatestValuesCache
+from interfaces.frame_ring import FrameRing
+from interfaces.interface import CANInterface
+from networking.client import MQTTManager, TelemetryCache
+from protobuf.encoder import TelemetryEncoder
+
+from benchmarks.harness import measure
+from benchmarks.traffic import FULL_BUS_FRAME_RATE, synthetic_frames, write_capture
+
+
+class _PublishResult:
+    rc = 0
+    mid = 0
+
+
+class NullMQTTClient:
+    """Accepts every publish without a network, so only telemd's own cost is measured"""
+
+    def __init__(self):
+        self.published = 0
+        self.bytes = 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published += 1
+        self.bytes += len(payload or b"")
+        return _PublishResult()
+
+    def is_connected(self):
+        return True
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+class OfflineMQTTManager(MQTTManager):
+    """MQTTManager that is always connected to a NullMQTTClient"""
+
+    def initialize(self):
+        self.client = NullMQTTClient()
+        self.connected = True
+        return True
+
+
+class FiniteReplayInterface(CANInterface):
+    """CANInterface whose replay ends process_can_messages once the capture runs out.
+
+    Records when the first and last batch were handed out, so setup and
+    shutdown stay out of the measured frame rate.
+    """
+
+    runs = []  # (frames, seconds) of every finished replay
+
+    async def _batches(self, max_frames=512, poll_interval=0.01):
+        frames = 0
+        start = time.perf_counter()
+        while True:
+            batch = self.recv_batch(max_frames, 0)
+            if not batch:
+                break
+            frames += len(batch)
+            yield batch
+            await asyncio.sleep(0)
+        FiniteReplayInterface.runs.append((frames, time.perf_counter() - start))
+
+
+@contextlib.contextmanager
+def scratch_directory():
+    """Run inside a temporary directory so logs/, spool/ and captures/ don't land in the tree"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="telemd-bench-") as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+
+def _frames_by_kind(frames):
+    decoded = [frame for frame in frames if frame.arbitration_id in CAN_DECODERS]
+    voltages = [frame for frame in frames if frame.arbitration_id in CELL_VOLTAGE_IDS]
+    temperatures = [frame for frame in frames if frame.arbitration_id in CELL_TEMPERATURE_IDS]
+    return decoded, voltages, temperatures
+
+
+def _filled_store(frames):
+    """Store with every decoded field and cell set, as after a few seconds of driving"""
+    store = SlotStore(build_field_layout())
+    plan = build_decode_plan(store.layout)
+    for frame in frames:
+        if frame.arbitration_id in plan:
+            decoder, targets = plan[frame.arbitration_id]
+            for (_, slot), value in zip(targets, decoder.decode(frame.data)):
+                store.set(slot, value, frame.timestamp)
+    for slot in range(len(store.layout)):
+        if not store.stamps[slot]:
+            store.set(slot, 3.7, frames[-1].timestamp)
+    return store
+
+
+def bench_decode(frames):
+    """Frame decode per CAN ID, the whole decoded mix, and the cell aggregators"""
+    results = {}
+    decoded, voltages, temperatures = _frames_by_kind(frames)
+    for can_id, decoder in CAN_DECODERS.items():
+        data = next((frame.data for frame in decoded if frame.arbitration_id == can_id), bytes(8))
+        results[f"decode.0x{can_id:03X}"] = measure(lambda: decoder.decode(data))
+
+    def decode_mix():
+        for frame in decoded:
+            CAN_DECODERS[frame.arbitration_id].decode(frame.data)
+    results["decode.mix"] = measure(decode_mix, len(decoded))
+
+    aggregator = CellDataAggregator()
+
+    def cell_voltages():
+        for frame in voltages:
+            aggregator.process_voltage(frame.arbitration_id, frame.data)
+
+    def cell_temperatures():
+        for frame in temperatures:
+            aggregator.process_temperature(frame.arbitration_id, frame.data)
+    results["decode.cells_v"] = measure(cell_voltages, len(voltages))
+    results["decode.cells_temp"] = measure(cell_temperatures, len(temperatures))
+    return results
+
+
+def bench_cache_update(frames):
+    """Writing decoded values into the shared store (per frame), alone and with window/history"""
+    results = {}
+    decoded, _, _ = _frames_by_kind(frames)
+    store = SlotStore(build_field_layout())
+    plan = build_decode_plan(store.layout)
+    batch = [(plan[frame.arbitration_id][1], plan[frame.arbitration_id][0].decode(frame.data))
+             for frame in decoded]
+    values, stamps = store.values, store.stamps
+    window = WindowAggregator(len(store.layout))
+    history = build_history(store.layout)
+    window_add, history_add = window.add, history.add
+    now = time.time()
+
+    def store_only():
+        for targets, decoded_values in batch:
+            for (_, slot), value in zip(targets, decoded_values):
+                values[slot] = value
+                stamps[slot] = now
+
+    def store_window_history():
+        for targets, decoded_values in batch:
+            for (_, slot), value in zip(targets, decoded_values):
+                values[slot] = value
+                stamps[slot] = now
+                window_add(slot, value)
+                history_add(slot, value, now)
+    results["cache.store_write"] = measure(store_only, len(batch))
+    results["cache.store_window_history"] = measure(store_window_history, len(batch))
+
+    telemetry_cache = TelemetryCache(OfflineMQTTManager(), store=store)
+    latest_values = LatestValuesCache(store)
+    results["cache.telemetry_update_value"] = measure(
+        lambda: telemetry_cache.update_value(0x220, "pack.hv_pack_v", 400.0, timestamp=now))
+    results["cache.latest_update_value"] = measure(
+        lambda: latest_values.update_value("pack.hv_pack_v", 400.0, timestamp=now))
+
+    slot = store.layout.slot("dynamics.flw_speed")
+    for i in range(history.capacities[slot]):
+        history.add(slot, float(i), now - 10 + i * 0.01)
+    results["history.window_5s"] = measure(lambda: history.window(slot, now - 5))
+    return results
+
+
+def bench_snapshot_encode(frames):
+    """Snapshot + protobuf encode + MQTT publish of a store where every field changed"""
+    results = {}
+    store = _filled_store(frames)
+    fields = {field_name: value for field_name, (value, _) in store.fields().items()}
+    encoder = TelemetryEncoder()
+    results["protobuf.encode_all_fields"] = measure(lambda: encoder.encode(fields, 1, time.time()))
+
+    mqtt_manager = OfflineMQTTManager()
+    mqtt_manager.initialize()
+    window = WindowAggregator(len(store.layout))
+    telemetry_cache = TelemetryCache(mqtt_manager, store=store, window=window)
+    stamps = store.stamps
+    telemetry_data = {"timestamp": time.time(), "packet_id": 1, "fields": fields}
+    results["mqtt.publish"] = measure(lambda: mqtt_manager.publish(telemetry_data, None))
+
+    def touch_all():
+        # Every slot newer than the last publish, two samples each for the window stats
+        now = time.time()
+        for slot in range(len(stamps)):
+            stamps[slot] = now
+            window.add(slot, 1.0)
+            window.add(slot, 2.0)
+
+    def snapshot():
+        telemetry_cache.take_snapshot(time.time())
+
+    def snapshot_publish():
+        touch_all()
+        telemetry_cache.publish_snapshot(telemetry_cache.take_snapshot(time.time()))
+
+    results["mqtt.take_snapshot"] = measure(snapshot)
+    touch_cost = measure(touch_all)["ns_per_op"]
+    result = measure(snapshot_publish)
+    result["ns_per_op"] -= touch_cost
+    result["best_ns_per_op"] -= touch_cost
+    result["ops_per_s"] = 1e9 / result["ns_per_op"]
+    result["note"] = "every field changed, with window stats"
+    results["mqtt.snapshot_publish"] = result
+    return results
+
+
+def bench_websocket(frames):
+    """WebSocket frame build: full JSON/msgpack frames and a small delta"""
+    results = {}
+    store = _filled_store(frames)
+    broadcaster = TelemetryBroadcaster(LatestValuesCache(store))
+    slots = [store.layout.slot(name) for name in ("dynamics.flw_speed", "dynamics.frw_speed", "pack.hv_c")]
+
+    def full(format):
+        def build():
+            broadcaster._advance()
+            broadcaster.encode(format)
+        return build
+
+    def delta():
+        base = broadcaster.seq
+        now = time.time()
+        for slot in slots:
+            store.set(slot, now % 100, now)
+        broadcaster._advance()
+        broadcaster.encode("json", base)
+
+    results["websocket.json_full"] = measure(full("json"))
+    results["websocket.msgpack_full"] = measure(full("msgpack"))
+    results["websocket.json_delta"] = measure(delta)
+    return results
+
+
+def bench_csv(frames):
+    """CSV logging: log_value per value (queueing only) and one _flush_buffer of a full buffer"""
+    results = {}
+    with scratch_directory():
+        logger = CSVTimeSeriesLogger(flush_interval=3600)
+        now = time.time()
+        results["csv.log_value"] = measure(lambda: logger.log_value("pack.hv_pack_v", 401.25, now))
+        rows = [(now + i * 0.001, "pack.hv_pack_v", "401.25") for i in range(logger.buffer_size)]
+
+        def flush():
+            logger.buffer.extend(rows)
+            logger._flush_buffer()
+        result = measure(flush)
+        result["note"] = f"{logger.buffer_size} rows per call"
+        results["csv.flush_buffer"] = result
+        logger.shutdown()
+    return results
+
+
+def bench_frame_ring(frames):
+    """Ingest hand-off through the shared-memory frame ring: write (ingest process side) and read"""
+    results = {}
+    ring = FrameRing(capacity=65536, create=True)
+    try:
+        batch = frames[:512]
+        results["ring.write"] = measure(lambda: ring.write(batch), len(batch))
+
+        def write_read():
+            ring.write(batch)
+            ring.read(len(batch))
+        ring.read_index = ring.write_index
+        results["ring.write_read"] = measure(write_read, len(batch))
+    finally:
+        ring.close()
+    return results
+
+
+def bench_shared_values(frames):
+    """Shared-memory value table: one publish of the whole store (per batch) and reader snapshots"""
+    results = {}
+    store = _filled_store(frames)
+    table = SharedValueTable(store.layout, f"telemd_bench_{os.getpid()}")
+    reader = SharedValueReader(table.name)
+    try:
+        results["shared.publish"] = measure(lambda: table.publish(store.values, store.stamps))
+        results["shared.read"] = measure(reader.read)
+        results["shared.get"] = measure(lambda: reader.get("pack.hv_pack_v"))
+    finally:
+        reader.close()
+        table.close()
+    return results
+
+
+def _run_end_to_end(path, overrides):
+    saved = {name: getattr(backend, name) for name in overrides}
+    saved_interface, saved_manager = backend.CANInterface, backend.MQTTManager
+    try:
+        for name, value in overrides.items():
+            setattr(backend, name, value)
+        backend.CAN_REPLAY_FILE = path
+        backend.CAN_REPLAY_SPEED = 0
+        backend.SHARED_VALUES_NAME = f"telemd_bench_{os.getpid()}"  # Not the running backend's table
+        backend.CANInterface = FiniteReplayInterface
+        backend.MQTTManager = OfflineMQTTManager
+        asyncio.run(backend.process_can_messages())
+    finally:
+        for name, value in saved.items():
+            setattr(backend, name, value)
+        backend.CANInterface, backend.MQTTManager = saved_interface, saved_manager
+    return FiniteReplayInterface.runs.pop()
+
+
+def bench_end_to_end(seconds=10.0, repeat=3):
+    """process_can_messages over a synthetic capture replayed as fast as it is consumed"""
+    variants = {
+        "e2e.default": {},
+        "e2e.no_csv": {"CSV_LOGGING_ENABLED": False},
+        "e2e.minimal": {"CSV_LOGGING_ENABLED": False, "HISTORY_ENABLED": False, "TRIGGERS_ENABLED": False,
+                        "MQTT_AGGREGATE_ENABLED": False, "MQTT_SPOOL_ENABLED": False, "BUS_STATS_ENABLED": False,
+                        "SHARED_VALUES_ENABLED": False},
+    }
+    results = {}
+    with scratch_directory() as directory:
+        path = os.path.join(directory, "synthetic.bin")
+        count = write_capture(path, seconds)
+        for name, overrides in variants.items():
+            runs = [_run_end_to_end(path, overrides) for _ in range(repeat)]
+            per_frame = [elapsed / frames for frames, elapsed in runs if frames]
+            median = statistics.median(per_frame)
+            results[name] = {
+                "ns_per_op": median * 1e9,
+                "best_ns_per_op": min(per_frame) * 1e9,
+                "ops_per_s": 1.0 / median,
+                "calls": repeat,
+                "frames": count,
+                "full_bus_load": 1.0 / median / FULL_BUS_FRAME_RATE,
+                "note": f"{1.0 / median / FULL_BUS_FRAME_RATE:.1f}x a full bus ({FULL_BUS_FRAME_RATE} frames/s)",
+            }
+    return results
+
+
+STAGES = {
+    "decode": bench_decode,
+    "cache": bench_cache_update,
+    "snapshot": bench_snapshot_encode,
+    "websocket": bench_websocket,
+    "csv": bench_csv,
+    "ring": bench_frame_ring,
+    "shared": bench_shared_values,
+}
+
+
+def run(stages=None, e2e_seconds=10.0, seed=2025):
+    """Run the selected stages ("e2e" for end to end) and return {benchmark: result}"""
+    stages = list(STAGES) + ["e2e"] if not stages else stages
+    frames = synthetic_frames(2.0, seed=seed)
+    results = {}
+    for stage in stages:
+        # telemd logs with print(); keep that out of the terminal (it still costs what it costs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if stage == "e2e":
+                results.update(bench_end_to_end(e2e_seconds))
+            else:
+                results.update(STAGES[stage](frames))
+    return results
@@ -0,0 +1,57 @@
+import random
+
+from core.field_mappings import CAN_DECODERS, CELL_FRAME, CELL_TEMPERATURE_IDS, CELL_VOLTAGE_IDS
+from interfaces.recorder import RawFrame, write_frames
+
+FULL_BUS_FRAME_RATE = 8000  # frames/s of 8-byte standard frames on a saturated 1 Mbit/s bus
+
+# Expected Hz per CAN ID; anything decoded but not listed runs at DEFAULT_RATE
+FRAME_RATES = {
+    0x220: 100, 0x420: 10, 0x230: 10, 0x330: 10, 0x600: 10, 0x601: 10,
+    0x202: 10, 0x204: 10,
+}
+DEFAULT_RATE = 100
+CELL_RATE = 10
+
+
+def frame_rates():
+    """{can_id: Hz} for every ID telemd decodes plus the cell and shutdown leg frames"""
+    rates = {can_id: FRAME_RATES.get(can_id, DEFAULT_RATE) for can_id in CAN_DECODERS}
+    rates.update({can_id: CELL_RATE for can_id in CELL_VOLTAGE_IDS})
+    rates.update({can_id: CELL_RATE for can_id in CELL_TEMPERATURE_IDS})
+    rates[0x202] = FRAME_RATES[0x202]
+    rates[0x204] = FRAME_RATES[0x204]
+    return rates
+
+
+def payload(can_id, rng):
+    """Random data that stays inside normal limits where telemd checks them"""
+    if can_id in CELL_VOLTAGE_IDS:
+        return CELL_FRAME.pack(*(rng.randint(35000, 40000) for _ in range(4)))  # 3.5-4.0 V
+    if can_id in CELL_TEMPERATURE_IDS:
+        return CELL_FRAME.pack(*(rng.randint(200, 400) for _ in range(4)))  # 20-40 °C
+    if can_id == 0x420:
+        return b'\x01' + bytes(7)  # Contactor closed throughout
+    if can_id == 0x202:
+        return bytes(2) + b'\x01' * 6  # Shutdown legs closed
+    if can_id == 0x204:
+        return b'\x01' * 6 + bytes(2)
+    return bytes(rng.getrandbits(8) for _ in range(8))
+
+
+def synthetic_frames(seconds=10.0, rates=None, seed=2025, start=1_700_000_000.0):
+    """RawFrames of a `seconds` long drive, every ID at its rate, in timestamp order"""
+    rng = random.Random(seed)
+    rates = frame_rates() if rates is None else rates
+    schedule = []
+    for can_id, rate in rates.items():
+        phase = rng.random() / rate
+        for i in range(int(seconds * rate)):
+            schedule.append((start + phase + i / rate, can_id))
+    schedule.sort()
+    return [RawFrame(timestamp, can_id, payload(can_id, rng)) for timestamp, can_id in schedule]
+
+
+def write_capture(path, seconds=10.0, rates=None, seed=2025):
+    """Write synthetic traffic as a recorder capture file; returns the frame count"""
+    return write_frames(path, synthetic_frames(seconds, rates, seed))
@@ -1,10 +1,19 @@
 """
 Core telemetry system components.
 
-Contains the main orchestrator and CAN field mappings.
+Contains the main orchestrator, CAN field mappings, the latest-value store and its shared-memory table, field history, fault triggers and runtime metrics.
 """
 
 from .backend import main
-from .field_mappings import CAN_MAPPING
+from .field_mappings import CAN_MAPPING, CAN_SIGNALS, CAN_DECODERS
+from .history import SlotHistory
+from .metrics import REGISTRY, Counter, Gauge, Histogram, MetricsRegistry, serve_metrics
+from .shared_values import SharedValueReader, SharedValueTable
+from .triggers import FieldTrigger, FrameTrigger, TriggerEngine
+from .value_store import FieldLayout, SlotStore, WindowAggregator, build_field_layout, merge_windows
 
-__all__ = ['main', 'process_can_messages', 'CAN_MAPPING'] 
\ No newline at end of file
+__all__ = ['main', 'process_can_messages', 'CAN_MAPPING', 'CAN_SIGNALS', 'CAN_DECODERS',
+           'FieldLayout', 'SlotStore', 'WindowAggregator', 'build_field_layout', 'merge_windows',
+           'SlotHistory', 'FieldTrigger', 'FrameTrigger', 'TriggerEngine',
+           'REGISTRY', 'Counter', 'Gauge', 'Histogram', 'MetricsRegistry', 'serve_metrics',
+           'SharedValueReader', 'SharedValueTable'] 
\ No newline at end of file
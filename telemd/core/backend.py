@@ -1,34 +1,241 @@
 import asyncio
 from websockets import serve
-from websockets.exceptions import ConnectionClosedOK
+from websockets.exceptions import ConnectionClosed, ConnectionClosedOK
 import time
 import os
 import json
-import statistics
 from typing import Optional
 import requests
 
 # Import our modular components
 from interfaces.interface import CANInterface
-from networking.client import MQTTManager, TelemetryCache
+from interfaces.bus_stats import BusStatistics
+from networking.client import FRAME_TO_UPLINK_SECONDS, MQTTManager, TelemetryCache
+from networking.spool import DiskSpool
+from networking.batch import PacketBatcher
+from networking.publisher import TelemetryPublisher
+from networking.captures import CaptureQueue
 from data_logging.logger import CSVTimeSeriesLogger, LatestValuesCache
-from core.field_mappings import CAN_MAPPING, get_protobuf_field_and_index, CellDataAggregator
+from core.field_mappings import (
+    CAN_DECODERS, CELL_TEMPERATURE_IDS, CELL_VOLTAGE_IDS, CellDataAggregator, get_protobuf_field_and_index,
+)
+from core.value_store import SlotStore, WindowAggregator, build_field_layout
+from core.shared_values import SharedValueTable
+from core.history import SlotHistory
+from core.triggers import TriggerEngine, default_triggers
+from core.broadcaster import TelemetryBroadcaster, select_subprotocol
+from core.metrics import REGISTRY, exponential_buckets, serve_metrics
 
 # Configuration
 MQTT_PUBLISH_RATE = 10  # Hz
 MQTT_PUBLISH_INTERVAL = 1.0 / MQTT_PUBLISH_RATE  # ~100ms
+MQTT_PUBLISH_QUEUE = 16  # Snapshots waiting for the publisher thread; oldest dropped beyond this
+# Also send count/min/max/mean of every signal sampled more than once per publish window
+# (AngeliqueSensorData.field_stats; servers that predate it simply skip the field)
+MQTT_AGGREGATE_ENABLED = True
+MQTT_SPOOL_ENABLED = True  # Keep packets on disk while the broker is unreachable
+MQTT_SPOOL_DIR = "spool"
+MQTT_SPOOL_MAX_BYTES = 256 * 1024 * 1024  # Oldest data is dropped beyond this
+MQTT_BACKFILL_RATE = 50  # packets/s drained from the spool once the broker is back
+# Batched uplink: several snapshots per compressed envelope on MQTT_BATCH_TOPIC.
+# Needs a server that unpacks networking.batch envelopes, so it is off by default.
+MQTT_BATCH_ENABLED = False
+MQTT_BATCH_TOPIC = "angelique/batch"
+MQTT_BATCH_MAX_PACKETS = 10  # Flush after this many snapshots...
+MQTT_BATCH_MAX_DELAY = 1.0  # ...or once the oldest has waited this long (s)
+MQTT_BATCH_CODEC = "zlib"  # "zlib", "zstd" (if zstandard is installed) or "none"
+MQTT_BATCH_LEVEL = 6
+MQTT_CAPTURE_TOPIC = "angelique/capture"  # Fault captures go to <topic>/<file name>
+MQTT_HISTORY_TOPIC = "angelique/history"  # Replies to history requests on server-communication
+MQTT_HISTORY_MAX_BYTES = 256 * 1024  # Larger history replies are refused with an error over the uplink
+CAN_BATCH_SIZE = 512  # Max frames handled per wakeup of the CAN reader
+CSV_LOGGING_ENABLED = True  # Append every decoded value to logs/telemetry_history_*.csv
+BINARY_LOGGING_ENABLED = True  # Also keep per-field binary columns next to the CSV
+WEBSOCKET_ENABLED = True  # Serve live telemetry to dashboards
+WEBSOCKET_PORT = 8001
+WEBSOCKET_RATE = 30  # Hz, default frame rate for clients that don't subscribe with their own
+# Recent samples of every field in fixed rings, for trend views ("history" WebSocket/MQTT requests)
+HISTORY_ENABLED = True
+HISTORY_SECONDS = 10.0
+HISTORY_DEFAULT_RATE = 20  # Hz expected from fields not matched below; rings are sized from these
+HISTORY_RATES = {
+    "dynamics.*": 100,
+    "diagnostics.cells_v": 10,
+    "thermal.cells_temp": 10,
+    "pack.avg_cell_*": 350,  # Recomputed on every cell frame
+    "pack.*": 50,
+}
+# Fault capture: every raw frame from TRIGGER_PRE_SECONDS before to TRIGGER_POST_SECONDS after a
+# contactor change or cell over-voltage/over-temperature, saved and uploaded first
+TRIGGERS_ENABLED = True
+TRIGGER_PRE_SECONDS = 5.0
+TRIGGER_POST_SECONDS = 5.0
+TRIGGER_MAX_FRAME_RATE = 8000  # frames/s the raw frame ring is sized for (a saturated 1 Mbit/s bus)
+TRIGGER_COOLDOWN_SECONDS = 60.0  # A trigger that fired stays quiet this long
+TRIGGER_SHUTDOWN_LEGS = False  # 0x202/0x204 leg layout is only known from the simulator, not the CAN spec
+CELL_OVER_VOLTAGE = 4.2  # V
+CELL_OVER_TEMPERATURE = 60.0  # °C
+CELL_VOLTAGE_HYSTERESIS = 0.05  # V below the limit before the trigger re-arms
+CELL_TEMPERATURE_HYSTERESIS = 2.0  # °C
+CAPTURE_DIR = "captures"
+# Per-CAN-ID frame rate, jitter and longest gap, bus load and SocketCAN error frames (interfaces/bus_stats.py)
+BUS_STATS_ENABLED = True
+CAN_BITRATE = 1000000  # For the bus load estimate
+BUS_STATS_SLOW_RATIO = 0.5  # Warn when an ID's rate falls below this fraction of its usual rate
+# Per-stage latency histograms and drop counters in Prometheus text format at
+# http://<car>:METRICS_PORT/metrics (the instrumentation itself is always on)
+METRICS_ENABLED = True
+METRICS_PORT = 9108
+METRICS_SAMPLE_EVERY = 16  # Time decode/store update of every Nth decoded frame (timers cost ~1 µs a frame)
 
-async def process_can_messages(latest_values_cache: Optional[LatestValuesCache] = None):
+# Raw CAN capture/replay (see interfaces/recorder.py); replay replaces the hardware
+CAN_REPLAY_FILE = os.environ.get("TELEMD_CAN_REPLAY")
+CAN_REPLAY_SPEED = float(os.environ.get("TELEMD_CAN_REPLAY_SPEED", "1.0"))  # 0 = as fast as possible
+CAN_RECORD_FILE = os.environ.get("TELEMD_CAN_RECORD")
+# Read the bus (or replay) in a separate ingest process that hands raw frames over through a
+# shared-memory ring, so decoding and publishing here can't hold up socket reads (TELEMD_CAN_INGEST=1).
+# The ring relies on x86-64 memory ordering (see interfaces/frame_ring.py)
+CAN_INGEST_PROCESS = os.environ.get("TELEMD_CAN_INGEST", "0") == "1"
+CAN_RING_FRAMES = 65536  # ~8 s of a saturated bus, 22 bytes each
+CAN_RING_POLL_INTERVAL = 0.002  # s between checks of an empty ring
+# Latest value and timestamp of every field in shared memory after each CAN batch, for other
+# processes on the car (core/shared_values.py has the reader)
+SHARED_VALUES_ENABLED = True
+SHARED_VALUES_NAME = "telemd_values"
+
+
+# Updated on the event loop; the MQTT stages are in networking/client.py and networking/publisher.py
+CAN_FRAMES = REGISTRY.counter("telemd_can_frames_total", "CAN frames received")
+CAN_BATCHES = REGISTRY.counter("telemd_can_batches_total", "Batches of CAN frames handled")
+CAN_DECODE_ERRORS = REGISTRY.counter("telemd_can_decode_errors_total", "Frames that failed to decode")
+CAN_FRAME_ERRORS = REGISTRY.counter("telemd_can_frame_errors_total",
+                                    "Frames skipped because handling them raised (decode errors aside)")
+CAN_WAIT_SECONDS = REGISTRY.histogram("telemd_can_wait_seconds",
+                                      "Time the reader waited for the next batch (bus idle or loop busy)")
+CAN_INGEST_DELAY_SECONDS = REGISTRY.histogram(
+    "telemd_can_ingest_delay_seconds", "Age of the oldest frame of a batch when the reader picks it up")
+CAN_BATCH_SECONDS = REGISTRY.histogram("telemd_can_batch_seconds", "Handling one batch of CAN frames")
+CAN_BATCH_FRAMES = REGISTRY.histogram("telemd_can_batch_frames", "Frames per batch",
+                                      exponential_buckets(1, 2, 10))
+DECODE_SECONDS = REGISTRY.histogram("telemd_decode_seconds", "Decoding one CAN frame into signal values")
+STORE_UPDATE_SECONDS = REGISTRY.histogram(
+    "telemd_store_update_seconds", "Writing one decoded frame into the store, window, history and CSV log")
+
+
+def register_metrics(publisher, mqtt_manager, triggers=None, bus_stats=None, ingest=None, shared_values=None,
+                     time_series_logger=None):
+    """Expose the drop and backlog counts the components already keep"""
+    REGISTRY.gauge("telemd_publish_queue_depth", "Snapshots waiting for the publisher thread",
+                   lambda: publisher.queue.qsize())
+    REGISTRY.counter("telemd_publish_snapshots_dropped_total",
+                     "Snapshots dropped because the publisher queue was full", lambda: publisher.dropped)
+    REGISTRY.counter("telemd_publish_snapshots_failed_total", "Snapshots that failed to publish",
+                     lambda: publisher.failed)
+    REGISTRY.gauge("telemd_mqtt_connected", "1 while connected to the broker",
+                   lambda: int(mqtt_manager.is_connected()))
+    spool = mqtt_manager.spool
+    if spool is not None:
+        REGISTRY.gauge("telemd_spool_pending_bytes", "Packets waiting on disk for the broker",
+                       spool.pending_bytes)
+        REGISTRY.counter("telemd_spool_dropped_bytes_total", "Spooled data dropped to stay within the size limit",
+                         lambda: spool.dropped_bytes)
+    if triggers is not None:
+        REGISTRY.counter("telemd_triggers_fired_total", "Fault triggers fired", lambda: triggers.fired)
+        REGISTRY.counter("telemd_fault_captures_total", "Fault captures cut", lambda: triggers.captures)
+        REGISTRY.counter("telemd_triggers_suppressed_total", "Trigger firings ignored during the cooldown",
+                         lambda: triggers.suppressed)
+    if ingest is not None:
+        REGISTRY.counter("telemd_can_ring_lost_frames_total",
+                         "Frames overwritten in the ingest ring before this process read them",
+                         lambda: ingest.ring.lost)
+        REGISTRY.gauge("telemd_can_ring_pending_frames", "Frames waiting in the ingest ring",
+                       lambda: ingest.ring.pending())
+        REGISTRY.counter("telemd_can_ingest_restarts_total", "Ingest process restarts",
+                         lambda: ingest.restarts)
+    if shared_values is not None:
+        REGISTRY.counter("telemd_shared_values_publishes_total", "Copies of the store into the shared value table",
+                         lambda: shared_values.publishes)
+    if bus_stats is not None:
+        def per_id(attribute):
+            return lambda: {f"0x{row.can_id:03X}": getattr(row, attribute) for row in bus_stats.ids()}
+        REGISTRY.counter("telemd_can_id_frames_total", "Frames received per CAN ID", per_id("frames"), "id")
+        REGISTRY.gauge("telemd_can_id_rate", "Frames/s per CAN ID over the last summary period",
+                       per_id("rate"), "id")
+        REGISTRY.gauge("telemd_can_id_jitter_seconds", "Smoothed inter-arrival jitter per CAN ID",
+                       per_id("jitter"), "id")
+        REGISTRY.gauge("telemd_can_id_max_gap_seconds", "Longest gap between frames per CAN ID this period",
+                       per_id("last_max_gap"), "id")
+        REGISTRY.gauge("telemd_can_bus_load", "Estimated bus load over the last summary period (0-1)",
+                       lambda: bus_stats.last_period.load if bus_stats.last_period else 0.0)
+        REGISTRY.counter("telemd_can_unmapped_frames_total", "Frames of IDs nothing decodes",
+                         bus_stats.unmapped_frames)
+        REGISTRY.counter("telemd_can_error_frames_total", "SocketCAN error frames by error class",
+                         lambda: bus_stats.errors, "class")
+
+
+def build_decode_plan(layout, decoders=CAN_DECODERS):
+    """Pair each compiled decoder with the store slots of its signals.
+
+    Resolves every signal name to its protobuf field and element index, and
+    that to a fixed slot of `layout`, once, so the receive loop only has to
+    unpack and write. Names without a protobuf mapping use their own name.
+    """
+    plan = {}
+    for can_id, decoder in decoders.items():
+        targets = []
+        for field_name in decoder.names:
+            proto_info = get_protobuf_field_and_index(field_name)
+            cache_field, proto_index, _ = proto_info if proto_info else (field_name, None, None)
+            targets.append((field_name, layout.slot(cache_field, proto_index)))
+        plan[can_id] = (decoder, targets)
+    return plan
+
+
+def build_history(layout):
+    return SlotHistory(layout, HISTORY_SECONDS, HISTORY_RATES, HISTORY_DEFAULT_RATE)
+
+
+async def process_can_messages(latest_values_cache: Optional[LatestValuesCache] = None,
+                               history: Optional[SlotHistory] = None):
     """Process CAN messages independently of WebSocket connections"""
     # Initialize components
-    can_interface = CANInterface()
-    mqtt_manager = MQTTManager()
-    telemetry_cache = TelemetryCache(mqtt_manager, MQTT_PUBLISH_INTERVAL)
-    # time_series_logger = CSVTimeSeriesLogger()
+    if latest_values_cache is None or latest_values_cache.store is None:
+        latest_values_cache = LatestValuesCache(SlotStore(build_field_layout()))
+    # One slot store shared by the WebSocket view and the MQTT publisher
+    store = latest_values_cache.store
+    if history is None and HISTORY_ENABLED:
+        history = build_history(store.layout)
+    history_add = history.add if history is not None else None
+    if history is not None:
+        print(f"Field history: {history.seconds:g} s per field, {history.nbytes() / 1e6:.1f} MB")
+    bus_stats = BusStatistics(set(CAN_DECODERS) | set(CELL_VOLTAGE_IDS) | set(CELL_TEMPERATURE_IDS),
+                              CAN_BITRATE, BUS_STATS_SLOW_RATIO) if BUS_STATS_ENABLED else None
+    can_interface = CANInterface(CAN_REPLAY_FILE, CAN_REPLAY_SPEED, CAN_RECORD_FILE, bus_stats,
+                                 CAN_INGEST_PROCESS, CAN_RING_FRAMES, CAN_RING_POLL_INTERVAL)
+    spool = DiskSpool(MQTT_SPOOL_DIR, MQTT_SPOOL_MAX_BYTES) if MQTT_SPOOL_ENABLED else None
+    batcher = PacketBatcher(MQTT_BATCH_MAX_PACKETS, max_delay=MQTT_BATCH_MAX_DELAY, codec=MQTT_BATCH_CODEC,
+                            level=MQTT_BATCH_LEVEL) if MQTT_BATCH_ENABLED else None
+    mqtt_manager = MQTTManager(spool=spool, backfill_rate=MQTT_BACKFILL_RATE,
+                               batcher=batcher, batch_topic=MQTT_BATCH_TOPIC, capture_topic=MQTT_CAPTURE_TOPIC,
+                               history=history, history_topic=MQTT_HISTORY_TOPIC,
+                               history_max_bytes=MQTT_HISTORY_MAX_BYTES)
+    window = WindowAggregator(len(store.layout)) if MQTT_AGGREGATE_ENABLED else None
+    window_add = window.add if window is not None else None
+    telemetry_cache = TelemetryCache(mqtt_manager, MQTT_PUBLISH_INTERVAL, store, window)
+    time_series_logger = CSVTimeSeriesLogger(binary=BINARY_LOGGING_ENABLED) if CSV_LOGGING_ENABLED else None
     aggregator = CellDataAggregator()
+    decode_plan = build_decode_plan(store.layout)
+    store_values, store_stamps = store.values, store.stamps
+    cells_v_slot = store.layout.slot("diagnostics.cells_v", 0)
+    cells_temp_slot = store.layout.slot("thermal.cells_temp", 0)
+    avg_cell_v_slot = store.layout.slot("pack.avg_cell_v")
+    avg_cell_temp_slot = store.layout.slot("pack.avg_cell_temp")
+    shared_values = SharedValueTable(store.layout, SHARED_VALUES_NAME) if SHARED_VALUES_ENABLED else None
+    if shared_values is not None:
+        print(f"Latest values in shared memory {SHARED_VALUES_NAME} ({shared_values.slots} slots)")
     
     # Initialize connections
-    can_interface.initialize()
+    can_interface.initialize(asyncio.get_running_loop())
     mqtt_manager.initialize()
     mqtt_manager.get_packet_id()  # Get initial packet ID
     
@@ -36,180 +243,261 @@ async def process_can_messages(latest_values_cache: Optional[LatestValuesCache]
     #     f"Starting CAN message processing with {MQTT_PUBLISH_RATE}Hz MQTT publishing..."
     # )
     
-    publish_lock = asyncio.Lock()
+    # Encoding and sending happen on the publisher's own thread; the loop only hands it snapshots
+    publisher = TelemetryPublisher(telemetry_cache, MQTT_PUBLISH_QUEUE,
+                                   CaptureQueue(CAPTURE_DIR) if TRIGGERS_ENABLED else None).start()
+    triggers = TriggerEngine(store, default_triggers(CELL_OVER_VOLTAGE, CELL_OVER_TEMPERATURE,
+                                                     CELL_VOLTAGE_HYSTERESIS, CELL_TEMPERATURE_HYSTERESIS,
+                                                     TRIGGER_SHUTDOWN_LEGS),
+                             publisher.submit_capture, TRIGGER_PRE_SECONDS, TRIGGER_POST_SECONDS,
+                             TRIGGER_MAX_FRAME_RATE, cooldown=TRIGGER_COOLDOWN_SECONDS) if TRIGGERS_ENABLED else None
+    trigger_ids = triggers.watchers if triggers is not None else ()
+    register_metrics(publisher, mqtt_manager, triggers, bus_stats, can_interface.ingest, shared_values,
+                     time_series_logger)
+    perf_counter = time.perf_counter
+    decode_observe, update_observe = DECODE_SECONDS.observe, STORE_UPDATE_SECONDS.observe
+    # Frame timestamps of a replay or the generator say nothing about our own delay
+    measure_ingest = can_interface.is_real_bus()
+    decoded_frames = 0
+    last_frame_time = time.time()
+    if bus_stats is not None:
+        bus_stats.roll(last_frame_time)  # Rates are reported per summary period from here on
+
+    async def _housekeeping():
+        """Publish and report on a timer, since the reader only wakes for frames"""
+        last_waiting_print = 0.0
+        while True:
+            await asyncio.sleep(MQTT_PUBLISH_INTERVAL)
+            current_time = time.time()
+
+            # Print a message every 10 seconds while the bus is silent
+            if current_time - last_frame_time >= 10.0 and current_time - last_waiting_print >= 10.0:
+                print("Waiting for CAN messages...")
+                last_waiting_print = current_time
 
-    async def _publish_cached(current_time):
-        async with publish_lock:
-            await asyncio.to_thread(telemetry_cache.publish_cached_data, current_time)
+            # Check if it's time to publish cached data to MQTT
+            if triggers is not None:
+                triggers.poll(current_time)
+
+            if telemetry_cache.should_publish(current_time):
+                #print(telemetry_cache)
+                publisher.submit(telemetry_cache.take_snapshot(current_time))
+
+            # Print summary every 5 seconds
+            if current_time - latest_values_cache.last_update_time >= 5.0:
+                latest_values_cache.print_summary()
+                for label, bank in (("Cell V", aggregator.voltages), ("Cell T", aggregator.temperatures)):
+                    stats = bank.stats()
+                    if stats['count']:
+                        print(f"{label}: {stats['count']} cells, avg {stats['avg']:.3f}, "
+                              f"min {stats['min']:.3f} (#{stats['min_cell']}), "
+                              f"max {stats['max']:.3f} (#{stats['max_cell']}), spread {stats['spread']:.3f}")
+                stats = publisher.stats()
+                print(f"MQTT publisher: queue {stats['queue_depth']}/{publisher.queue.maxsize} "
+                      f"(max {stats['max_depth']}), published {stats['published']}, "
+                      f"failed {stats['failed']}, dropped {stats['dropped']}, "
+                      f"last publish {stats['last_publish_ms']:.1f} ms")
+                if triggers is not None and triggers.fired:
+                    print(f"Triggers: {triggers.fired} fired, {triggers.captures} captures")
+                if can_interface.ingest is not None and can_interface.ingest.ring.lost:
+                    print(f"[WARN] CAN ingest ring: {can_interface.ingest.ring.lost} frames lost")
+                period = bus_stats.roll(current_time) if bus_stats is not None else None
+                if period is not None:
+                    print(f"CAN bus: {period.rate:.0f} frames/s, load {period.load:.0%}, "
+                          f"{period.unmapped_ids} unmapped IDs, {bus_stats.error_frames} error frames "
+                          f"({bus_stats.errors['bus_off']} bus-off, {bus_stats.errors['rx_overflow']} rx overflow)")
+                    # A silent bus is reported by "Waiting for CAN messages" instead
+                    slow_ids = period.slow_ids if period.frames else []
+                    for can_id in slow_ids[:8]:
+                        rate, usual = bus_stats.rates[can_id], bus_stats.baseline_rates[can_id]
+                        detail = f"longest gap {bus_stats.last_max_gap[can_id] * 1000:.0f} ms" if rate else "silent"
+                        print(f"[WARN] CAN 0x{can_id:03X} at {rate:.1f} frames/s, usually {usual:.1f} ({detail})")
+                    if len(slow_ids) > 8:
+                        print(f"[WARN] ...and {len(slow_ids) - 8} more CAN IDs below their usual rate")
+                p50, p99 = (FRAME_TO_UPLINK_SECONDS.quantile(q) for q in (0.5, 0.99))
+                if p50 == p50:  # NaN until something went out live
+                    print(f"Frame to uplink: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+                latest_values_cache.last_update_time = current_time
+                REGISTRY.rotate()  # Live quantiles cover the last 5-10 s
+
+    housekeeping_task = asyncio.create_task(_housekeeping())
 
     try:
-        while True:
-            try:
-                # Offload potentially blocking CAN recv to a thread to avoid
-                # stalling the asyncio event loop.
-                msg_or_msgs = await asyncio.to_thread(can_interface.recv, 0.01)
-                current_time = time.time()
-                
-                if msg_or_msgs:
-                    # Handle both single message and list of messages
-                    messages = msg_or_msgs if isinstance(msg_or_msgs, list) else [msg_or_msgs]
+        # Frames are pushed onto the event loop by the notifier, so this only
+        # wakes when something arrives; each batch is everything queued so far.
+        wait_start = perf_counter()
+        async for messages in can_interface.batches(CAN_BATCH_SIZE):
+            batch_start = perf_counter()
+            CAN_WAIT_SECONDS.observe(batch_start - wait_start)
+            current_time = time.time()
+            last_frame_time = current_time
+            if measure_ingest and messages[0].timestamp:
+                CAN_INGEST_DELAY_SECONDS.observe(max(0.0, current_time - messages[0].timestamp))
+            for msg in messages:
+                try:
+                    can_id = msg.arbitration_id
+                    if triggers is not None:
+                        triggers.record(msg)
+                    
+                    if can_id in CELL_VOLTAGE_IDS:
+                        # Only this frame's 4 cells and the running average change
+                        cell, cell_vals, avg_val = aggregator.process_voltage(can_id, msg.data)
+                        for slot, value in enumerate(cell_vals, cells_v_slot + cell):
+                            store_values[slot] = value
+                            store_stamps[slot] = current_time
+                        store_values[avg_cell_v_slot] = avg_val
+                        store_stamps[avg_cell_v_slot] = current_time
+                        if window_add:
+                            window_add(avg_cell_v_slot, avg_val)
+                        if history_add:
+                            for slot, value in enumerate(cell_vals, cells_v_slot + cell):
+                                history_add(slot, value, current_time)
+                            history_add(avg_cell_v_slot, avg_val, current_time)
+                        # time_series_logger.log_value("diagnostics.cells_v", str(all_vals), current_time)
+                        if time_series_logger:
+                            time_series_logger.log_value("pack.avg_cell_v", avg_val, current_time)
                     
-                    for msg in messages:
-                        can_id = msg.arbitration_id
-                        
-                        if 0x370 <= can_id <= 0x392:
-                            all_vals, avg_val = aggregator.process_voltage(can_id, msg.data)
-                            # latest_values_cache.update_value("diagnostics.cells_v", all_vals)
-                            # latest_values_cache.update_value("pack.avg_cell_v", avg_val)
-                            telemetry_cache.update_value(can_id, "diagnostics.cells_v", all_vals)
-                            telemetry_cache.update_value(can_id, "pack.avg_cell_v", avg_val)
-                            # time_series_logger.log_value("diagnostics.cells_v", str(all_vals), current_time)
-                            # time_series_logger.log_value("pack.avg_cell_v", avg_val, current_time)
-                        
-                        elif 0x470 <= can_id <= 0x486:
-                            all_vals, avg_val = aggregator.process_temperature(can_id, msg.data)
-                            # latest_values_cache.update_value("thermal.cells_temp", all_vals)
-                            # latest_values_cache.update_value("pack.avg_cell_temp", avg_val)
-                            telemetry_cache.update_value(can_id, "thermal.cells_temp", all_vals)
-                            telemetry_cache.update_value(can_id, "pack.avg_cell_temp", avg_val)
-                            #time_series_logger.log_value("thermal.cells_temp", str(all_vals), current_time)
-                            #time_series_logger.log_value("pack.avg_cell_temp", avg_val, current_time)
-
-                        elif can_id in CAN_MAPPING:
-                            mapping = CAN_MAPPING[can_id]
-                            # Normalize mapping to always be a list of tuples
-                            if isinstance(mapping, tuple):
-                                mapping = [mapping]
-                            
-                            try:
-                                for field_name, converter in mapping:
-                                    try:
-                                        value = converter(msg.data)
-                                        # Get the protobuf field name and index, if it exists
-                                        proto_info = get_protobuf_field_and_index(field_name)
-                                        
-                                        if proto_info:
-                                            proto_field, proto_index, proto_size = proto_info
-                                            # Use the protobuf field name for caching for MQTT and WebSocket
-                                            latest_values_cache.update_value(proto_field, value, proto_index, proto_size)
-                                            telemetry_cache.update_value(can_id, proto_field, value, proto_index, proto_size)
-                                            # time_series_logger.log_value(field_name, value, current_time)
-                                            #print(f"  -> Logged {proto_field}[{proto_index}]: {value}")
-                                        else:
-                                            # Fallback to the original field name if no mapping is found
-                                            latest_values_cache.update_value(field_name, value)
-                                            telemetry_cache.update_value(can_id, field_name, value)
-                                            # time_series_logger.log_value(field_name, value, current_time)
-                                            # print(f"  -> Logged {field_name}: {value}")
-                                            
-                                    except Exception as e:
-                                        print(f"  -> Error converting {field_name} from CAN 0x{can_id:03X}: {e}")
-                                        print(f"  -> Data bytes: {[f'{b:02X}' for b in msg.data]}")
-                            except Exception as e:
-                                print(f"  -> Error processing CAN 0x{can_id:03X}: {e}")
-                                print(f"  -> Data bytes: {[f'{b:02X}' for b in msg.data]}")
-                        # else:
-                        #     print(f"  -> No mapping found for CAN ID 0x{can_id:03X}")
-                else:
-                    # Print a message every 10 seconds to show the system is running
-                    if int(current_time) % 10 == 0 and int(current_time) != int(time.time() - 0.01):
-                        print("Waiting for CAN messages...")
-                
-                # Check if it's time to publish cached data to MQTT
-                if telemetry_cache.should_publish(current_time) and not publish_lock.locked():
-                    #print(telemetry_cache)
-                    asyncio.create_task(_publish_cached(current_time))
-                
-                # Print summary every 5 seconds
-                if current_time - latest_values_cache.last_update_time >= 5.0:
-                    latest_values_cache.print_summary()
-                    latest_values_cache.last_update_time = current_time
-                
-                # Small delay to prevent blocking the event loop
-                await asyncio.sleep(0.001)
-            except Exception as e:
-                print(f"CAN processing error: {e}")
+                    elif can_id in CELL_TEMPERATURE_IDS:
+                        cell, cell_vals, avg_val = aggregator.process_temperature(can_id, msg.data)
+                        for slot, value in enumerate(cell_vals, cells_temp_slot + cell):
+                            store_values[slot] = value
+                            store_stamps[slot] = current_time
+                        store_values[avg_cell_temp_slot] = avg_val
+                        store_stamps[avg_cell_temp_slot] = current_time
+                        if window_add:
+                            window_add(avg_cell_temp_slot, avg_val)
+                        if history_add:
+                            for slot, value in enumerate(cell_vals, cells_temp_slot + cell):
+                                history_add(slot, value, current_time)
+                            history_add(avg_cell_temp_slot, avg_val, current_time)
+                        #time_series_logger.log_value("thermal.cells_temp", str(all_vals), current_time)
+                        if time_series_logger:
+                            time_series_logger.log_value("pack.avg_cell_temp", avg_val, current_time)
+
+                    elif can_id in decode_plan:
+                        decoder, targets = decode_plan[can_id]
+                        decoded_frames += 1
+                        timed = not decoded_frames % METRICS_SAMPLE_EVERY
+                        if timed:
+                            start = perf_counter()
+                        try:
+                            values = decoder.decode(msg.data)
+                        except Exception as e:
+                            CAN_DECODE_ERRORS.inc()
+                            print(f"  -> Error processing CAN 0x{can_id:03X}: {e}")
+                            print(f"  -> Data bytes: {[f'{b:02X}' for b in msg.data]}")
+                            continue
+                        if timed:
+                            decoded = perf_counter()
+
+                        for (field_name, slot), value in zip(targets, values):
+                            # Shared slot read by both MQTT and WebSocket
+                            store_values[slot] = value
+                            store_stamps[slot] = current_time
+                            if window_add:
+                                window_add(slot, value)
+                            if history_add:
+                                history_add(slot, value, current_time)
+                            if time_series_logger:
+                                time_series_logger.log_value(field_name, value, current_time)
+                        if timed:
+                            decode_observe(decoded - start)
+                            update_observe(perf_counter() - decoded)
+                    # else:
+                    #     print(f"  -> No mapping found for CAN ID 0x{can_id:03X}")
+
+                    if can_id in trigger_ids:
+                        # After decoding, so field triggers see this frame's values
+                        triggers.check(msg)
+                except Exception as e:
+                    # Only this frame is lost; the rest of the batch carries on
+                    CAN_FRAME_ERRORS.inc()
+                    print(f"CAN processing error (0x{msg.arbitration_id:03X}): {e}")
+            if shared_values is not None:
+                shared_values.publish(store_values, store_stamps)
+            CAN_FRAMES.inc(len(messages))
+            CAN_BATCHES.inc()
+            CAN_BATCH_FRAMES.observe(len(messages))
+            wait_start = perf_counter()
+            CAN_BATCH_SECONDS.observe(wait_start - batch_start)
     except KeyboardInterrupt:
         print("Stopping CAN processing.")
         # Print final summary and shutdown
         #latest_values_cache.print_summary()
-        telemetry_cache.publish_cached_data(time.time())
-        # time_series_logger.shutdown()
+        publisher.submit(telemetry_cache.take_snapshot(time.time()))
     finally:
         print("Shutting down CAN processing components...")
-        # time_series_logger.shutdown()  # Ensure CSV logger flushes its buffer
+        housekeeping_task.cancel()
+        publisher.stop()
+        if time_series_logger:
+            time_series_logger.shutdown()  # Ensure CSV logger flushes its buffer
         can_interface.shutdown()
         mqtt_manager.shutdown()
+        if shared_values is not None:
+            shared_values.close()
 
 
-async def send_message(websocket, latest_values_cache):
-    """Send telemetry updates to WebSocket clients"""
-    print("WebSocket client connected, sending telemetry updates...")
-    try:
-        while True:
-            # Get latest values from cache
-            latest_values = latest_values_cache.get_latest_values()
-            
-            if latest_values:
-                # Organize values by category (dynamics, controls, etc.)
-                organized_data = {}
-                for field_name, (value, timestamp) in latest_values.items():
-                    # Split field name by dot to get category and subfield
-                    parts = field_name.split('.')
-                    if len(parts) >= 2:
-                        category = parts[0]
-                        subfield = '.'.join(parts[1:])
-                        if category not in organized_data:
-                            organized_data[category] = {}
-                        organized_data[category][subfield] = value
-                
-                # Create telemetry update message
-                message = {
-                    "timestamp": time.time(),
-                    "type": "telemetry_update",
-                    "data": organized_data
-                }
-                
-                # Send to WebSocket client
-                await websocket.send(json.dumps(message))
-            
-            # Send updates at 30Hz (every 33.33ms)
-            await asyncio.sleep(0.033)
-    except Exception as e:
-        print(f"WebSocket send error: {e}")
-
-
-async def handler(websocket, latest_values_cache):
+async def handler(websocket, broadcaster):
     print("client connected")
-    send_task = asyncio.create_task(send_message(websocket, latest_values_cache))
+    client = broadcaster.register(websocket.subprotocol)
+    send_task = asyncio.create_task(broadcaster.send_to(websocket, client))
 
     try:
         while True:
             try:
                 message = await websocket.recv()
-                print(f"Received from client: {message}")
+                # Control messages (set_mode, resync, ...) are handled by the broadcaster
+                handled = broadcaster.handle_message(client, message)
+                if not handled:
+                    print(f"Received from client: {message}")
+                elif handled is not True:
+                    await websocket.send(handled)  # Reply, e.g. to a history request
             except ConnectionClosedOK:
                 print("ConnectionClosedOK")
                 break
+            except ConnectionClosed:
+                print("ConnectionClosed")
+                break
     except KeyboardInterrupt:
         print("\n")
 
     send_task.cancel()  # stop sending task
+    broadcaster.unregister(client)
 
 
 async def main():
+    can_task = broadcast_task = metrics_task = None
     try:
-        latest_values=LatestValuesCache()
+        latest_values=LatestValuesCache(SlotStore(build_field_layout()))
+        history = build_history(latest_values.store.layout) if HISTORY_ENABLED else None
         # Start CAN processing task
-        can_task = asyncio.create_task(process_can_messages(latest_values))
-        
-        # print("Websocket server on localhost:8001")
-        # async with serve(lambda ws: handler(ws, latest_values), "", 8001):
-        await asyncio.get_running_loop().create_future()
+        can_task = asyncio.create_task(process_can_messages(latest_values, history))
+        if METRICS_ENABLED:
+            metrics_task = asyncio.create_task(serve_metrics("", METRICS_PORT))
+
+        if WEBSOCKET_ENABLED:
+            # One frame per tick is encoded once and shared by every connected client
+            broadcaster = TelemetryBroadcaster(latest_values, WEBSOCKET_RATE, history=history)
+            broadcast_task = asyncio.create_task(broadcaster.run())
+            REGISTRY.counter("telemd_websocket_frames_dropped_total",
+                             "WebSocket frames dropped for clients that fell behind",
+                             lambda: broadcaster.frames_dropped)
+            print(f"Websocket server on localhost:{WEBSOCKET_PORT}")
+            # JSON text by default; clients may negotiate telemd.msgpack or telemd.protobuf
+            async with serve(lambda ws: handler(ws, broadcaster), "", WEBSOCKET_PORT,
+                             select_subprotocol=select_subprotocol):
+                await asyncio.get_running_loop().create_future()
+        else:
+            await asyncio.get_running_loop().create_future()
     except asyncio.exceptions.CancelledError:
         print("\nProgram interrupted. Exiting...")
     finally:
-        can_task.cancel()
+        if broadcast_task:
+            broadcast_task.cancel()
+        if metrics_task:
+            metrics_task.cancel()
+        if can_task:
+            can_task.cancel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,379 @@
+import asyncio
+import json
+import time
+
+import msgpack
+import numpy as np
+from websockets.exceptions import ConnectionClosed
+
+from core.value_store import field_matches
+from protobuf.encoder import TelemetryEncoder
+
+# Binary WebSocket subprotocols a client may ask for; no subprotocol means JSON text
+SUBPROTOCOL_FORMATS = {
+    "telemd.msgpack": "msgpack",
+    "telemd.protobuf": "protobuf",
+}
+
+
+def select_subprotocol(connection, subprotocols):
+    """Pick the first binary format the client offers, or none for plain JSON"""
+    for subprotocol in subprotocols:
+        if subprotocol in SUBPROTOCOL_FORMATS:
+            return subprotocol
+    return None
+
+
+class BroadcastClient:
+    """Per-connection state: frame queue, wire format, update mode, subscription and last frame sent"""
+
+    __slots__ = ("queue", "format", "delta", "last_seq", "patterns", "interval", "next_due", "next_keyframe")
+
+    def __init__(self, format="json", interval=1.0 / 30):
+        self.queue = asyncio.Queue(maxsize=1)
+        self.format = format
+        self.delta = False
+        self.last_seq = None  # seq of the last frame sent; None forces a full frame
+        self.patterns = None  # sorted tuple of subscribed patterns, None for every field
+        self.interval = interval
+        self.next_due = 0.0  # monotonic time of the next frame
+        self.next_keyframe = 0.0
+
+
+class TelemetryBroadcaster:
+    """Builds one telemetry frame per tick and fans the same bytes out to every client.
+
+    Each client gets a one-slot queue. A client that hasn't taken the previous
+    frame yet has it replaced by the new one, so a slow dashboard drops frames
+    instead of holding up the others or growing a backlog.
+
+    Clients start in full mode (a complete "telemetry_update" every tick).
+    Sending {"type": "set_mode", "mode": "delta"} switches a client to
+    "telemetry_delta" frames holding only the fields that changed since
+    `base_seq`. Every tick gets a sequence number, and every store slot
+    remembers the seq it last changed in, so a delta can be built against
+    whatever frame a client last sent. {"type": "resync"} asks for a full
+    frame; delta clients also get one every `keyframe_interval` seconds.
+
+    {"type": "subscribe", "patterns": ["thermal", "dynamics.*_speed"], "rate": 60}
+    limits a client to the fields matching any glob pattern (a bare category
+    means "category.*") at its own rate, capped at `max_rate`. Ticks run at
+    the fastest rate any client wants, and each tick serves only the clients
+    that are due.
+
+    Frames are JSON text unless the client negotiated a binary subprotocol:
+    "telemd.msgpack" sends the same messages as msgpack with `data` keyed by
+    integer field IDs, after a one-off {"type": "fields"} message listing the
+    field name of each ID; "telemd.protobuf" sends full AngeliqueSensorData
+    messages (no delta mode, since proto3 can't tell unset from zero). Each
+    (format, base, patterns) frame is encoded at most once per tick and
+    shared by every client that wants it.
+
+    Given a core.history.SlotHistory, {"type": "history", "patterns": [...],
+    "seconds": 10} (or "since": <epoch seconds> to poll incrementally) is
+    answered right away with a "history" message holding the recent samples
+    of every matching field, as {"t": [...], "v": [...]} per slot name.
+    """
+
+    def __init__(self, latest_values_cache, rate=30.0, keyframe_interval=5.0, max_rate=100.0, history=None):
+        self.latest_values_cache = latest_values_cache
+        self.store = latest_values_cache.store
+        self.history = history
+        self.interval = 1.0 / rate
+        self.max_rate = max_rate
+        self.keyframe_interval = keyframe_interval
+        self.clients = set()
+        self.seq = 0
+        self.frames_built = 0
+        self.frames_dropped = 0
+        self._field_keys = {}  # field_name -> (category, subfield), or None if not dotted
+        self._matchers = {}  # patterns of a connected client -> {field_name: subscribed?}
+
+        self.protobuf_encoder = TelemetryEncoder()
+        self._field_ids = {}  # field_name -> msgpack field ID (its position in the layout)
+        self._tick_items = {}  # (base seq or None, patterns) -> [(field_name, value)] for this tick
+
+        self._values = self._stamps = None  # store snapshot of the current tick
+        if self.store is not None:
+            layout = self.store.layout
+            self._field_names = list(layout.fields)
+            self._field_ids = {field_name: i for i, field_name in enumerate(self._field_names)}
+            self._field_bases = np.array([base for base, _ in layout.fields.values()], dtype=np.intp)
+            self._slot_versions = np.zeros(len(layout), dtype=np.int64)
+            self._prev_stamps = np.zeros(len(layout))
+
+    def _split(self, field_name):
+        try:
+            return self._field_keys[field_name]
+        except KeyError:
+            # Split field name by dot to get category and subfield
+            parts = field_name.split('.')
+            key = (parts[0], '.'.join(parts[1:])) if len(parts) >= 2 else None
+            self._field_keys[field_name] = key
+            return key
+
+    def _organize(self, items):
+        """Group (field_name, value) pairs by category (dynamics, controls, etc.)"""
+        organized_data = {}
+        for field_name, value in items:
+            key = self._split(field_name)
+            if key is None:
+                continue
+            category, subfield = key
+            if category not in organized_data:
+                organized_data[category] = {}
+            organized_data[category][subfield] = value
+        return organized_data
+
+    def _advance(self):
+        """Start a new tick: snapshot the store and version every slot that changed"""
+        self.seq += 1
+        self._tick_items = {}
+        if self.store is None:
+            return
+        values, stamps = self.store.snapshot()
+        stamps_view = np.frombuffer(stamps, dtype=np.float64)
+        self._slot_versions[stamps_view != self._prev_stamps] = self.seq
+        self._prev_stamps = stamps_view
+        self._values, self._stamps = values, stamps
+
+    def _current_values(self):
+        if self.store is None:
+            return self.latest_values_cache.get_latest_values()
+        if self._values is None:
+            self._advance()
+        latest_values = self.store.fields(self._values, self._stamps)
+        latest_values.update(self.latest_values_cache.latest_values)
+        return latest_values
+
+    def _subscribed(self, patterns, field_name):
+        """Whether field_name matches a subscription, cached per name"""
+        matches = self._matchers.get(patterns)
+        if matches is None:
+            matches = self._matchers[patterns] = {}
+        try:
+            return matches[field_name]
+        except KeyError:
+            result = field_matches(field_name, patterns)
+            matches[field_name] = result
+            return result
+
+    def _items(self, since=None, patterns=None):
+        """[(field_name, value)] of every field (since=None) or of those changed after tick
+        `since`, limited to `patterns` when given"""
+        key = (since, patterns)
+        if key in self._tick_items:
+            return self._tick_items[key]
+
+        if patterns is not None:
+            items = [(field_name, value) for field_name, value in self._items(since)
+                     if self._subscribed(patterns, field_name)]
+        elif since is None:
+            items = [(field_name, value) for field_name, (value, _) in self._current_values().items()]
+        else:
+            field_versions = np.maximum.reduceat(self._slot_versions, self._field_bases)
+            field_names, store = self._field_names, self.store
+            items = [(field_names[i], store.field(field_names[i], self._values, self._stamps)[0])
+                     for i in np.flatnonzero(field_versions > since)]
+        self._tick_items[key] = items
+        return items
+
+    def encode(self, format, since=None, timestamp=None, patterns=None):
+        """Encode a full frame (since=None) or a delta after tick `since`; None if there's nothing to send"""
+        items = self._items(since, patterns)
+        if not items:
+            return None
+        if timestamp is None:
+            timestamp = time.time()
+
+        if format == "protobuf":
+            # Repeated fields only go out once every element is known, as over MQTT
+            fields = {field_name: value for field_name, value in items
+                      if not (isinstance(value, list) and None in value)}
+            return self.protobuf_encoder.encode(fields, self.seq, timestamp)
+
+        message = {
+            "timestamp": timestamp,
+            "type": "telemetry_update" if since is None else "telemetry_delta",
+            "seq": self.seq,
+        }
+        if since is not None:
+            message["base_seq"] = since
+        if format == "msgpack":
+            field_ids = self._field_ids
+            message["data"] = {field_ids[field_name]: value for field_name, value in items
+                               if field_name in field_ids}
+            return msgpack.packb(message)
+        message["data"] = self._organize(items)
+        return json.dumps(message)
+
+    def build_frame(self, timestamp=None, format="json"):
+        """Encode the current values as one full telemetry_update message, or None if empty"""
+        return self.encode(format, None, timestamp)
+
+    def build_delta(self, since, timestamp=None, format="json"):
+        """Encode the fields changed after tick `since` as a telemetry_delta, or None if none did"""
+        return self.encode(format, since, timestamp)
+
+    def field_dictionary(self):
+        """msgpack message mapping each field ID to its name and repeated size (0 for scalars)"""
+        sizes = [self.store.layout.fields[field_name][1] or 0 for field_name in self._field_ids] \
+            if self.store is not None else []
+        return msgpack.packb({"type": "fields", "fields": list(self._field_ids), "sizes": sizes})
+
+    def register(self, subprotocol=None):
+        """Add a client speaking the given negotiated subprotocol and return its state"""
+        client = BroadcastClient(SUBPROTOCOL_FORMATS.get(subprotocol, "json"), self.interval)
+        self.clients.add(client)
+        return client
+
+    def unregister(self, client):
+        self.clients.discard(client)
+        self._forget_matchers()
+
+    def _forget_matchers(self):
+        """Drop cached matches of patterns no connected client subscribes with any more"""
+        in_use = {client.patterns for client in self.clients}
+        for patterns in [patterns for patterns in self._matchers if patterns not in in_use]:
+            del self._matchers[patterns]
+
+    def history_frame(self, client, request):
+        """Encode the reply to a history request, or None if it is malformed"""
+        patterns = request.get("patterns") or client.patterns or ("*",)
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        now = time.time()
+        try:
+            patterns = tuple(sorted(set(str(pattern) for pattern in patterns)))
+            since = float(request["since"]) if request.get("since") is not None \
+                else now - float(request.get("seconds") or self.history.seconds)
+        except (TypeError, ValueError):
+            return None
+
+        # One-off patterns: matched directly rather than cached like subscriptions
+        field_names = [field_name for field_name in self.history.layout.fields
+                       if field_matches(field_name, patterns)]
+        series = self.history.series(field_names, since)
+        message = {"type": "history", "timestamp": now, "since": since, "series": series}
+        return msgpack.packb(message) if client.format == "msgpack" else json.dumps(message)
+
+    def handle_message(self, client, message):
+        """Apply a client control message; returns False if it isn't one, or the
+        frame to send back for requests that get a reply (history)"""
+        try:
+            request = json.loads(message)
+            kind = request.get("type")
+        except (ValueError, AttributeError):
+            return False
+
+        if kind == "set_mode":
+            mode = request.get("mode")
+            if mode == "delta" and self.store is not None and client.format != "protobuf":
+                client.delta = True
+            elif mode == "full":
+                client.delta = False
+            else:
+                return False
+        elif kind == "resync":
+            client.last_seq = None
+        elif kind == "subscribe":
+            patterns = request.get("patterns") or ()
+            if isinstance(patterns, str):
+                patterns = [patterns]
+            rate = request.get("rate")
+            try:
+                patterns = tuple(sorted(set(str(pattern) for pattern in patterns)))
+                interval = 1.0 / min(float(rate), self.max_rate) if rate else self.interval
+            except (TypeError, ValueError, ZeroDivisionError):
+                return False
+            if interval <= 0:
+                return False
+            client.patterns = patterns or None
+            self._forget_matchers()
+            client.interval = interval
+            client.next_due = 0.0
+            # New field set: start it off with a full frame
+            client.last_seq = None
+        elif kind == "history" and self.history is not None:
+            return self.history_frame(client, request) or False
+        else:
+            return False
+        return True
+
+    def _offer(self, queue, item):
+        if queue.full():
+            # Client hasn't sent the last frame yet; replace it with the newer one
+            queue.get_nowait()
+            self.frames_dropped += 1
+        queue.put_nowait(item)
+
+    def _tick(self, now, tick_interval):
+        """Serve every client due at monotonic time `now`"""
+        slack = tick_interval / 2
+        due = [client for client in self.clients if client.next_due - slack <= now]
+        if not due:
+            return
+        self._advance()
+        timestamp = time.time()
+
+        frames = {}  # (format, base seq, patterns) -> encoded frame, shared by every client that wants it
+        for client in due:
+            client.next_due = max(client.next_due + client.interval, now)
+
+            # Deltas go against whatever the client last sent, so a client whose
+            # previous frame is still queued (and about to be replaced) stays correct
+            base = None
+            if client.delta:
+                if client.last_seq is None or now >= client.next_keyframe:
+                    client.next_keyframe = now + self.keyframe_interval
+                else:
+                    base = client.last_seq
+
+            key = (client.format, base, client.patterns)
+            if key not in frames:
+                frames[key] = self.encode(client.format, base, timestamp, client.patterns)
+                self.frames_built += frames[key] is not None
+            frame = frames[key]
+
+            if frame is not None:
+                self._offer(client.queue, (self.seq, base, frame))
+            elif base is not None and client.queue.empty():
+                # Nothing it subscribes to changed, so an up-to-date client stays up to date
+                client.last_seq = self.seq
+
+    async def run(self):
+        """Build and hand out frames while any client is connected, at the fastest client's rate"""
+        next_tick = time.monotonic()
+        while True:
+            interval = min((client.interval for client in self.clients), default=self.interval)
+            next_tick += interval
+            if self.clients:
+                self._tick(time.monotonic(), interval)
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Fell behind (e.g. a long GC pause); don't try to catch up with a burst
+                next_tick = time.monotonic()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def send_to(self, websocket, client):
+        """Forward broadcast frames to one WebSocket until it closes"""
+        print(f"WebSocket client connected ({len(self.clients)} total, {client.format}), sending telemetry updates...")
+        try:
+            if client.format == "msgpack":
+                await websocket.send(self.field_dictionary())
+            while True:
+                seq, base_seq, frame = await client.queue.get()
+                if base_seq is not None and base_seq != client.last_seq:
+                    # The shared delta doesn't apply to what this client has; catch it up
+                    seq = self.seq
+                    frame = self.encode(client.format, client.last_seq, patterns=client.patterns)
+                    if frame is None:
+                        client.last_seq = seq
+                        continue
+                await websocket.send(frame)
+                client.last_seq = seq
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            print(f"WebSocket send error: {e}")
@@ -0,0 +1,192 @@
+import statistics
+import struct
+from collections import namedtuple
+
+# Declarative description of one value carried in a CAN frame. Fields mirror the
+# arguments of process_can_data so a spec can always be evaluated the slow way.
+Signal = namedtuple(
+    "Signal",
+    ["name", "start", "end", "signed", "scale", "operation", "chunk_size"],
+    defaults=(False, 1.0, "none", None),
+)
+
+# struct codes for little-endian integers of each supported width
+_INT_CODES = {1: "b", 2: "h", 4: "i", 8: "q"}
+
+_SIMPLE, _MEAN, _MAX, _MIN = range(4)
+_OPERATIONS = {"none": _SIMPLE, "scaling": _SIMPLE, "mean": _MEAN, "max": _MAX, "min": _MIN}
+
+
+# New conversion function to handle different operations
+def process_can_data(data, start, end, signed=False, scale=1.0, operation='none', chunk_size=None, fallback=0.0):
+    """
+    Safely convert bytes to a value with a specified operation.
+    Operations:
+    - 'none', 'scaling': Treat bytes as a single integer and apply scaling.
+    - 'mean', 'max', 'min': Treat each byte in the slice as a separate value
+      and perform the specified operation. This is based on the interpretation
+      that these operations apply to the byte values themselves.
+      If chunk_size is specified, the operation is performed on multi-byte chunks.
+    """
+    try:
+        if start >= len(data) or end > len(data):
+            return fallback
+
+        byte_slice = data[start:end]
+        if not byte_slice:
+            return fallback
+
+        if operation in ['mean', 'max', 'min']:
+            values = []
+            if chunk_size:
+                if len(byte_slice) % chunk_size != 0:
+                    return fallback
+                for i in range(0, len(byte_slice), chunk_size):
+                    chunk = byte_slice[i:i+chunk_size]
+                    values.append(int.from_bytes(chunk, 'little', signed=signed))
+            else:
+                # Original behavior: operation on individual bytes
+                if signed:
+                    values = [int.from_bytes([b], 'little', signed=True) for b in byte_slice]
+                else:
+                    values = list(byte_slice)
+
+            if not values:
+                return fallback
+
+            if operation == 'mean':
+                result = statistics.mean(values)
+            elif operation == 'max':
+                result = max(values)
+            else: # 'min'
+                result = min(values)
+
+            return result * scale
+
+        else:  # 'none' or 'scaling'
+            value = int.from_bytes(byte_slice, 'little', signed=signed)
+            return value * scale
+
+    except (ValueError, OverflowError, IndexError):
+        return fallback
+
+
+def decode_signal(signal, data):
+    """Evaluate a single signal with the reference (uncompiled) conversion."""
+    return process_can_data(
+        data, signal.start, signal.end, signed=signal.signed, scale=signal.scale,
+        operation=signal.operation, chunk_size=signal.chunk_size,
+    )
+
+
+def _signal_elements(signal):
+    """Split a signal into the (offset, width) integers it reads, or None if the
+    layout can't be expressed with struct codes."""
+    if signal.operation not in _OPERATIONS or signal.start < 0 or signal.end <= signal.start:
+        return None
+
+    length = signal.end - signal.start
+    if _OPERATIONS[signal.operation] == _SIMPLE:
+        width = length
+    else:
+        width = signal.chunk_size or 1
+        if length % width != 0:
+            return None
+
+    if width not in _INT_CODES:
+        return None
+    return [(offset, width) for offset in range(signal.start, signal.end, width)]
+
+
+class FrameDecoder:
+    """Decodes every signal of one CAN ID with a single precompiled struct unpack.
+
+    Signals whose layout can't be packed into the frame struct (odd widths or
+    overlapping byte ranges) are evaluated with process_can_data instead, as are
+    frames too short for the struct. Results always match process_can_data.
+    """
+
+    def __init__(self, can_id, signals):
+        self.can_id = can_id
+        self.signals = tuple(signals)
+        self.names = tuple(signal.name for signal in self.signals)
+
+        # Lay out the integers each signal needs, skipping anything that overlaps
+        # bytes already claimed by an earlier signal.
+        claimed = []
+        packed = {}
+        for position, signal in enumerate(self.signals):
+            elements = _signal_elements(signal)
+            if elements is None:
+                continue
+            if any(signal.start < end and start < signal.end for start, end in claimed):
+                continue
+            claimed.append((signal.start, signal.end))
+            packed[position] = elements
+
+        # Build the struct format in byte order and remember which tuple slots
+        # belong to each packed signal.
+        ordered = sorted(
+            (offset, width, position)
+            for position, elements in packed.items()
+            for offset, width in elements
+        )
+        fmt = "<"
+        cursor = 0
+        slots = {position: [] for position in packed}
+        for index, (offset, width, position) in enumerate(ordered):
+            if offset > cursor:
+                fmt += f"{offset - cursor}x"
+            code = _INT_CODES[width]
+            fmt += code if self.signals[position].signed else code.upper()
+            slots[position].append(index)
+            cursor = offset + width
+
+        self._struct = struct.Struct(fmt) if ordered else None
+        self.min_length = self._struct.size if self._struct else 0
+
+        # Each step is (kind, first slot, last slot + 1, scale, signal)
+        self._steps = []
+        for position, signal in enumerate(self.signals):
+            if position in packed:
+                first = slots[position][0]
+                kind = _OPERATIONS[signal.operation]
+                self._steps.append((kind, first, first + len(slots[position]), signal.scale, signal))
+            else:
+                self._steps.append((None, 0, 0, signal.scale, signal))
+
+        self._all_simple = all(step[0] == _SIMPLE for step in self._steps)
+        self._simple = [(first, scale) for _, first, _, scale, _ in self._steps]
+
+    def decode(self, data):
+        """Return the values of all signals in this frame, in declaration order."""
+        try:
+            raw = self._struct.unpack_from(data)
+        except (struct.error, TypeError, AttributeError):
+            return [decode_signal(signal, data) for signal in self.signals]
+
+        if self._all_simple:
+            return [raw[index] * scale for index, scale in self._simple]
+
+        values = []
+        for kind, first, last, scale, signal in self._steps:
+            if kind == _SIMPLE:
+                values.append(raw[first] * scale)
+            elif kind == _MEAN:
+                # int / int is correctly rounded, same as statistics.mean on ints
+                values.append(sum(raw[first:last]) / (last - first) * scale)
+            elif kind == _MAX:
+                values.append(max(raw[first:last]) * scale)
+            elif kind == _MIN:
+                values.append(min(raw[first:last]) * scale)
+            else:
+                values.append(decode_signal(signal, data))
+        return values
+
+    def __repr__(self):
+        return f"FrameDecoder(0x{self.can_id:03X}, {len(self.signals)} signals)"
+
+
+def compile_decoders(signal_spec):
+    """Compile a {can_id: [Signal, ...]} spec into {can_id: FrameDecoder}."""
+    return {can_id: FrameDecoder(can_id, signals) for can_id, signals in signal_spec.items()}
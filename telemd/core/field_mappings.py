@@ -1,213 +1,274 @@
-import statistics
+import struct
+from array import array
 
-# New conversion function to handle different operations
-def process_can_data(data, start, end, signed=False, scale=1.0, operation='none', chunk_size=None, fallback=0.0):
-    """
-    Safely convert bytes to a value with a specified operation.
-    Operations:
-    - 'none', 'scaling': Treat bytes as a single integer and apply scaling.
-    - 'mean', 'max', 'min': Treat each byte in the slice as a separate value
-      and perform the specified operation. This is based on the interpretation
-      that these operations apply to the byte values themselves.
-      If chunk_size is specified, the operation is performed on multi-byte chunks.
-    """
-    try:
-        if start >= len(data) or end > len(data):
-            return fallback
-
-        byte_slice = data[start:end]
-        if not byte_slice:
-            return fallback
-
-        if operation in ['mean', 'max', 'min']:
-            values = []
-            if chunk_size:
-                if len(byte_slice) % chunk_size != 0:
-                    return fallback
-                for i in range(0, len(byte_slice), chunk_size):
-                    chunk = byte_slice[i:i+chunk_size]
-                    values.append(int.from_bytes(chunk, 'little', signed=signed))
-            else:
-                # Original behavior: operation on individual bytes
-                if signed:
-                    values = [int.from_bytes([b], 'little', signed=True) for b in byte_slice]
-                else:
-                    values = list(byte_slice)
-            
-            if not values:
-                return fallback
-
-            if operation == 'mean':
-                result = statistics.mean(values)
-            elif operation == 'max':
-                result = max(values)
-            else: # 'min'
-                result = min(values)
-            
-            return result * scale
+import numpy as np
 
-        else:  # 'none' or 'scaling'
-            value = int.from_bytes(byte_slice, 'little', signed=signed)
-            return value * scale
-            
-    except (ValueError, OverflowError, IndexError):
-        return fallback
+from core.decoder import Signal, compile_decoders, decode_signal, process_can_data
 
-CAN_MAPPING = {
+# Declarative signal layout of every decoded CAN ID. Decoders are compiled from
+# this once at import; CAN_MAPPING below is derived from it for older callers.
+CAN_SIGNALS = {
     0x0A0: [
-        ("thermal.inverter_temp", lambda d: process_can_data(d, 0, 6, signed=True, operation='mean', chunk_size=2)),
+        Signal("thermal.inverter_temp", 0, 6, signed=True, operation='mean', chunk_size=2),
     ],
     0x0A2: [
-        ("thermal.motor_temp", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.1)),
+        Signal("thermal.motor_temp", 4, 6, signed=True, scale=0.1),
     ],
     0x0A5: [
-        # ("dynamics.motor_angle", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.1)), // not sending in protobuf template but data available
-        ("dynamics.inverter_rpm", lambda d: process_can_data(d, 2, 4, signed=True)),
-        # ("dynamics.inverter_frequency", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.1)),
-        # ("dynamics.resolver_angle", lambda d: process_can_data(d, 6, 8, signed=True, scale=0.1)),
+        # Signal("dynamics.motor_angle", 0, 2, signed=True, scale=0.1), // not sending in protobuf template but data available
+        Signal("dynamics.inverter_rpm", 2, 4, signed=True),
+        # Signal("dynamics.inverter_frequency", 4, 6, signed=True, scale=0.1),
+        # Signal("dynamics.resolver_angle", 6, 8, signed=True, scale=0.1),
     ],
     0x0A6: [
-        # ("dynamics.phase_a_current", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.1)),
-        # ("dynamics.phase_b_current", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.1)),
-        # ("dynamics.phase_c_current", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.1)),
-        ("dynamics.inverter_c", lambda d: process_can_data(d, 6, 8, signed=True, scale=0.1)),
+        # Signal("dynamics.phase_a_current", 0, 2, signed=True, scale=0.1),
+        # Signal("dynamics.phase_b_current", 2, 4, signed=True, scale=0.1),
+        # Signal("dynamics.phase_c_current", 4, 6, signed=True, scale=0.1),
+        Signal("dynamics.inverter_c", 6, 8, signed=True, scale=0.1),
     ],
     0x0A7: [
-        ("dynamics.inverter_v", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.1)),
-        # ("dynamics.output_voltage", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.1)),
-        # ("dynamics.ab_voltage", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.1)),
-        # ("dynamics.bc_voltage", lambda d: process_can_data(d, 6, 8, signed=True, scale=0.1)),
+        Signal("dynamics.inverter_v", 0, 2, signed=True, scale=0.1),
+        # Signal("dynamics.output_voltage", 2, 4, signed=True, scale=0.1),
+        # Signal("dynamics.ab_voltage", 4, 6, signed=True, scale=0.1),
+        # Signal("dynamics.bc_voltage", 6, 8, signed=True, scale=0.1),
     ],
     # Telemetry unused with flag data and error data
     # 0x0AA: [
-    #     ("controls.vcu_flags", lambda d: process_can_data(d, 0, 8, signed=False)),
+    #     Signal("controls.vcu_flags", 0, 8, signed=False),
     # ],
     # 0x0AB: [
-    #     ("diagnostics.current_errors", lambda d: process_can_data(d, 0, 8, signed=False)),
+    #     Signal("diagnostics.current_errors", 0, 8, signed=False),
     # ],
     # 0x0AC: [
-    #     #("dynamics.torque_request", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.1)),
-    #     ("dynamics.inverter_torque", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.1)),
+    #     #Signal("dynamics.torque_request", 0, 2, signed=True, scale=0.1),
+    #     Signal("dynamics.inverter_torque", 2, 4, signed=True, scale=0.1),
     # ],
     0x0C0: [
-        ("dynamics.torque_request", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.1)),
-        ("dynamics.inverter_torque", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.1)),
+        Signal("dynamics.torque_request", 0, 2, signed=True, scale=0.1),
+        Signal("dynamics.inverter_torque", 2, 4, signed=True, scale=0.1),
     ],
     # 0x020: [
-    #     ("diagnostics.imd", lambda d: process_can_data(d, 0, 1, signed=False)),
-    #     ("diagnostics.ams", lambda d: process_can_data(d, 1, 2, signed=False)),
+    #     Signal("diagnostics.imd", 0, 1, signed=False),
+    #     Signal("diagnostics.ams", 1, 2, signed=False),
     # ],
     0x220: [
-        ("pack.hv_pack_v", lambda d: process_can_data(d, 0, 2, signed=False, scale=0.01)),
-        ("pack.hv_c", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("diagnostics.hv_charge_state", lambda d: process_can_data(d, 4, 6, signed=False, scale=0.01)),
-        ("thermal.pack_temp_max", lambda d: process_can_data(d, 6, 7, signed=False)),
-        ("thermal.pack_temp_min", lambda d: process_can_data(d, 7, 8, signed=False)),
+        Signal("pack.hv_pack_v", 0, 2, signed=False, scale=0.01),
+        Signal("pack.hv_c", 2, 4, signed=True, scale=0.01),
+        Signal("diagnostics.hv_charge_state", 4, 6, signed=False, scale=0.01),
+        Signal("thermal.pack_temp_max", 6, 7, signed=False),
+        Signal("thermal.pack_temp_min", 7, 8, signed=False),
     ],
     0x420: [
-        ("pack.contactor_state", lambda d: process_can_data(d, 0, 1, signed=False)),
+        Signal("pack.contactor_state", 0, 1, signed=False),
     ],
     0x230: [
-        ("thermal.flow_rate", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.1)),
-        ("thermal.water_motor_temp", lambda d: process_can_data(d, 2, 3, signed=True)),
-        ("thermal.water_inverter_temp", lambda d: process_can_data(d, 3, 4, signed=True)),
-        ("thermal.water_rad_temp", lambda d: process_can_data(d, 4, 5, signed=True)),
-        ("thermal.rad_fan_rpm", lambda d: process_can_data(d, 5, 6, signed=True)),
+        Signal("thermal.flow_rate", 0, 2, signed=True, scale=0.1),
+        Signal("thermal.water_motor_temp", 2, 3, signed=True),
+        Signal("thermal.water_inverter_temp", 3, 4, signed=True),
+        Signal("thermal.water_rad_temp", 4, 5, signed=True),
+        Signal("thermal.rad_fan_rpm", 5, 6, signed=True),
     ],
     0x330: [
-        ("pack.lv_v", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("diagnostics.lv_charge_state", lambda d: process_can_data(d, 2, 4, signed=False, scale=0.01)),
-        ("pack.lv_c", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("pack.lv_v", 0, 2, signed=True, scale=0.01),
+        Signal("diagnostics.lv_charge_state", 2, 4, signed=False, scale=0.01),
+        Signal("pack.lv_c", 4, 6, signed=True, scale=0.01),
     ],
     0x340: [
-        ("dynamics.frw_speed", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.0025)),
+        Signal("dynamics.frw_speed", 0, 2, signed=True, scale=0.0025),
     ],
     0x344: [
-        ("dynamics.flw_speed", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.0025)),
+        Signal("dynamics.flw_speed", 0, 2, signed=True, scale=0.0025),
     ],
     0x348: [
-        ("dynamics.brw_speed", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.0025)),
+        Signal("dynamics.brw_speed", 0, 2, signed=True, scale=0.0025),
     ],
     0x34C: [
-        ("dynamics.blw_speed", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.0025)),
+        Signal("dynamics.blw_speed", 0, 2, signed=True, scale=0.0025),
     ],
     0x221: [
-        ("HVC Acceleration X", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("HVC Acceleration Y", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("HVC Acceleration Z", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("HVC Acceleration X", 0, 2, signed=True, scale=0.01),
+        Signal("HVC Acceleration Y", 2, 4, signed=True, scale=0.01),
+        Signal("HVC Acceleration Z", 4, 6, signed=True, scale=0.01),
     ],
     0x222:[
-        ("HVC Gyro X", lambda d: process_can_data(d, 0, 2, signed=True, scale = 0.01)),
-        ("HVC Gyro Y", lambda d: process_can_data(d, 2, 4, signed=True, scale = 0.01)),
-        ("HVC Gyro Z", lambda d: process_can_data(d, 4, 6, signed=True, scale = 0.01)),
+        Signal("HVC Gyro X", 0, 2, signed=True, scale = 0.01),
+        Signal("HVC Gyro Y", 2, 4, signed=True, scale = 0.01),
+        Signal("HVC Gyro Z", 4, 6, signed=True, scale = 0.01),
     ],
     0x231: [
-        ("PDU Acceleration X", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("PDU Acceleration Y", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("PDU Acceleration Z", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("PDU Acceleration X", 0, 2, signed=True, scale=0.01),
+        Signal("PDU Acceleration Y", 2, 4, signed=True, scale=0.01),
+        Signal("PDU Acceleration Z", 4, 6, signed=True, scale=0.01),
     ],
     0x232:[
-        ("PDU Gyro X", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("PDU Gyro Y", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("PDU Gyro Z", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("PDU Gyro X", 0, 2, signed=True, scale=0.01),
+        Signal("PDU Gyro Y", 2, 4, signed=True, scale=0.01),
+        Signal("PDU Gyro Z", 4, 6, signed=True, scale=0.01),
     ],
     0x341: [
-        ("Front Right Acceleration X", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("Front Right Acceleration Y", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("Front Right Acceleration Z", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("Front Right Acceleration X", 0, 2, signed=True, scale=0.01),
+        Signal("Front Right Acceleration Y", 2, 4, signed=True, scale=0.01),
+        Signal("Front Right Acceleration Z", 4, 6, signed=True, scale=0.01),
     ],
     0x345: [
-        ("Front Left Acceleration X", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("Front Left Acceleration Y", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("Front Left Acceleration Z", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("Front Left Acceleration X", 0, 2, signed=True, scale=0.01),
+        Signal("Front Left Acceleration Y", 2, 4, signed=True, scale=0.01),
+        Signal("Front Left Acceleration Z", 4, 6, signed=True, scale=0.01),
     ],
     0x349: [
-        ("Back Right Acceleration X", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("Back Right Acceleration Y", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("Back Right Acceleration Z", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("Back Right Acceleration X", 0, 2, signed=True, scale=0.01),
+        Signal("Back Right Acceleration Y", 2, 4, signed=True, scale=0.01),
+        Signal("Back Right Acceleration Z", 4, 6, signed=True, scale=0.01),
     ],
     0x34D: [
-        ("Back Left Acceleration X", lambda d: process_can_data(d, 0, 2, signed=True, scale=0.01)),
-        ("Back Left Acceleration Y", lambda d: process_can_data(d, 2, 4, signed=True, scale=0.01)),
-        ("Back Left Acceleration Z", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("Back Left Acceleration X", 0, 2, signed=True, scale=0.01),
+        Signal("Back Left Acceleration Y", 2, 4, signed=True, scale=0.01),
+        Signal("Back Left Acceleration Z", 4, 6, signed=True, scale=0.01),
     ],
     0x600:[
-        ("Latitude", lambda d: process_can_data(d, 0, 4, signed=True, scale=1e-7)), 
-        ("Longitude", lambda d: process_can_data(d, 4, 8, signed=True, scale=1e-7)),
+        Signal("Latitude", 0, 4, signed=True, scale=1e-7), 
+        Signal("Longitude", 4, 8, signed=True, scale=1e-7),
            ], # unpack csv name to protobuf
     0x601:[
-        ("dynamics.gps_velocity", lambda d: process_can_data(d, 0, 4, signed=True, scale=0.001)),
-        ("dynamics.gps_heading", lambda d: process_can_data(d, 4, 6, signed=True, scale=0.01)),
+        Signal("dynamics.gps_velocity", 0, 4, signed=True, scale=0.001),
+        Signal("dynamics.gps_heading", 4, 6, signed=True, scale=0.01),
         ]
 }
 
+# Compiled per-ID decoders used by the backend hot loop
+CAN_DECODERS = compile_decoders(CAN_SIGNALS)
+
+# Legacy (field_name, converter) view of CAN_SIGNALS, evaluated per field with
+# process_can_data. Kept for protobuf.interface and the test scripts.
+CAN_MAPPING = {
+    can_id: [(signal.name, lambda d, signal=signal: decode_signal(signal, d)) for signal in signals]
+    for can_id, signals in CAN_SIGNALS.items()
+}
+
+# BMS cell broadcast ranges: each frame carries 4 cells as uint16
+CELL_VOLTAGE_IDS = range(0x370, 0x393)
+CELL_TEMPERATURE_IDS = range(0x470, 0x487)
+CELLS_PER_FRAME = 4
+CELL_FRAME = struct.Struct('<4H')
+CELL_VOLTAGE_COUNT = len(CELL_VOLTAGE_IDS) * CELLS_PER_FRAME  # 140
+CELL_TEMPERATURE_COUNT = len(CELL_TEMPERATURE_IDS) * CELLS_PER_FRAME  # 92
+
+class CellBank:
+    """Readings of one BMS broadcast range in a fixed per-cell buffer.
+
+    Cell k of frame `can_id` lives at (can_id - first ID) * 4 + k. Cells are
+    stored as integers (raw counts, or truncated units when `truncate` is
+    set), so the running sum stays exact and the mean is O(1) per frame.
+    Min and max are tracked with their cell position and only rescanned,
+    over a NumPy view of the buffer, when the extreme cell itself moves inward.
+    """
+
+    def __init__(self, can_ids, scale, truncate=False):
+        self.first_id = can_ids.start
+        self.size = len(can_ids) * CELLS_PER_FRAME
+        self.scale = scale
+        self.truncate = truncate
+        # Truncated banks store finished units; raw banks are scaled on the way out
+        self.unit_scale = 1 if truncate else scale
+
+        self.cells = array('q', [0]) * self.size
+        self.seen = array('b', [0]) * self.size
+        self._cells_view = np.frombuffer(self.cells, dtype=np.int64)
+        self._seen_view = np.frombuffer(self.seen, dtype=np.int8)
+        self.seen_count = 0
+        self.total = 0
+        self.max_index = self.min_index = -1
+        self.max_value = self.min_value = 0
+
+    def update(self, can_id, data):
+        """Store one frame's 4 cells; returns (first cell index, scaled values)"""
+        offset = (can_id - self.first_id) * CELLS_PER_FRAME
+        if len(data) >= CELL_FRAME.size:
+            raw = CELL_FRAME.unpack_from(data)
+        else:
+            raw = CELL_FRAME.unpack(bytes(data).ljust(CELL_FRAME.size, b'\0'))
+        units = [int(r * self.scale) for r in raw] if self.truncate else raw
+
+        cells, seen = self.cells, self.seen
+        for cell, unit in enumerate(units, offset):
+            if seen[cell]:
+                self.total += unit - cells[cell]
+            else:
+                seen[cell] = 1
+                self.seen_count += 1
+                self.total += unit
+            cells[cell] = unit
+
+        end = offset + CELLS_PER_FRAME
+        frame_max = max(units)
+        if self.max_index < 0 or frame_max >= self.max_value:
+            self.max_value, self.max_index = frame_max, offset + units.index(frame_max)
+        elif offset <= self.max_index < end:
+            self._rescan_max()
+        frame_min = min(units)
+        if self.min_index < 0 or frame_min <= self.min_value:
+            self.min_value, self.min_index = frame_min, offset + units.index(frame_min)
+        elif offset <= self.min_index < end:
+            self._rescan_min()
+
+        unit_scale = self.unit_scale
+        return offset, [unit * unit_scale for unit in units]
+
+    def _rescan_max(self):
+        if self.seen_count == self.size:
+            index = int(self._cells_view.argmax())
+        else:
+            index = int(np.where(self._seen_view != 0, self._cells_view, np.iinfo(np.int64).min).argmax())
+        self.max_index, self.max_value = index, self.cells[index]
+
+    def _rescan_min(self):
+        if self.seen_count == self.size:
+            index = int(self._cells_view.argmin())
+        else:
+            index = int(np.where(self._seen_view != 0, self._cells_view, np.iinfo(np.int64).max).argmin())
+        self.min_index, self.min_value = index, self.cells[index]
+
+    @property
+    def average(self):
+        return self.total * self.unit_scale / self.seen_count if self.seen_count else 0.0
+
+    def values(self):
+        """Scaled values of every cell seen so far, in cell order"""
+        unit_scale = self.unit_scale
+        return [unit * unit_scale for unit, seen in zip(self.cells, self.seen) if seen]
+
+    def stats(self):
+        """Whole-pack report: cells seen, avg, min/max with their cell index, spread"""
+        if not self.seen_count:
+            return {'count': 0, 'avg': 0.0, 'min': 0.0, 'max': 0.0, 'spread': 0.0,
+                    'min_cell': None, 'max_cell': None}
+        unit_scale = self.unit_scale
+        return {
+            'count': self.seen_count,
+            'avg': self.average,
+            'min': self.min_value * unit_scale,
+            'max': self.max_value * unit_scale,
+            'spread': (self.max_value - self.min_value) * unit_scale,
+            'min_cell': self.min_index,
+            'max_cell': self.max_index,
+        }
+
+
 class CellDataAggregator:
     """A stateful class to aggregate and average cell voltage and temperature data."""
     def __init__(self):
-        self.voltages = {}
-        self.temperatures = {}
-
-    def _parse_data(self, data):
-        """Parses an 8-byte payload into 4 signed 16-bit integers."""
-        values = []
-        for i in range(0, 8, 2):
-            val = int.from_bytes(data[i:i+2], 'little', signed=False)
-            values.append(val)
-        return values
+        self.voltages = CellBank(CELL_VOLTAGE_IDS, 0.0001)
+        self.temperatures = CellBank(CELL_TEMPERATURE_IDS, 0.1, truncate=True)
 
     def process_voltage(self, can_id, data):
-        """Processes a voltage CAN message, updates state, and returns aggregated data."""
-        self.voltages[can_id] = self._parse_data(data)
-        all_voltages = [v * 0.0001 for id_vals in self.voltages.values() for v in id_vals]
-        avg_voltage = statistics.mean(all_voltages) if all_voltages else 0.0
-        return all_voltages, avg_voltage
+        """Processes a voltage CAN message; returns (first cell index, its 4 volts, pack average)."""
+        offset, values = self.voltages.update(can_id, data)
+        return offset, values, self.voltages.average
 
     def process_temperature(self, can_id, data):
-        """Processes a temperature CAN message, updates state, and returns aggregated data."""
-        self.temperatures[can_id] = self._parse_data(data)
-        all_temps = [int(t * 0.1) for id_vals in self.temperatures.values() for t in id_vals]
-        avg_temp = statistics.mean(all_temps) if all_temps else 0.0
-        return all_temps, avg_temp
+        """Processes a temperature CAN message; returns (first cell index, its 4 temps, pack average)."""
+        offset, values = self.temperatures.update(can_id, data)
+        return offset, values, self.temperatures.average
 
 # Mapping from server field names to CSV column names
 
@@ -0,0 +1,116 @@
+import math
+from array import array
+from fnmatch import fnmatchcase
+
+import numpy as np
+
+MIN_CAPACITY = 16
+
+
+class SlotHistory:
+    """Fixed-capacity ring of recent (timestamp, value) samples for every layout slot.
+
+    Each slot owns `capacity` consecutive entries of two flat float64 buffers,
+    sized from its expected rate: `rates` maps field name globs to Hz (first
+    match wins, `default_rate` otherwise), times `seconds` and `headroom`. A
+    signal that arrives faster than expected still works; its ring just spans
+    less time.
+
+    The writer (the CAN loop) calls add() next to its store write. Readers
+    never lock: window() locates the requested samples by their sequence
+    numbers and returns NumPy views of the buffers when they are contiguous,
+    so nothing is copied on the event loop, which is also the writer. A
+    reader on another thread passes copy=True; samples the writer laps during
+    the copy are trimmed from the front of the result.
+    """
+
+    def __init__(self, layout, seconds=10.0, rates=None, default_rate=20.0, headroom=1.5):
+        self.layout = layout
+        self.seconds = seconds
+        self.offsets = []
+        self.capacities = []
+        total = 0
+        for field_name, (base, size) in layout.fields.items():
+            rate = default_rate
+            for pattern, pattern_rate in (rates or {}).items():
+                if fnmatchcase(field_name, pattern):
+                    rate = pattern_rate
+                    break
+            capacity = max(MIN_CAPACITY, math.ceil(rate * seconds * headroom))
+            for _ in range(size or 1):
+                self.offsets.append(total)
+                self.capacities.append(capacity)
+                total += capacity
+        self.written = [0] * len(layout)  # samples ever written per slot; the next one's sequence number
+
+        self._times = array('d', [0.0]) * total
+        self._values = array('d', [0.0]) * total
+        self.times = np.frombuffer(self._times, dtype=np.float64)
+        self.values = np.frombuffer(self._values, dtype=np.float64)
+
+    def add(self, slot, value, timestamp):
+        n = self.written[slot]
+        i = self.offsets[slot] + n % self.capacities[slot]
+        self._times[i] = timestamp
+        self._values[i] = value
+        self.written[slot] = n + 1
+
+    def _first_after(self, slot, first, end, since):
+        """Sequence number of the first kept sample newer than `since`"""
+        base, capacity, times = self.offsets[slot], self.capacities[slot], self._times
+        while first < end:
+            mid = (first + end) // 2
+            if times[base + mid % capacity] <= since:
+                first = mid + 1
+            else:
+                end = mid
+        return first
+
+    def window(self, slot, since=None, copy=False):
+        """(times, values) arrays of the slot's kept samples newer than `since`, oldest first"""
+        end = self.written[slot]
+        base, capacity = self.offsets[slot], self.capacities[slot]
+        first = max(0, end - capacity)
+        if since is not None:
+            first = self._first_after(slot, first, end, since)
+
+        count = end - first
+        start = base + first % capacity
+        if count <= base + capacity - start:
+            times, values = self.times[start:start + count], self.values[start:start + count]
+            if copy:
+                times, values = times.copy(), values.copy()
+        else:
+            # Wraps around the end of the ring: the only case that has to copy
+            wrapped = count - (base + capacity - start)
+            times = np.concatenate((self.times[start:base + capacity], self.times[base:base + wrapped]))
+            values = np.concatenate((self.values[start:base + capacity], self.values[base:base + wrapped]))
+
+        if copy:
+            lapped = self.written[slot] - capacity - first
+            if lapped > 0:
+                times, values = times[lapped:], values[lapped:]
+        return times, values
+
+    def read(self, field_name, index=None, since=None, copy=False):
+        """window() by field name (and element index for repeated fields), or None if unknown"""
+        slot = self.layout.slot(field_name, index)
+        if slot is None:
+            return None
+        return self.window(slot, since, copy)
+
+    def series(self, field_names, since=None, copy=False):
+        """{slot name: {"t": [...], "v": [...]}} of the given fields' samples newer than
+        `since`, one entry per slot with any (e.g. "diagnostics.cells_v[3]")"""
+        layout = self.layout
+        result = {}
+        for field_name in field_names:
+            base, size = layout.fields[field_name]
+            for slot in range(base, base + (size or 1)):
+                times, values = self.window(slot, since, copy)
+                if len(times):
+                    result[layout.slot_names[slot]] = {"t": times.tolist(), "v": values.tolist()}
+        return result
+
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
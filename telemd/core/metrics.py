@@ -0,0 +1,228 @@
+import asyncio
+import bisect
+import math
+import threading
+
+
+def exponential_buckets(start, factor, count):
+    """Upper bounds start, start*factor, ... (count of them)"""
+    return [start * factor ** i for i in range(count)]
+
+
+# 10 µs to ~10 s, doubling
+LATENCY_BUCKETS = exponential_buckets(10e-6, 2.0, 21)
+
+
+def _format_value(value):
+    if value != value:
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Gauge:
+    """Current value, either set directly or read from `func` at scrape time.
+
+    With a `label`, func returns {label value: value} and each item becomes
+    one series (e.g. a rate per CAN ID).
+    """
+
+    TYPE = "gauge"
+
+    def __init__(self, name, help, func=None, label=None):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.label = label
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.func is None:
+            return self.value
+        try:
+            return self.func()
+        except Exception:
+            return {} if self.label else math.nan
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        if self.label is None:
+            lines.append(f"{self.name} {_format_value(self.get())}")
+        else:
+            for key, value in self.get().items():
+                lines.append(f"{self.name}{_format_labels({self.label: key})} {_format_value(value)}")
+        return lines
+
+
+class Counter(Gauge):
+    """Monotonic count, incremented in place or read from `func` (e.g. an existing
+    statistics attribute); update it from one thread only"""
+
+    TYPE = "counter"
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two increments.
+
+    Besides the cumulative buckets Prometheus expects, counts also go into a
+    short rolling window (the current and previous rotate() periods), which
+    the live p50/p99 are estimated from. observe(), rotate() and the readers
+    share a lock, so the publisher thread can observe while the event loop
+    rotates and scrapes.
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.window = [0] * len(self.counts)
+        self.previous_window = [0] * len(self.counts)
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.window[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def rotate(self):
+        """Start a new rolling window period"""
+        fresh = [0] * len(self.counts)
+        with self.lock:
+            self.previous_window, self.window = self.window, fresh
+
+    def quantile(self, q, counts=None):
+        """Estimate quantile q by interpolating within its bucket (NaN if nothing was observed).
+
+        Defaults to the rolling window; pass self.counts for the whole run.
+        """
+        if counts is None:
+            with self.lock:
+                counts = [a + b for a, b in zip(self.window, self.previous_window)]
+        total = sum(counts)
+        if not total:
+            return math.nan
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                if i == len(self.bounds):
+                    return lower  # Beyond the last bound; the best we can say
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.bounds[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            counts, total_sum, total_count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds + [math.inf], counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels({'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{self.name}_sum {_format_value(total_sum)}")
+        lines.append(f"{self.name}_count {total_count}")
+
+        # Recent quantiles as a separate gauge, so a plain scrape shows them without PromQL
+        name = f"{self.name}_recent"
+        lines.append(f"# HELP {name} {self.help} (estimated quantiles of the last few seconds)")
+        lines.append(f"# TYPE {name} gauge")
+        for q in self.QUANTILES:
+            lines.append(f"{name}{_format_labels({'quantile': q})} {_format_value(self.quantile(q))}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _add_read(self, metric):
+        registered = self._add(metric)
+        if metric.func is not None:
+            registered.func = metric.func  # Re-registered by a new instance of the same component
+        return registered
+
+    def counter(self, name, help, func=None, label=None):
+        return self._add_read(Counter(name, help, func, label))
+
+    def gauge(self, name, help, func=None, label=None):
+        return self._add_read(Gauge(name, help, func, label))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, buckets))
+
+    def rotate(self):
+        for metric in self.metrics.values():
+            if isinstance(metric, Histogram):
+                metric.rotate()
+
+    def render(self):
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry the telemd components register their metrics with
+REGISTRY = MetricsRegistry()
+
+
+async def _handle_request(reader, writer, registry):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5.0)
+        while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b"\r\n", b"\n", b""):
+            pass  # Headers are of no interest
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            status, body = "200 OK", registry.render().encode()
+        else:
+            status, body = "404 Not Found", b"Not found; try /metrics\n"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(host="", port=9108, registry=REGISTRY):
+    """Serve GET /metrics (Prometheus text format) until cancelled"""
+    server = await asyncio.start_server(lambda r, w: _handle_request(r, w, registry), host or None, port)
+    print(f"Metrics on http://localhost:{port}/metrics")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,217 @@
+"""Latest value and timestamp of every telemd field in shared memory.
+
+The backend publishes its slot store into a named segment (SharedValueTable)
+after every batch of CAN frames; other processes on the car read it with
+SharedValueReader at memory speed, without a CAN socket or a WebSocket. This
+module only uses the standard library, so a consumer can copy it or load it
+by path without importing the rest of telemd:
+
+    python core/shared_values.py 'pack.*' 'dynamics.*_speed' --watch 0.5
+
+Segment layout (little endian):
+    0   magic "BEVOSHM1", version, slot count, layout offset/length, values offset, stamps offset (u32s)
+    32  sequence (u64): odd while the writer is copying, bumped by 2 per publish
+    40  writer pid (u64), 0 once the writer has closed the table
+    64  layout JSON: {"fields": {"name": [base slot, size or null]}, "slots": n}
+    then slot count float64 values (NaN = never set) and float64 timestamps (0 = never set)
+"""
+
+import argparse
+import fnmatch
+import json
+import math
+import os
+import struct
+import time
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+SHARED_VALUES_MAGIC = b"BEVOSHM1"
+SHARED_VALUES_VERSION = 1
+HEADER = struct.Struct("<8sIIIIII")
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = 32
+WRITER_PID_OFFSET = 40
+HEADER_SIZE = 64
+
+_tables = set()  # Names of the tables this process writes, so a reader here leaves their tracking alone
+
+
+def _field_matches(field_name, patterns):
+    """core.value_store.field_matches, copied to keep this module standard library only:
+    a bare category ("pack") means all of it"""
+    return any(fnmatch.fnmatchcase(field_name, pattern if '.' in pattern or '*' in pattern else pattern + '.*')
+               for pattern in patterns)
+
+
+class SharedValueTable:
+    """Writer side: a fixed-layout copy of a core.value_store.SlotStore in a named segment.
+
+    publish() is a seqlock write: the sequence goes odd, both arrays are
+    copied in, and it goes even again, so readers can tell a torn copy from
+    a consistent one without ever blocking the writer. A segment left behind
+    by a crashed run is replaced.
+
+    Like interfaces/frame_ring.py, this relies on x86-64 keeping stores (and
+    loads) in program order; nothing here can issue a memory barrier. On a
+    weakly ordered CPU such as ARM a reader could see the closing sequence
+    number before all of the copied values.
+    """
+
+    def __init__(self, layout, name="telemd_values"):
+        fields = {field_name: [base, size] for field_name, (base, size) in layout.fields.items()}
+        layout_json = json.dumps({"fields": fields, "slots": len(layout)}, separators=(",", ":")).encode()
+        self.slots = len(layout)
+        values_offset = HEADER_SIZE + (len(layout_json) + 7) // 8 * 8
+        stamps_offset = values_offset + 8 * self.slots
+        size = stamps_offset + 8 * self.slots
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self.name = name
+        _tables.add(name)
+        buf = self.shm.buf
+        buf[HEADER_SIZE:HEADER_SIZE + len(layout_json)] = layout_json
+        HEADER.pack_into(buf, 0, SHARED_VALUES_MAGIC, SHARED_VALUES_VERSION, self.slots,
+                         HEADER_SIZE, len(layout_json), values_offset, stamps_offset)
+        SEQUENCE.pack_into(buf, WRITER_PID_OFFSET, os.getpid())
+        self.sequence = 0
+        self.publishes = 0
+        self._values = buf[values_offset:stamps_offset]
+        self._stamps = buf[stamps_offset:size]
+        self._values[:] = memoryview(array('d', [math.nan]) * self.slots).cast('B')  # Stamps start zeroed
+
+    def publish(self, values, stamps):
+        """Copy the current values and stamps arrays (array('d') of the layout's slot count) in"""
+        buf = self.shm.buf
+        self.sequence += 1
+        SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self.sequence)
+        self._values[:] = memoryview(values).cast('B')
+        self._stamps[:] = memoryview(stamps).cast('B')
+        self.sequence += 1
+        SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self.sequence)
+        self.publishes += 1
+
+    def close(self):
+        """Mark the table closed for readers and remove the segment"""
+        SEQUENCE.pack_into(self.shm.buf, WRITER_PID_OFFSET, 0)
+        self._values.release()
+        self._stamps.release()
+        self.shm.close()
+        self.shm.unlink()
+        _tables.discard(self.name)
+
+
+def _attach(name):
+    """Open an existing segment without this process's resource tracker unlinking it at exit"""
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        if name not in _tables:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedValueReader:
+    """Reader side: consistent snapshots of the table a SharedValueTable publishes.
+
+    read() copies both arrays between two reads of the sequence and retries
+    while the writer was mid-copy, so a snapshot never mixes two publishes.
+    """
+
+    def __init__(self, name="telemd_values", retries=100):
+        self.shm = _attach(name)
+        self.name = name
+        self.retries = retries
+        buf = self.shm.buf
+        magic, version, self.slots, layout_offset, layout_length, values_offset, stamps_offset = \
+            HEADER.unpack_from(buf, 0)
+        if magic != SHARED_VALUES_MAGIC or version != SHARED_VALUES_VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} is not a telemd value table (version {SHARED_VALUES_VERSION})")
+        layout = json.loads(bytes(buf[layout_offset:layout_offset + layout_length]))
+        self.fields = {field_name: (base, size) for field_name, (base, size) in layout["fields"].items()}
+        self._values_offset, self._stamps_offset = values_offset, stamps_offset
+        self.sequence = 0  # Of the last consistent read
+
+    def is_current(self):
+        """False once the writer has closed this table (a restarted backend makes a new one)"""
+        return SEQUENCE.unpack_from(self.shm.buf, WRITER_PID_OFFSET)[0] != 0
+
+    def _read_range(self, first, count):
+        buf = self.shm.buf
+        values_start = self._values_offset + 8 * first
+        stamps_start = self._stamps_offset + 8 * first
+        for _ in range(self.retries):
+            sequence = SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)[0]
+            if sequence & 1:
+                continue
+            values = bytes(buf[values_start:values_start + 8 * count])
+            stamps = bytes(buf[stamps_start:stamps_start + 8 * count])
+            if SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)[0] == sequence:
+                self.sequence = sequence
+                return array('d', values), array('d', stamps)
+        raise TimeoutError(f"No consistent read of {self.name} in {self.retries} tries")
+
+    def read(self):
+        """(values, stamps) of every slot as arrays, from one publish"""
+        return self._read_range(0, self.slots)
+
+    def get(self, field_name):
+        """(value, timestamp) of one field; a repeated field gives lists. Unset is NaN / 0"""
+        base, size = self.fields[field_name]
+        values, stamps = self._read_range(base, size or 1)
+        if size is None:
+            return values[0], stamps[0]
+        return list(values), list(stamps)
+
+    def snapshot(self, patterns=None):
+        """{field_name: (value, timestamp)} of the set fields matching the glob patterns (all by default);
+        a bare category like "pack" means all of "pack.*"
+        """
+        values, stamps = self.read()
+        result = {}
+        for field_name, (base, size) in self.fields.items():
+            if patterns and not _field_matches(field_name, patterns):
+                continue
+            if size is None:
+                if stamps[base]:
+                    result[field_name] = (values[base], stamps[base])
+            elif any(stamps[base:base + size]):
+                result[field_name] = (list(values[base:base + size]), max(stamps[base:base + size]))
+        return result
+
+    def close(self):
+        self.shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print live telemd values from shared memory")
+    parser.add_argument("patterns", nargs="*", help="field name globs, e.g. pack.* (default: all)")
+    parser.add_argument("--name", default="telemd_values", help="shared memory segment name")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="print again every SECONDS")
+    args = parser.parse_args()
+
+    reader = SharedValueReader(args.name)
+    try:
+        while True:
+            now = time.time()
+            for field_name, (value, timestamp) in sorted(reader.snapshot(args.patterns).items()):
+                print(f"{field_name}: {value} (age: {now - timestamp:.3f}s)")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+            print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import struct
+import time
+
+from core.field_mappings import (
+    CAN_SIGNALS, CELL_TEMPERATURE_IDS, CELL_VOLTAGE_IDS, get_protobuf_field_and_index,
+)
+from interfaces.recorder import FRAME_FILE_MAGIC, FRAME_RECORD, pack_frame
+
+RECORD_TIMESTAMP = struct.Struct("<d")  # leading field of every FRAME_RECORD
+
+
+def changed(value, previous):
+    return previous is not None and value != previous
+
+
+def above(limit):
+    """Predicate true while the value (or any element of a repeated field) exceeds limit"""
+    def predicate(value, previous):
+        if isinstance(value, (int, float)):
+            return value > limit
+        return any(item > limit for item in value)  # NaN (unset) never exceeds it
+    return predicate
+
+
+def below(limit):
+    """Predicate true while the value (and every element of a repeated field) is under limit"""
+    def predicate(value, previous):
+        if isinstance(value, (int, float)):
+            return value < limit
+        return not any(item >= limit for item in value)  # NaN (unset) counts as under it
+    return predicate
+
+
+def legs_opened(start, end):
+    """Frame predicate true when any shutdown leg byte in data[start:end] goes from closed to open"""
+    def predicate(data, previous):
+        return previous is not None and any(old and not new for old, new in zip(previous[start:end], data[start:end]))
+    return predicate
+
+
+class FrameTrigger:
+    """Fires on a raw frame of `can_ids` for which predicate(data, previous data of that ID) is true.
+
+    With `clear`, a fired trigger re-arms only once clear(data, previous) is
+    true instead of as soon as the predicate is false (hysteresis).
+    """
+
+    def __init__(self, name, can_ids, predicate, clear=None):
+        self.name = name
+        self.can_ids = tuple(can_ids)
+        self.predicate = predicate
+        self.clear = clear
+        self.previous = {}  # can_id -> last data
+        self.active = False
+        self.last_fired = None
+
+
+class FieldTrigger:
+    """Fires when predicate(value, previous value) is true for a decoded store field.
+
+    Evaluated whenever a frame that carries the field has been decoded; a
+    repeated field's value is its whole slot range. `clear` works as for
+    FrameTrigger.
+    """
+
+    def __init__(self, name, field_name, predicate, clear=None):
+        self.name = name
+        self.field_name = field_name
+        self.predicate = predicate
+        self.clear = clear
+        self.previous = None
+        self.active = False
+        self.last_fired = None
+
+
+def field_sources(signal_spec=CAN_SIGNALS):
+    """{field_name: {can_id, ...}} of the frames each store field is decoded from"""
+    sources = {}
+    for can_id, signals in signal_spec.items():
+        for signal in signals:
+            proto_info = get_protobuf_field_and_index(signal.name)
+            sources.setdefault(proto_info[0] if proto_info else signal.name, set()).add(can_id)
+    for field_name in ("diagnostics.cells_v", "pack.avg_cell_v"):
+        sources[field_name] = set(CELL_VOLTAGE_IDS)
+    for field_name in ("thermal.cells_temp", "pack.avg_cell_temp"):
+        sources[field_name] = set(CELL_TEMPERATURE_IDS)
+    return sources
+
+
+def default_triggers(cell_over_voltage=4.2, cell_over_temperature=60.0, voltage_hysteresis=0.05,
+                     temperature_hysteresis=2.0, shutdown_legs=False):
+    """Contactor changes and cell over-voltage/over-temperature, optionally shutdown leg trips.
+
+    A cell trigger re-arms once every cell is back below its limit minus the
+    hysteresis. The shutdown leg byte layout of 0x202/0x204 comes from the
+    simulator, not the CAN spec, so those triggers are off unless asked for.
+    """
+    triggers = [
+        FieldTrigger("contactor_change", "pack.contactor_state", changed),
+        FieldTrigger("cell_over_voltage", "diagnostics.cells_v", above(cell_over_voltage),
+                     below(cell_over_voltage - voltage_hysteresis)),
+        FieldTrigger("cell_over_temperature", "thermal.cells_temp", above(cell_over_temperature),
+                     below(cell_over_temperature - temperature_hysteresis)),
+    ]
+    if shutdown_legs:
+        triggers += [
+            FrameTrigger("shutdown_leg_1_6", (0x202,), legs_opened(2, 8)),
+            FrameTrigger("shutdown_leg_7_12", (0x204,), legs_opened(0, 6)),
+        ]
+    return triggers
+
+
+class FaultCapture:
+    """One pending capture window around a trigger"""
+
+    __slots__ = ("name", "trigger_time", "end_time", "deadline", "reasons")
+
+    def __init__(self, name, trigger_time, post_seconds):
+        self.name = name
+        self.trigger_time = trigger_time  # frame timestamp of the triggering frame
+        self.end_time = trigger_time + post_seconds
+        self.deadline = time.time() + post_seconds  # wall clock, in case the bus goes quiet
+        self.reasons = [name]
+
+
+class TriggerEngine:
+    """Keeps the last few seconds of raw frames and cuts a capture around faults.
+
+    record() packs every frame into a preallocated ring of recorder records,
+    sized for `max_frame_rate` over the pre- and post-trigger windows. check()
+    evaluates the triggers watching a frame's ID once it has been decoded into
+    `store`. Triggers are edge-triggered: one fires when its predicate turns
+    true and re-arms once it is false again (or its `clear` predicate is
+    true). A trigger that fired doesn't fire again within `cooldown` seconds
+    of frame time; those firings are only counted in `suppressed`.
+
+    When one fires, frames from `pre_seconds` before to `post_seconds` after
+    it are cut from the ring and handed to `on_capture(name, data)` as a
+    complete recorder file (interfaces/recorder.py format, so it replays
+    directly). Triggers firing while a window is open are noted on it.
+    """
+
+    def __init__(self, store, triggers, on_capture, pre_seconds=5.0, post_seconds=5.0,
+                 max_frame_rate=8000, sources=None, cooldown=60.0):
+        self.store = store
+        self.on_capture = on_capture
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.cooldown = cooldown
+        self.capacity = int(max_frame_rate * (pre_seconds + post_seconds))
+        self.ring = bytearray(self.capacity * FRAME_RECORD.size)
+        self.written = 0
+        self.capture = None
+        self.fired = 0
+        self.suppressed = 0
+        self.captures = 0
+
+        sources = field_sources() if sources is None else sources
+        self.watchers = {}  # can_id -> [trigger, ...]
+        for trigger in triggers:
+            if isinstance(trigger, FieldTrigger):
+                if trigger.field_name not in store.layout:
+                    print(f"[WARN] Trigger {trigger.name}: {trigger.field_name} is not a store field")
+                    continue
+                can_ids = sources.get(trigger.field_name, ())
+            else:
+                can_ids = trigger.can_ids
+            for can_id in can_ids:
+                self.watchers.setdefault(can_id, []).append(trigger)
+
+    def record(self, msg):
+        """Append one raw frame to the ring; finishes an open capture once its window has passed"""
+        record = pack_frame(msg)
+        offset = (self.written % self.capacity) * FRAME_RECORD.size
+        self.ring[offset:offset + FRAME_RECORD.size] = record
+        self.written += 1
+        if self.capture is not None and RECORD_TIMESTAMP.unpack_from(record)[0] > self.capture.end_time:
+            self._finish()
+
+    def poll(self, now=None):
+        """Finish an open capture whose window has passed on the wall clock (bus gone quiet)"""
+        if self.capture is not None and (time.time() if now is None else now) >= self.capture.deadline:
+            self._finish()
+
+    def _field_value(self, field_name):
+        base, size = self.store.layout.fields[field_name]
+        values = self.store.values
+        return values[base] if size is None else values[base:base + size]
+
+    def check(self, msg):
+        """Evaluate the triggers watching this frame's ID (call after it has been decoded)"""
+        triggers = self.watchers.get(msg.arbitration_id)
+        if not triggers:
+            return
+        for trigger in triggers:
+            if isinstance(trigger, FrameTrigger):
+                value = bytes(msg.data)
+                previous = trigger.previous.get(msg.arbitration_id)
+                trigger.previous[msg.arbitration_id] = value
+            else:
+                value = self._field_value(trigger.field_name)
+                previous, trigger.previous = trigger.previous, value
+            try:
+                if trigger.active and trigger.clear is not None:
+                    fired = not trigger.clear(value, previous)
+                else:
+                    fired = bool(trigger.predicate(value, previous))
+            except Exception as e:
+                print(f"[WARN] Trigger {trigger.name} failed: {e}")
+                fired = False
+            if fired and not trigger.active:
+                self._fire(trigger, msg.timestamp or time.time())
+            trigger.active = fired
+
+    def _fire(self, trigger, timestamp):
+        if trigger.last_fired is not None and timestamp - trigger.last_fired < self.cooldown:
+            self.suppressed += 1
+            return
+        trigger.last_fired = timestamp
+        self.fired += 1
+        if self.capture is not None:
+            self.capture.reasons.append(trigger.name)
+            print(f"Trigger {trigger.name} fired during the {self.capture.name} capture")
+            return
+        print(f"Trigger {trigger.name} fired; capturing {self.pre_seconds:g} s before to "
+              f"{self.post_seconds:g} s after")
+        self.capture = FaultCapture(trigger.name, timestamp, self.post_seconds)
+
+    def _records(self):
+        """Ring contents, oldest record first"""
+        if self.written <= self.capacity:
+            return bytes(self.ring[:self.written * FRAME_RECORD.size])
+        split = (self.written % self.capacity) * FRAME_RECORD.size
+        ring = memoryview(self.ring)
+        return b"".join((ring[split:], ring[:split]))
+
+    def _finish(self):
+        capture, self.capture = self.capture, None
+        records = self._records()
+        size = FRAME_RECORD.size
+        count = len(records) // size
+
+        # First record inside the window (records are in arrival order, so timestamps ascend)
+        start_time = capture.trigger_time - self.pre_seconds
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if RECORD_TIMESTAMP.unpack_from(records, mid * size)[0] < start_time:
+                lo = mid + 1
+            else:
+                hi = mid
+        end = count
+        while end > lo and RECORD_TIMESTAMP.unpack_from(records, (end - 1) * size)[0] > capture.end_time:
+            end -= 1
+
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(capture.trigger_time))
+        name = f"fault_{stamp}_{'+'.join(dict.fromkeys(capture.reasons))}.bin"
+        self.captures += 1
+        print(f"Fault capture {name}: {end - lo} frames")
+        self.on_capture(name, FRAME_FILE_MAGIC + records[lo * size:end * size])
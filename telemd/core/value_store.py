@@ -0,0 +1,233 @@
+from array import array
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
+from core.field_mappings import (
+    CAN_SIGNALS, CELL_TEMPERATURE_COUNT, CELL_VOLTAGE_COUNT, get_protobuf_field_and_index,
+)
+
+UNSET = float('nan')
+
+# Per-slot reducers over one publish window; slots without samples have count 0
+SlotWindow = namedtuple("SlotWindow", ["count", "minimum", "maximum", "total"])
+
+
+class FieldLayout:
+    """Fixed integer slots for every known telemetry field.
+
+    Scalar fields take one slot; repeated fields take `size` consecutive slots
+    starting at their base slot. Slots never move once assigned.
+    """
+
+    def __init__(self, fields=()):
+        self.fields = {}  # field_name -> (base_slot, size or None)
+        self.slots = {}  # (field_name, index or None) -> slot
+        self.slot_names = []  # slot -> "field" or "field[i]"
+        for field_name, size in fields:
+            self.add(field_name, size)
+
+    def add(self, field_name, size=None):
+        """Assign slots to a field (no-op if it already has them); returns the base slot"""
+        if field_name in self.fields:
+            return self.fields[field_name][0]
+
+        base = len(self.slot_names)
+        self.fields[field_name] = (base, size)
+        if size is None:
+            self.slots[(field_name, None)] = base
+            self.slot_names.append(field_name)
+        else:
+            for index in range(size):
+                self.slots[(field_name, index)] = base + index
+                self.slot_names.append(f"{field_name}[{index}]")
+        return base
+
+    def slot(self, field_name, index=None):
+        """Slot of a scalar field or one element of a repeated field, or None"""
+        return self.slots.get((field_name, index))
+
+    def __contains__(self, field_name):
+        return field_name in self.fields
+
+    def __len__(self):
+        return len(self.slot_names)
+
+
+def field_matches(field_name, patterns):
+    """Whether a field name matches any glob pattern; a bare category ("thermal") means all of it"""
+    return any(fnmatchcase(field_name, pattern if '.' in pattern or '*' in pattern else pattern + '.*')
+               for pattern in patterns)
+
+
+def build_field_layout(signal_spec=CAN_SIGNALS):
+    """Layout covering every decoded signal plus the aggregated cell fields"""
+    fields = []
+    for signals in signal_spec.values():
+        for signal in signals:
+            proto_info = get_protobuf_field_and_index(signal.name)
+            if proto_info:
+                field_name, _, size = proto_info
+            else:
+                field_name, size = signal.name, None
+            fields.append((field_name, size))
+
+    fields += [
+        ("diagnostics.cells_v", CELL_VOLTAGE_COUNT),
+        ("pack.avg_cell_v", None),
+        ("thermal.cells_temp", CELL_TEMPERATURE_COUNT),
+        ("pack.avg_cell_temp", None),
+    ]
+    return FieldLayout(fields)
+
+
+class SlotStore:
+    """Latest value and timestamp of every layout slot, in preallocated arrays.
+
+    Writers store with plain index writes (values[slot] = v; stamps[slot] = t).
+    Unset slots hold NaN with a zero timestamp. snapshot() is two array copies.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.values = array('d', [UNSET]) * len(layout)
+        self.stamps = array('d', [0.0]) * len(layout)
+
+    def set(self, slot, value, timestamp):
+        self.values[slot] = value
+        self.stamps[slot] = timestamp
+
+    def update(self, field_name, value, index=None, timestamp=0.0):
+        """Store by field name; a list without an index fills a repeated field from
+        its first slot. Returns False if the field has no slots."""
+        entry = self.layout.fields.get(field_name)
+        if entry is None:
+            return False
+
+        base, size = entry
+        if index is None and isinstance(value, list):
+            if size is None:
+                return False
+            for offset, item in enumerate(value[:size]):
+                if item is not None:
+                    self.values[base + offset] = item
+                    self.stamps[base + offset] = timestamp
+        elif size is None:
+            self.values[base] = value
+            self.stamps[base] = timestamp
+        elif index is not None and 0 <= index < size:
+            self.values[base + index] = value
+            self.stamps[base + index] = timestamp
+        else:
+            return False
+        return True
+
+    def snapshot(self):
+        """Copy of (values, stamps).
+
+        Stamps are copied first, so a write landing between the two copies can
+        only pair a newer value with an older stamp, never the reverse; a
+        reader tracking stamps then picks the value up again next time.
+        """
+        stamps = self.stamps[:]
+        return self.values[:], stamps
+
+    def field(self, field_name, values=None, stamps=None):
+        """(value, timestamp) of one field, or None if it has never been set.
+
+        Repeated fields come back as a list with None for unset elements and the
+        newest element timestamp.
+        """
+        entry = self.layout.fields.get(field_name)
+        if entry is None:
+            return None
+        values = self.values if values is None else values
+        stamps = self.stamps if stamps is None else stamps
+
+        base, size = entry
+        if size is None:
+            timestamp = stamps[base]
+            return (values[base], timestamp) if timestamp else None
+
+        field_stamps = stamps[base:base + size]
+        newest = max(field_stamps)
+        if not newest:
+            return None
+        return [value if timestamp else None
+                for value, timestamp in zip(values[base:base + size], field_stamps)], newest
+
+    def fields(self, values=None, stamps=None, changed_since=None, complete_only=False):
+        """{field_name: (value, timestamp)} for every field that has been set.
+
+        changed_since is a stamps array (e.g. from an earlier snapshot); only
+        fields with a newer slot are returned. complete_only skips repeated
+        fields that still have unset elements.
+        """
+        values = self.values if values is None else values
+        stamps = self.stamps if stamps is None else stamps
+
+        result = {}
+        for field_name, (base, size) in self.layout.fields.items():
+            if size is None:
+                timestamp = stamps[base]
+                if timestamp and (changed_since is None or timestamp > changed_since[base]):
+                    result[field_name] = (values[base], timestamp)
+                continue
+
+            end = base + size
+            field_stamps = stamps[base:end]
+            if changed_since is not None and \
+                    not any(new > old for new, old in zip(field_stamps, changed_since[base:end])):
+                continue
+            if complete_only and not all(field_stamps):
+                continue
+            newest = max(field_stamps)
+            if newest:
+                result[field_name] = ([value if timestamp else None
+                                       for value, timestamp in zip(values[base:end], field_stamps)], newest)
+        return result
+
+
+class WindowAggregator:
+    """Streaming count/min/max/sum of every slot between two take() calls.
+
+    The writer calls add() next to its store write, so every sample counts,
+    not just the one that happens to be latest when a publish comes round.
+    take() hands back the finished window and starts a new one. Both must
+    run on the same thread (the event loop).
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._reset()
+
+    def _reset(self):
+        self.count = array('d', [0.0]) * self.size
+        self.minimum = array('d', [float('inf')]) * self.size
+        self.maximum = array('d', [float('-inf')]) * self.size
+        self.total = array('d', [0.0]) * self.size
+
+    def add(self, slot, value):
+        if value != value:  # NaN would poison the sum and never compare
+            return
+        self.count[slot] += 1
+        self.total[slot] += value
+        if value < self.minimum[slot]:
+            self.minimum[slot] = value
+        if value > self.maximum[slot]:
+            self.maximum[slot] = value
+
+    def take(self):
+        """Return the current SlotWindow and start an empty one"""
+        window = SlotWindow(self.count, self.minimum, self.maximum, self.total)
+        self._reset()
+        return window
+
+
+def merge_windows(older, newer):
+    """One SlotWindow covering both, e.g. when a window couldn't be sent on its own"""
+    return SlotWindow(
+        array('d', map(float.__add__, older.count, newer.count)),
+        array('d', map(min, older.minimum, newer.minimum)),
+        array('d', map(max, older.maximum, newer.maximum)),
+        array('d', map(float.__add__, older.total, newer.total)),
+    )
@@ -1,9 +1,9 @@
 """
 Data logging components.
 
-Contains CSV logging and data persistence modules.
+Contains CSV and binary logging and data persistence modules.
 """
 
-from .logger import CSVTimeSeriesLogger, LatestValuesCache
+from .logger import CSVTimeSeriesLogger, BinaryTimeSeriesLogger, BinaryLogReader, LatestValuesCache
 
-__all__ = ['CSVTimeSeriesLogger', 'LatestValuesCache'] 
\ No newline at end of file
+__all__ = ['CSVTimeSeriesLogger', 'BinaryTimeSeriesLogger', 'BinaryLogReader', 'LatestValuesCache'] 
\ No newline at end of file
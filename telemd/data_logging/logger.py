@@ -1,25 +1,98 @@
+import bisect
 import csv
+import json
+import math
+import mmap
 import os
+import re
+import struct
 import time
 import threading
-from collections import deque, defaultdict
+from collections import deque
 from datetime import datetime
 
+import numpy as np
+
+# One binary log record: timestamp (float64) + value (float32), little-endian
+BINARY_RECORD = struct.Struct('<df')
+BINARY_DTYPE = np.dtype([('timestamp', '<f8'), ('value', '<f4')])
+BINARY_MANIFEST = "fields.json"
+
+
+def _format_value(value):
+    """(value type, text) of a logged value as it appears in the CSV"""
+    if value.__class__ is float:
+        return 'numeric', repr(value)
+    if isinstance(value, bool):
+        return 'bool', str(value)
+    if isinstance(value, (int, float)):
+        return 'numeric', str(value)
+    if isinstance(value, list):
+        return 'array', ','.join(map(str, value))
+    return 'string', str(value)
+
+
+def _csv_cell(text):
+    """text quoted the way csv.writer does it (minimal quoting)"""
+    if ',' in text or '"' in text or '\r' in text or '\n' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _read_lines(binary_file, length):
+    """Decoded lines of the next `length` bytes of binary_file, read as they are consumed"""
+    while length > 0:
+        line = binary_file.readline(length)
+        if not line:
+            return
+        length -= len(line)
+        yield line.decode()
+
 
 class CSVTimeSeriesLogger:
-    """CSV-based time-series logger with timestamp rows and field columns"""
+    """Append-only CSV time-series logger.
+
+    Rows are written in long format (timestamp, datetime, field, value), so new
+    fields never change the header and each flush only appends the buffered
+    rows. Flush cost is independent of how long the session has been running.
+
+    log_value() only queues the raw value, since it runs for every decoded
+    value on the event loop. A writer thread formats and appends the queued
+    rows through a file handle kept open for the session, every
+    flush_interval or as soon as buffer_size rows are waiting. If the writer
+    falls behind by more than max_buffer rows, the oldest queued rows are
+    dropped and counted in dropped_rows; a failed flush is logged, counted in
+    write_errors and the writer carries on with the next one.
+
+    While writing it keeps a sparse in-memory time index (timestamp -> byte
+    offset, one entry every index_interval seconds or index_rows rows), so range
+    queries seek straight to the window instead of scanning the whole file.
+
+    With binary=True numeric values are also written to a BinaryTimeSeriesLogger
+    next to the CSV, and history/statistics queries are answered from its
+    memory-mapped columns instead of parsing the CSV. The 'value' of rows
+    returned by get_field_history() and get_time_range_data() is then a float
+    at float32 precision (booleans as 0.0/1.0); rows read from the CSV carry
+    the logged text, as get_latest_values() does.
+    """
+
+    FIELDNAMES = ['timestamp', 'datetime', 'field', 'value']
     
-    def __init__(self, base_filename="telemetry_history", buffer_size=333, flush_interval=1.0):
+    def __init__(self, base_filename="telemetry_history", buffer_size=333, flush_interval=1.0, binary=False,
+                 index_interval=1.0, index_rows=1000, max_buffer=200000):
         self.base_filename = base_filename
         self.buffer_size = buffer_size
         self.flush_interval = flush_interval
-        self.buffer = deque(maxlen=buffer_size)
-        self.lock = threading.Lock()
+        self.max_buffer = max_buffer
+        self.buffer = deque(maxlen=max_buffer)  # (timestamp, field_name, value) waiting for the writer thread
+        self.dropped_rows = 0
+        self.write_errors = 0
+        self.lock = threading.Lock()  # Guards the time index and file_size
+        self.write_lock = threading.Lock()  # One flush at a time
         self.last_flush_time = time.time()
         
-        # Track all fields we've seen and their latest values
-        self.all_fields = set()  # Set of all field names
-        self.latest_values = {}  # field_name -> (value, timestamp, value_type)
+        # Latest value of every field, formatted on request
+        self.latest_values = {}  # field_name -> (value, timestamp)
         
         # Create logs directory if it doesn't exist
         self.logs_dir = "logs"
@@ -28,116 +101,178 @@ class CSVTimeSeriesLogger:
         # Create timestamped filename for this session in logs folder
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.filename = os.path.join(self.logs_dir, f"{base_filename}_{timestamp}.csv")
+
+        # Rows within a batch share a timestamp, so remember the last formatted one
+        self._last_datetime = (None, '')
+        self._field_cells = {}  # field_name -> its quoted CSV cell
+
+        # Sparse time index: index_times[i] is the timestamp of the row starting
+        # at byte index_offsets[i]. file_size only covers completed flushes.
+        self.index_interval = index_interval
+        self.index_rows = index_rows
+        self.index_times = []
+        self.index_offsets = []
+        self.rows_since_index = 0
+        self.file_size = 0
         
         # Initialize CSV file with headers
         self._init_csv_file()
+
+        # Optional binary columns in logs/<session>/ alongside the CSV
+        self.binary_logger = None
+        self.binary_reader = None
+        self.binary_complete = True  # False once a value only made it into the CSV
+        if binary:
+            session_dir = os.path.splitext(self.filename)[0]
+            self.binary_logger = BinaryTimeSeriesLogger(session_dir, buffer_size, flush_interval)
+            self.binary_reader = BinaryLogReader(session_dir)
+
+        self.csvfile = open(self.filename, 'ab')
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self.writer_thread = threading.Thread(target=self._run, name="csv-writer", daemon=True)
+        self.writer_thread.start()
+
+    @property
+    def all_fields(self):
+        """Names of all fields logged so far"""
+        return set(self.latest_values)
         
     def _init_csv_file(self):
-        """Initialize CSV file with timestamp and field headers"""
+        """Initialize CSV file with the long-format header"""
         with open(self.filename, 'w', newline='') as csvfile:
             writer = csv.writer(csvfile)
-            # Write header row: timestamp, datetime, then all field names
-            header = ['timestamp', 'datetime']
-            writer.writerow(header)
+            writer.writerow(self.FIELDNAMES)
+        self.file_size = os.path.getsize(self.filename)
         print(f"Created new CSV log file for this session: {self.filename}")
+
+    def _format_datetime(self, timestamp):
+        """Human-readable timestamp, cached for consecutive identical timestamps"""
+        last_timestamp, last_text = self._last_datetime
+        if timestamp != last_timestamp:
+            last_text = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            self._last_datetime = (timestamp, last_text)
+        return last_text
     
     def log_value(self, field_name, value, timestamp=None):
-        """Log a telemetry value with timestamp"""
+        """Queue a telemetry value with timestamp for the writer thread"""
         if timestamp is None:
             timestamp = time.time()
-            
-        # Determine value type and convert to string
-        if isinstance(value, bool):
-            value_type = 'bool'
-            value_str = str(value)
-        elif isinstance(value, (int, float)):
-            value_type = 'numeric'
-            value_str = str(value)
-        elif isinstance(value, list):
-            value_type = 'array'
-            value_str = ','.join(map(str, value))
-        else:
-            value_type = 'string'
-            value_str = str(value)
-        
-        # Update latest values and track new fields
-        with self.lock:
-            self.latest_values[field_name] = (value_str, timestamp, value_type)
-            self.all_fields.add(field_name)
-            
-            # Add to buffer for periodic flushing
-            self.buffer.append((timestamp, field_name, value_str))
-        
-        # Check if we should flush
-        current_time = time.time()
-        if (len(self.buffer) >= self.buffer_size or 
-            current_time - self.last_flush_time >= self.flush_interval):
-            self._flush_buffer()
+        self.latest_values[field_name] = (value, timestamp)
+        buffer = self.buffer
+        if len(buffer) == self.max_buffer:
+            self.dropped_rows += 1  # append() pushes the oldest row out
+        buffer.append((timestamp, field_name, value))
+        if len(buffer) >= self.buffer_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._flush_buffer()
+            except Exception as e:
+                # Keep the thread alive: losing one flush beats losing the rest of the session
+                self.write_errors += 1
+                print(f"CSV log write error: {e}")
     
     def _flush_buffer(self):
-        """Flush buffered data to CSV file in time-series format"""
-        with self.lock:
-            if not self.buffer:
+        """Append buffered rows to the CSV file (and the binary columns)"""
+        with self.write_lock:
+            buffer = self.buffer
+            # popleft() is safe against log_value() appending at the same time
+            rows = [buffer.popleft() for _ in range(len(buffer))]
+            if not rows:
                 return
-            
-            # Group data by timestamp
-            timestamp_data = defaultdict(dict)
-            for timestamp, field_name, value_str in self.buffer:
-                timestamp_data[timestamp][field_name] = value_str
-            
-            # Read existing data to merge with new data
-            existing_data = {}
-            if os.path.exists(self.filename) and os.path.getsize(self.filename) > 0:
-                with open(self.filename, 'r', newline='') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    for row in reader:
-                        ts = float(row['timestamp'])
-                        existing_data[ts] = {k: v for k, v in row.items() if k not in ['timestamp', 'datetime']}
-            
-            # Merge new data with existing data
-            for timestamp in timestamp_data:
-                if timestamp in existing_data:
-                    existing_data[timestamp].update(timestamp_data[timestamp])
-                else:
-                    existing_data[timestamp] = timestamp_data[timestamp]
-            
-            # Write all data back to file
-            with open(self.filename, 'w', newline='') as csvfile:
-                # Create header with all fields
-                all_fields = sorted(list(self.all_fields))
-                fieldnames = ['timestamp', 'datetime'] + all_fields
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                
-                # Write all timestamps
-                for timestamp in sorted(existing_data.keys()):
-                    row = {
-                        'timestamp': timestamp,
-                        'datetime': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                    }
-                    # Add field values
-                    for field in all_fields:
-                        row[field] = existing_data[timestamp].get(field, '')
-                    writer.writerow(row)
-            
-            # print(f"Flushed {len(self.buffer)} data points to {self.filename}")
-            
-            # Clear buffer and update flush time
-            self.buffer.clear()
+
+            binary_logger = self.binary_logger
+            # Encode rows ourselves (as csv.writer would) so index entries get exact byte
+            # offsets; rows of one CAN batch share a timestamp, so its text is reused
+            chunks = []
+            lines = []
+            index_times, index_offsets = [], []
+            last_index_time = self.index_times[-1] if self.index_times else None
+            offset = self.file_size
+            field_cells = self._field_cells
+            last_timestamp, prefix = None, ''
+            for timestamp, field_name, value in rows:
+                if (last_index_time is None or self.rows_since_index >= self.index_rows or
+                        timestamp - last_index_time >= self.index_interval):
+                    chunk = ''.join(lines).encode()
+                    chunks.append(chunk)
+                    offset += len(chunk)
+                    lines.clear()
+                    index_times.append(timestamp)
+                    index_offsets.append(offset)
+                    last_index_time = timestamp
+                    self.rows_since_index = 0
+                if timestamp != last_timestamp:
+                    prefix = f"{timestamp},{self._format_datetime(timestamp)},"
+                    last_timestamp = timestamp
+                field_cell = field_cells.get(field_name)
+                if field_cell is None:
+                    field_cell = field_cells[field_name] = _csv_cell(field_name)
+                value_type, value_str = _format_value(value)
+                if value_type != 'numeric' and value_type != 'bool':
+                    value_str = _csv_cell(value_str)
+                lines.append(f"{prefix}{field_cell},{value_str}\r\n")
+                self.rows_since_index += 1
+            chunk = ''.join(lines).encode()
+            chunks.append(chunk)
+
+            self.csvfile.write(b''.join(chunks))
+            self.csvfile.flush()
+            if binary_logger:
+                if not binary_logger.log_rows(rows):
+                    self.binary_complete = False
+                binary_logger.flush()
+
+            # Only index what is on disk, so queries never read past the end
+            with self.lock:
+                self.index_times.extend(index_times)
+                self.index_offsets.extend(index_offsets)
+                self.file_size = offset + len(chunk)
             self.last_flush_time = time.time()
     
+    def _iter_rows(self, start_time, end_time):
+        """Yield (timestamp, datetime, field, value) rows with start_time <= timestamp <= end_time.
+
+        Uses the time index to read only the byte range that can contain the
+        window, one line at a time, so a caller that stops early stops the read
+        too. Assumes rows are appended in time order.
+        """
+        with self.lock:
+            first = bisect.bisect_left(self.index_times, start_time) - 1
+            last = bisect.bisect_right(self.index_times, end_time)
+            # Fall back to just after the header when the window starts before the index
+            start_offset = self.index_offsets[first] if first >= 0 else None
+            end_offset = self.index_offsets[last] if last < len(self.index_offsets) else self.file_size
+
+        with open(self.filename, 'rb') as csvfile:
+            if start_offset is None:
+                csvfile.readline()  # header
+                start_offset = csvfile.tell()
+            csvfile.seek(start_offset)
+            for row in csv.reader(_read_lines(csvfile, end_offset - start_offset)):
+                if len(row) != 4:
+                    continue
+                timestamp = float(row[0])
+                if start_time <= timestamp <= end_time:
+                    yield timestamp, row[1], row[2], row[3]
+
     def get_latest_values(self):
         """Get the latest value for each field (from memory cache)"""
-        with self.lock:
-            return {
-                field_name: {
-                    'timestamp': timestamp,
-                    'datetime': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
-                    'value': value,
-                    'value_type': value_type
-                }
-                for field_name, (value, timestamp, value_type) in self.latest_values.items()
+        latest = {}
+        for field_name, (value, timestamp) in list(self.latest_values.items()):
+            value_type, value_str = _format_value(value)
+            latest[field_name] = {
+                'timestamp': timestamp,
+                'datetime': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+                'value': value_str,
+                'value_type': value_type
             }
+        return latest
     
     def get_field_history(self, field_name, start_time=None, end_time=None, max_rows=10000):
         """Get historical data for a specific field"""
@@ -145,40 +280,46 @@ class CSVTimeSeriesLogger:
             start_time = time.time() - 3600  # Last hour
         if end_time is None:
             end_time = time.time()
+
+        if self.binary_reader and self.binary_reader.has_field(field_name):
+            records = self.binary_reader.window(field_name, start_time, end_time)[:max_rows]
+            return [
+                {
+                    'timestamp': timestamp,
+                    'datetime': self._format_datetime(timestamp),
+                    'value': value
+                }
+                for timestamp, value in zip(records['timestamp'].tolist(), records['value'].tolist())
+            ]
         
         data = []
-        with open(self.filename, 'r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                timestamp = float(row['timestamp'])
-                if (start_time <= timestamp <= end_time and 
-                    field_name in row and row[field_name]):
-                    data.append({
-                        'timestamp': timestamp,
-                        'datetime': row['datetime'],
-                        'value': row[field_name]
-                    })
-                    if len(data) >= max_rows:
-                        break
+        for timestamp, datetime_str, row_field, value in self._iter_rows(start_time, end_time):
+            if row_field == field_name:
+                data.append({
+                    'timestamp': timestamp,
+                    'datetime': datetime_str,
+                    'value': value
+                })
+                if len(data) >= max_rows:
+                    break
         
         return data
     
     def get_time_range_data(self, start_time=None, end_time=None, max_rows=10000):
-        """Get all data for a time range"""
+        """Get all (timestamp, datetime, field, value) rows for a time range"""
         if start_time is None:
             start_time = time.time() - 3600  # Last hour
         if end_time is None:
             end_time = time.time()
+
+        if self.binary_reader and self.binary_complete:
+            return self._binary_time_range_data(start_time, end_time, max_rows)
         
         data = []
-        with open(self.filename, 'r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                timestamp = float(row['timestamp'])
-                if start_time <= timestamp <= end_time:
-                    data.append(row)
-                    if len(data) >= max_rows:
-                        break
+        for row in self._iter_rows(start_time, end_time):
+            data.append(dict(zip(self.FIELDNAMES, row)))
+            if len(data) >= max_rows:
+                break
         
         return data
     
@@ -186,18 +327,17 @@ class CSVTimeSeriesLogger:
         """Get basic statistics for a field over the last N hours"""
         end_time = time.time()
         start_time = end_time - (hours * 3600)
+
+        if self.binary_reader and self.binary_reader.has_field(field_name):
+            return self.binary_reader.statistics(field_name, start_time, end_time)
         
         values = []
-        with open(self.filename, 'r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if field_name in row and row[field_name]:
-                    timestamp = float(row['timestamp'])
-                    if start_time <= timestamp <= end_time:
-                        try:
-                            values.append(float(row[field_name]))
-                        except ValueError:
-                            continue
+        for _, _, row_field, value in self._iter_rows(start_time, end_time):
+            if row_field == field_name:
+                try:
+                    values.append(float(value))
+                except ValueError:
+                    continue
         
         if not values:
             return {'count': 0, 'avg': 0, 'min': 0, 'max': 0}
@@ -209,6 +349,26 @@ class CSVTimeSeriesLogger:
             'max': max(values)
         }
     
+    def _binary_time_range_data(self, start_time, end_time, max_rows):
+        """get_time_range_data rows merged from every binary column"""
+        rows = []
+        for field_name in self.binary_reader.fields():
+            records = self.binary_reader.window(field_name, start_time, end_time)[:max_rows]
+            rows.extend(
+                (timestamp, field_name, value)
+                for timestamp, value in zip(records['timestamp'].tolist(), records['value'].tolist())
+            )
+        rows.sort(key=lambda row: row[0])
+        return [
+            {
+                'timestamp': timestamp,
+                'datetime': self._format_datetime(timestamp),
+                'field': field_name,
+                'value': value
+            }
+            for timestamp, field_name, value in rows[:max_rows]
+        ]
+    
     def export_time_range(self, output_filename, start_time=None, end_time=None):
         """Export a time range to a new CSV file"""
         if start_time is None:
@@ -231,60 +391,271 @@ class CSVTimeSeriesLogger:
         return self.filename
     
     def shutdown(self):
-        """Clean shutdown - flush remaining data"""
+        """Clean shutdown - stop the writer thread and flush remaining data"""
+        self._stopping = True
+        self._wakeup.set()
+        self.writer_thread.join(5.0)
         self._flush_buffer()
+        self.csvfile.close()
+        if self.binary_logger:
+            self.binary_logger.shutdown()
         print(f"CSVTimeSeriesLogger shutdown complete. Log file: {self.filename}")
 
 
+class BinaryTimeSeriesLogger:
+    """Column-per-field binary logger for numeric telemetry.
+
+    Each field gets its own append-only file of fixed 12-byte records
+    (timestamp float64, value float32) inside the session directory, plus a
+    fields.json manifest mapping field names to files. Read it back with
+    BinaryLogReader. Finite values beyond the float32 range are stored as
+    +/-inf and counted in `overflows`.
+    """
+
+    def __init__(self, session_dir, buffer_size=333, flush_interval=1.0):
+        self.session_dir = session_dir
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.last_flush_time = time.time()
+
+        self.files = {}  # field_name -> file name inside session_dir
+        self.handles = {}  # field_name -> open append handle
+        self.pending = {}  # field_name -> bytearray of unflushed records
+        self.pending_count = 0
+        self.overflows = 0
+
+        os.makedirs(self.session_dir, exist_ok=True)
+        self._write_manifest()
+
+    def _file_for(self, field_name):
+        """Pick a filesystem-safe, unique file name for a new field"""
+        base = re.sub(r'[^A-Za-z0-9_.-]', '_', field_name)
+        name = f"{base}.bin"
+        used = set(self.files.values())
+        suffix = 1
+        while name in used:
+            name = f"{base}_{suffix}.bin"
+            suffix += 1
+        return name
+
+    def _write_manifest(self):
+        """Atomically rewrite the field -> file manifest"""
+        path = os.path.join(self.session_dir, BINARY_MANIFEST)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"record": "<f8 timestamp, <f4 value", "fields": self.files}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _pack(self, timestamp, value):
+        """One record; a value beyond the float32 range becomes +/-inf"""
+        try:
+            return BINARY_RECORD.pack(timestamp, value)
+        except (OverflowError, struct.error):
+            self.overflows += 1
+            return BINARY_RECORD.pack(timestamp, math.inf if value > 0 else -math.inf)
+
+    def log_value(self, field_name, value, timestamp=None):
+        """Buffer a numeric value; returns False for values that can't be stored"""
+        if isinstance(value, bool):
+            value = float(value)
+        elif not isinstance(value, (int, float)):
+            return False
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.lock:
+            records = self.pending.get(field_name)
+            if records is None:
+                if field_name not in self.files:
+                    self.files[field_name] = self._file_for(field_name)
+                    self._write_manifest()
+                records = self.pending[field_name] = bytearray()
+            records += self._pack(timestamp, value)
+            self.pending_count += 1
+
+        current_time = time.time()
+        if (self.pending_count >= self.buffer_size or
+                current_time - self.last_flush_time >= self.flush_interval):
+            self.flush()
+        return True
+
+    def log_rows(self, rows):
+        """Buffer (timestamp, field_name, value) rows in one go; returns False if any value can't be stored"""
+        complete = True
+        pack = BINARY_RECORD.pack
+        pending = self.pending
+        with self.lock:
+            for timestamp, field_name, value in rows:
+                if value.__class__ is not float and not isinstance(value, (int, float)):
+                    complete = False
+                    continue
+                records = pending.get(field_name)
+                if records is None:
+                    if field_name not in self.files:
+                        self.files[field_name] = self._file_for(field_name)
+                        self._write_manifest()
+                    records = pending[field_name] = bytearray()
+                try:
+                    records += pack(timestamp, value)
+                except (OverflowError, struct.error):
+                    records += self._pack(timestamp, value)
+            self.pending_count += len(rows)
+        return complete
+
+    def flush(self):
+        """Append all pending records to their column files"""
+        with self.lock:
+            for field_name, records in self.pending.items():
+                handle = self.handles.get(field_name)
+                if handle is None:
+                    path = os.path.join(self.session_dir, self.files[field_name])
+                    handle = self.handles[field_name] = open(path, 'ab')
+                handle.write(records)
+                handle.flush()
+            self.pending.clear()
+            self.pending_count = 0
+            self.last_flush_time = time.time()
+
+    def shutdown(self):
+        """Flush remaining records and close column files"""
+        self.flush()
+        with self.lock:
+            for handle in self.handles.values():
+                handle.close()
+            self.handles.clear()
+
+
+class BinaryLogReader:
+    """Memory-mapped reader for a BinaryTimeSeriesLogger session directory.
+
+    Columns are returned as NumPy structured arrays ('timestamp', 'value')
+    viewing the mapped file directly, so nothing is parsed or copied. Records
+    are assumed to be appended in time order.
+    """
+
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+
+    def fields(self):
+        """Map of field name -> column file, re-read so live sessions stay current"""
+        try:
+            with open(os.path.join(self.session_dir, BINARY_MANIFEST)) as f:
+                return json.load(f)["fields"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return {}
+
+    def has_field(self, field_name):
+        return field_name in self.fields()
+
+    def column(self, field_name):
+        """All records of a field as a read-only view of the mapped file"""
+        file_name = self.fields().get(field_name)
+        if file_name is None:
+            return np.empty(0, dtype=BINARY_DTYPE)
+
+        path = os.path.join(self.session_dir, file_name)
+        with open(path, 'rb') as f:
+            # Ignore a trailing partial record from an in-progress write
+            length = os.fstat(f.fileno()).st_size
+            length -= length % BINARY_DTYPE.itemsize
+            if length == 0:
+                return np.empty(0, dtype=BINARY_DTYPE)
+            mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+        return np.frombuffer(mapped, dtype=BINARY_DTYPE)
+
+    def window(self, field_name, start_time=None, end_time=None):
+        """Records of a field with start_time <= timestamp <= end_time"""
+        records = self.column(field_name)
+        timestamps = records['timestamp']
+        lo = 0 if start_time is None else np.searchsorted(timestamps, start_time, side='left')
+        hi = len(records) if end_time is None else np.searchsorted(timestamps, end_time, side='right')
+        return records[lo:hi]
+
+    def statistics(self, field_name, start_time=None, end_time=None):
+        """count/avg/min/max of a field over a time window"""
+        values = self.window(field_name, start_time, end_time)['value']
+        if len(values) == 0:
+            return {'count': 0, 'avg': 0, 'min': 0, 'max': 0}
+        return {
+            'count': int(len(values)),
+            'avg': float(values.mean(dtype=np.float64)),
+            'min': float(values.min()),
+            'max': float(values.max()),
+        }
+
+
 class LatestValuesCache:
-    """Keeps track of latest values for all telemetry fields"""
+    """Keeps track of latest values for all telemetry fields.
+
+    With a core.value_store.SlotStore, known fields live in its preallocated
+    slot arrays and the hot loop writes those directly; anything the layout
+    doesn't cover falls back to the field_name -> (value, timestamp) dict.
+    """
     
-    def __init__(self):
-        self.latest_values = {}  # field_name -> (value, timestamp)
+    def __init__(self, store=None):
+        self.store = store
+        self.latest_values = {}  # field_name -> (value, timestamp), fields outside the store
         self.last_update_time = time.time()
         
-    def update_value(self, field_name, value, index=None, size=None):
+    def update_value(self, field_name, value, index=None, size=None, timestamp=None):
         """Update the latest value for a field, handling repeated fields."""
+        if timestamp is None:
+            timestamp = time.time()
+        if self.store is not None and self.store.update(field_name, value, index, timestamp):
+            return
+
         if index is not None:
             # It's a repeated field, store it in a list
             if field_name not in self.latest_values or not isinstance(self.latest_values.get(field_name), tuple) or not isinstance(self.latest_values.get(field_name)[0], list):
                 if size is not None:
-                    self.latest_values[field_name] = ([None] * size, time.time())
+                    self.latest_values[field_name] = ([None] * size, timestamp)
                 else:
                     # Fallback if size is not provided
-                    self.latest_values[field_name] = ([], time.time())
+                    self.latest_values[field_name] = ([], timestamp)
 
             # Ensure we have a list to update
             current_list, _ = self.latest_values[field_name]
             if index < len(current_list):
                 current_list[index] = value
-                self.latest_values[field_name] = (current_list, time.time())
+                self.latest_values[field_name] = (current_list, timestamp)
             else:
                 print(f"Warning: index {index} out of bounds for {field_name}")
         else:
             # It's a single value field
-            self.latest_values[field_name] = (value, time.time())
+            self.latest_values[field_name] = (value, timestamp)
         
     def get_latest_values(self):
         """Get all latest values with timestamps"""
-        return self.latest_values.copy()
+        if self.store is None:
+            return self.latest_values.copy()
+        latest_values = self.store.fields()
+        latest_values.update(self.latest_values)
+        return latest_values
+
+    def _get_field(self, field_name):
+        if field_name in self.latest_values:
+            return self.latest_values[field_name]
+        if self.store is not None:
+            return self.store.field(field_name)
+        return None
         
     def get_field_value(self, field_name):
         """Get the latest value for a specific field"""
-        if field_name in self.latest_values:
-            return self.latest_values[field_name][0]
-        return None
+        entry = self._get_field(field_name)
+        return entry[0] if entry else None
         
     def get_field_timestamp(self, field_name):
         """Get the timestamp for a specific field"""
-        if field_name in self.latest_values:
-            return self.latest_values[field_name][1]
-        return None
+        entry = self._get_field(field_name)
+        return entry[1] if entry else None
         
     def print_summary(self):
         """Print a summary of all latest values"""
-        print(f"\n=== Latest Telemetry Values ({len(self.latest_values)} fields) ===")
-        for field_name, (value, timestamp) in sorted(self.latest_values.items()):
-            age = time.time() - timestamp
+        latest_values = self.get_latest_values()
+        print(f"\n=== Latest Telemetry Values ({len(latest_values)} fields) ===")
+        now = time.time()
+        for field_name, (value, timestamp) in sorted(latest_values.items()):
+            age = now - timestamp
             print(f"{field_name}: {value} (age: {age:.3f}s)")
-        print("=" * 60) 
\ No newline at end of file
+        print("=" * 60) 
@@ -1,10 +1,15 @@
 """
 Hardware interface components.
 
-Contains CAN bus interface and data generation modules.
+Contains CAN bus interface, bus statistics, the ingest process frame ring, data generation and
+capture/replay modules.
 """
 
 from .interface import CANInterface
+from .bus_stats import BusStatistics
+from .frame_ring import FrameRing, IngestProcess
 from .simulator import CANGenerator
+from .recorder import CANRecorder, CANReplay, RawFrame, read_frames, write_frames
 
-__all__ = ['CANInterface', 'CANGenerator'] 
\ No newline at end of file
+__all__ = ['CANInterface', 'BusStatistics', 'FrameRing', 'IngestProcess', 'CANGenerator', 'CANRecorder', 'CANReplay',
+           'RawFrame', 'read_frames', 'write_frames'] 
\ No newline at end of file
@@ -0,0 +1,208 @@
+from array import array
+from collections import namedtuple
+
+STANDARD_ID_COUNT = 0x800
+
+# Nominal bits on the wire per frame by data length, without stuff bits (as can-utils canbusload):
+# SOF, ID, control, CRC, ACK, EOF and interframe space around 8 bits per data byte (up to CAN FD's 64)
+STANDARD_FRAME_BITS = tuple(47 + 8 * n for n in range(65))
+EXTENDED_FRAME_BITS = tuple(67 + 8 * n for n in range(65))
+
+# SocketCAN error frame classes (linux/can/error.h), carried in the arbitration ID
+CAN_ERR_TX_TIMEOUT = 0x001
+CAN_ERR_LOSTARB = 0x002
+CAN_ERR_CRTL = 0x004
+CAN_ERR_PROT = 0x008
+CAN_ERR_TRX = 0x010
+CAN_ERR_ACK = 0x020
+CAN_ERR_BUSOFF = 0x040
+CAN_ERR_BUSERROR = 0x080
+CAN_ERR_RESTARTED = 0x100
+# Controller status in data[1] of a CAN_ERR_CRTL frame
+CAN_ERR_CRTL_RX_OVERFLOW = 0x01
+CAN_ERR_CRTL_TX_OVERFLOW = 0x02
+CAN_ERR_CRTL_WARNING = 0x04 | 0x08
+CAN_ERR_CRTL_PASSIVE = 0x10 | 0x20
+
+ERROR_CLASSES = (
+    ("bus_off", CAN_ERR_BUSOFF),
+    ("bus_error", CAN_ERR_BUSERROR),
+    ("protocol", CAN_ERR_PROT),
+    ("no_ack", CAN_ERR_ACK),
+    ("lost_arbitration", CAN_ERR_LOSTARB),
+    ("tx_timeout", CAN_ERR_TX_TIMEOUT),
+    ("transceiver", CAN_ERR_TRX),
+    ("controller", CAN_ERR_CRTL),
+    ("restarted", CAN_ERR_RESTARTED),
+)
+CONTROLLER_STATES = (
+    ("rx_overflow", CAN_ERR_CRTL_RX_OVERFLOW),
+    ("tx_overflow", CAN_ERR_CRTL_TX_OVERFLOW),
+    ("error_warning", CAN_ERR_CRTL_WARNING),
+    ("error_passive", CAN_ERR_CRTL_PASSIVE),
+)
+
+# One row of BusStatistics.ids(); times in seconds, rates in frames/s. rate and last_max_gap
+# cover the last period closed by roll(), the rest the whole run
+IdStats = namedtuple("IdStats", ["can_id", "frames", "rate", "baseline_rate", "interval", "jitter",
+                                 "max_gap", "last_max_gap", "last_seen", "mapped"])
+
+# What BusStatistics.roll() measured over one period
+BusPeriod = namedtuple("BusPeriod", ["seconds", "frames", "rate", "load", "unmapped_ids", "slow_ids"])
+
+
+class BusStatistics:
+    """Per-arbitration-ID traffic statistics and SocketCAN error counters.
+
+    Every standard ID has a slot in flat arrays (frame count, last arrival,
+    smoothed interval, jitter, longest gap), so add_batch() costs a few array
+    writes per frame. Jitter is the smoothed deviation of each inter-arrival
+    gap from the smoothed interval (the RFC 3550 estimator). Times come from
+    the frame timestamps, so a replay keeps the gaps of the recording.
+
+    roll() closes a reporting period: it computes per-ID rates and the bus
+    load from the frames counted since the previous call, and reports IDs
+    whose rate fell below `slow_ratio` of their own running baseline (a node
+    dropping from 100 Hz to 5 Hz). Error frames are counted by class and
+    controller state, not passed on, and extended IDs are only counted.
+    """
+
+    def __init__(self, known_ids=(), bitrate=1000000, slow_ratio=0.5, smoothing=1.0 / 16):
+        self.bitrate = bitrate
+        self.slow_ratio = slow_ratio
+        self.smoothing = smoothing
+        self.frames = array('q', bytes(8 * STANDARD_ID_COUNT))
+        self.last_seen = array('d', bytes(8 * STANDARD_ID_COUNT))
+        self.intervals = array('d', bytes(8 * STANDARD_ID_COUNT))
+        self.jitter = array('d', bytes(8 * STANDARD_ID_COUNT))
+        self.max_gap = array('d', bytes(8 * STANDARD_ID_COUNT))  # Up to the last roll()
+        self.period_max_gap = array('d', bytes(8 * STANDARD_ID_COUNT))  # Since the last roll()
+        self.last_max_gap = array('d', bytes(8 * STANDARD_ID_COUNT))  # Over the last closed period
+        self.rates = array('d', bytes(8 * STANDARD_ID_COUNT))
+        self.baseline_rates = array('d', bytes(8 * STANDARD_ID_COUNT))
+        self._period_start_frames = array('q', bytes(8 * STANDARD_ID_COUNT))
+        self.mapped = bytearray(STANDARD_ID_COUNT)
+        for can_id in known_ids:
+            if 0 <= can_id < STANDARD_ID_COUNT:
+                self.mapped[can_id] = 1
+
+        self.total_frames = 0
+        self.extended_frames = 0
+        self.bits = 0  # Nominal bits on the wire, for the bus load
+        self.error_frames = 0
+        self.errors = dict.fromkeys((name for name, _ in ERROR_CLASSES + CONTROLLER_STATES), 0)
+
+        self.period_start = None
+        self._period_start_total = 0
+        self._period_start_bits = 0
+        self.last_period = None
+
+    def add_batch(self, messages):
+        """Count a batch of received frames; returns it without any error frames"""
+        frames, last_seen, intervals, jitter = self.frames, self.last_seen, self.intervals, self.jitter
+        period_max_gap, smoothing, frame_bits = self.period_max_gap, self.smoothing, STANDARD_FRAME_BITS
+        bits = errors = 0
+        for msg in messages:
+            can_id = msg.arbitration_id
+            if can_id >= STANDARD_ID_COUNT or getattr(msg, "is_error_frame", False) or \
+                    getattr(msg, "is_extended_id", False):
+                errors += self._add_other(msg)
+                continue
+            bits += frame_bits[len(msg.data)]
+            timestamp = msg.timestamp
+            count = frames[can_id]
+            frames[can_id] = count + 1
+            if count:
+                gap = timestamp - last_seen[can_id]
+                if gap > period_max_gap[can_id]:
+                    period_max_gap[can_id] = gap
+                if count > 1:
+                    interval = intervals[can_id]
+                    deviation = gap - interval
+                    intervals[can_id] = interval + deviation * smoothing
+                    jitter[can_id] += (abs(deviation) - jitter[can_id]) * smoothing
+                else:
+                    intervals[can_id] = gap
+            last_seen[can_id] = timestamp
+        self.total_frames += len(messages) - errors
+        self.bits += bits
+        if errors:
+            return [msg for msg in messages if not getattr(msg, "is_error_frame", False)]
+        return messages
+
+    def _add_other(self, msg):
+        """Count an error frame (returns 1) or an extended-ID frame (returns 0)"""
+        if getattr(msg, "is_error_frame", False):
+            self._add_error(msg)
+            return 1
+        self.extended_frames += 1
+        self.bits += EXTENDED_FRAME_BITS[len(msg.data)]
+        return 0
+
+    def _add_error(self, msg):
+        self.error_frames += 1
+        error_class = msg.arbitration_id
+        for name, mask in ERROR_CLASSES:
+            if error_class & mask:
+                self.errors[name] += 1
+        if error_class & CAN_ERR_CRTL and len(msg.data) > 1:
+            for name, mask in CONTROLLER_STATES:
+                if msg.data[1] & mask:
+                    self.errors[name] += 1
+        if error_class & CAN_ERR_BUSOFF:
+            print("[WARN] CAN bus-off")
+
+    def roll(self, now):
+        """Close the reporting period at wall-clock `now`; returns a BusPeriod (None for the first call)"""
+        if self.period_start is None:
+            self.period_start = now
+            self._period_start_total, self._period_start_bits = self.total_frames, self.bits
+            self._period_start_frames = array('q', self.frames)
+            return None
+        seconds = now - self.period_start
+        if seconds <= 0:
+            return self.last_period
+
+        frames, start_frames, rates, baselines = self.frames, self._period_start_frames, self.rates, self.baseline_rates
+        slow_ids = []
+        unmapped_ids = 0
+        for can_id in range(STANDARD_ID_COUNT):
+            total = frames[can_id]
+            if not total:
+                continue
+            rate = (total - start_frames[can_id]) / seconds
+            if self.period_max_gap[can_id] > self.max_gap[can_id]:
+                self.max_gap[can_id] = self.period_max_gap[can_id]
+            start_frames[can_id] = total
+            rates[can_id] = rate
+            baseline = baselines[can_id]
+            if baseline and rate < baseline * self.slow_ratio:
+                slow_ids.append(can_id)  # Kept out of the baseline until it recovers
+            else:
+                baselines[can_id] = rate if not baseline else baseline + (rate - baseline) * 0.25
+            if not self.mapped[can_id]:
+                unmapped_ids += 1
+
+        period_frames = self.total_frames - self._period_start_total
+        load = (self.bits - self._period_start_bits) / seconds / self.bitrate
+        self.last_period = BusPeriod(seconds, period_frames, period_frames / seconds, load, unmapped_ids, slow_ids)
+        self.period_start = now
+        self._period_start_total, self._period_start_bits = self.total_frames, self.bits
+        self.last_max_gap, self.period_max_gap = self.period_max_gap, array('d', bytes(8 * STANDARD_ID_COUNT))
+        return self.last_period
+
+    def ids(self):
+        """IdStats of every ID seen so far, by ID"""
+        return [IdStats(can_id, self.frames[can_id], self.rates[can_id], self.baseline_rates[can_id],
+                        self.intervals[can_id], self.jitter[can_id],
+                        max(self.max_gap[can_id], self.period_max_gap[can_id]),
+                        self.last_max_gap[can_id], self.last_seen[can_id], bool(self.mapped[can_id]))
+                for can_id in range(STANDARD_ID_COUNT) if self.frames[can_id]]
+
+    def unmapped_frames(self):
+        """Frames received of IDs nothing decodes"""
+        return sum(self.frames[can_id] for can_id in self.unmapped_ids())
+
+    def unmapped_ids(self):
+        """IDs seen on the bus that nothing decodes"""
+        return [can_id for can_id in range(STANDARD_ID_COUNT) if self.frames[can_id] and not self.mapped[can_id]]
@@ -0,0 +1,188 @@
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+
+from interfaces.recorder import FRAME_RECORD, RawFrame, pack_frame
+
+# Segment layout: a 64-byte header, then `capacity` recorder records (interfaces/recorder.py FRAME_RECORD).
+# Header: magic, capacity, record size, write index (total records ever written; only the writer stores it)
+RING_MAGIC = b"BEVORNG1"
+RING_HEADER = struct.Struct("<8sII")
+RING_WRITE_INDEX = struct.Struct("<Q")
+RING_WRITE_INDEX_OFFSET = 16
+RING_HEADER_SIZE = 64
+RING_WRITE_BATCH = 512  # Most records the writer fills before publishing them
+
+
+class FrameRing:
+    """Single-producer, single-consumer ring of raw CAN frames in shared memory.
+
+    One process write()s frames, another read()s them; nothing is locked.
+    The writer fills at most RING_WRITE_BATCH records and only then advances
+    the write index in the header, so every record below the index is
+    complete. The reader copies records up to the index and then checks it
+    again: records the writer may have started overwriting meanwhile (the
+    reader was about a whole ring behind) are discarded and counted in
+    `lost`, never returned torn.
+
+    Nothing here issues a memory barrier; pure Python has no way to. The
+    scheme relies on stores becoming visible to the other process in
+    program order (records before the index that publishes them) and on
+    loads not being reordered, which x86-64 guarantees. A weakly ordered
+    CPU such as ARM doesn't: a reader there could see a new index before
+    the records below it, and the check after the copy only catches
+    records being overwritten, not records arriving late.
+
+    create=True allocates a new segment (the owner unlinks it on close());
+    otherwise `name` is attached to.
+    """
+
+    def __init__(self, name=None, capacity=65536, create=False):
+        if create:
+            if capacity <= 2 * RING_WRITE_BATCH:
+                raise ValueError(f"Frame ring needs more than {2 * RING_WRITE_BATCH} records")
+            self.shm = shared_memory.SharedMemory(name, create=True,
+                                                  size=RING_HEADER_SIZE + capacity * FRAME_RECORD.size)
+            RING_HEADER.pack_into(self.shm.buf, 0, RING_MAGIC, capacity, FRAME_RECORD.size)
+            RING_WRITE_INDEX.pack_into(self.shm.buf, RING_WRITE_INDEX_OFFSET, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            magic, capacity, record_size = RING_HEADER.unpack_from(self.shm.buf, 0)
+            if magic != RING_MAGIC or record_size != FRAME_RECORD.size:
+                self.shm.close()
+                raise ValueError(f"{name} is not a telemd frame ring")
+        self.owner = create
+        self.name = self.shm.name
+        self.capacity = capacity
+        self.buf = self.shm.buf
+        # A restarted writer carries on from the index in the header, so its reader keeps its place
+        self.write_index = self.read_index = self._published_index()
+        self.lost = 0
+
+    def _published_index(self):
+        return RING_WRITE_INDEX.unpack_from(self.buf, RING_WRITE_INDEX_OFFSET)[0]
+
+    def write(self, messages):
+        """Append frames (can.Message or anything shaped like one) and publish them"""
+        buf, capacity, index = self.buf, self.capacity, self.write_index
+        size = FRAME_RECORD.size
+        for start in range(0, len(messages), RING_WRITE_BATCH):
+            for msg in messages[start:start + RING_WRITE_BATCH]:
+                offset = RING_HEADER_SIZE + (index % capacity) * size
+                buf[offset:offset + size] = pack_frame(msg)
+                index += 1
+            RING_WRITE_INDEX.pack_into(buf, RING_WRITE_INDEX_OFFSET, index)
+        self.write_index = index
+
+    def read(self, max_frames=512):
+        """Up to max_frames published frames as RawFrames, oldest first"""
+        # Slots from (write index + RING_WRITE_BATCH - capacity) up may be being rewritten
+        unsafe = self.capacity - RING_WRITE_BATCH
+        index = self.read_index
+        write_index = self._published_index()
+        if write_index - index > unsafe:
+            self.lost += write_index - unsafe - index
+            index = write_index - unsafe
+        end = min(write_index, index + max_frames)
+        if index == end:
+            return []
+
+        buf, capacity, size = self.buf, self.capacity, FRAME_RECORD.size
+        first, last = index % capacity, (end - 1) % capacity + 1
+        if first < last:
+            records = bytes(buf[RING_HEADER_SIZE + first * size:RING_HEADER_SIZE + last * size])
+        else:
+            records = bytes(buf[RING_HEADER_SIZE + first * size:RING_HEADER_SIZE + capacity * size]) + \
+                bytes(buf[RING_HEADER_SIZE:RING_HEADER_SIZE + last * size])
+
+        # Re-validate after the copy: whatever the writer published meanwhile may
+        # have started overwriting the oldest records we just copied
+        overwritten = min(self._published_index() - unsafe, end) - index
+        skip = 0
+        if overwritten > 0:
+            self.lost += overwritten
+            skip = overwritten * size
+        self.read_index = end
+        return [RawFrame(timestamp, arbitration_id, data[:dlc], flags)
+                for timestamp, arbitration_id, dlc, flags, data in FRAME_RECORD.iter_unpack(records[skip:])]
+
+    def pending(self):
+        """Frames published but not read yet"""
+        return self._published_index() - self.read_index
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def run_ingest(ring_name, replay_file=None, replay_speed=1.0, record_file=None, stop_event=None):
+    """Ingest process body: read the bus (or replay/generator) and write every frame into the ring"""
+    from interfaces.interface import CANInterface
+
+    ring = FrameRing(ring_name)
+    can_interface = CANInterface(replay_file, replay_speed, record_file)
+    can_interface.initialize()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            batch = can_interface.recv_batch(512, 0.05)
+            if batch:
+                ring.write(batch)
+    except KeyboardInterrupt:
+        pass  # The parent got it too and stops us
+    finally:
+        can_interface.shutdown()
+        ring.close()
+
+
+class IngestProcess:
+    """Runs run_ingest() in its own process and reads its frame ring.
+
+    Shaped like the polled sources CANInterface already handles (recv()
+    returns a list of frames), so the event loop only copies records out of
+    shared memory; socket reads and can.Message construction no longer take
+    its GIL. A dead ingest process is restarted, at most once a second,
+    and carries on from the ring's write index.
+    """
+
+    def __init__(self, capacity=65536, replay_file=None, replay_speed=1.0, record_file=None, batch_size=512):
+        self.ring = FrameRing(capacity=capacity, create=True)
+        self.args = (self.ring.name, replay_file, replay_speed, record_file)
+        self.batch_size = batch_size
+        # spawn: the parent already runs threads (notifier, MQTT, publisher), which fork doesn't mix with
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.process = None
+        self.restarts = 0
+        self._last_start = 0.0
+
+    def start(self):
+        self.process = self.context.Process(target=run_ingest, args=self.args + (self.stop_event,),
+                                            name="telemd-can-ingest", daemon=True)
+        self.process.start()
+        self._last_start = time.monotonic()
+        print(f"CAN ingest process {self.process.pid} writing to shared memory ring {self.ring.name} "
+              f"({self.ring.capacity} frames)")
+        return self
+
+    def recv(self, timeout=0.0):
+        """Frames written since the last call (empty list if none)"""
+        frames = self.ring.read(self.batch_size)
+        if not frames and not self.process.is_alive() and time.monotonic() - self._last_start >= 1.0:
+            print(f"[ERROR] CAN ingest process exited with code {self.process.exitcode}, restarting")
+            self.restarts += 1
+            self.start()
+        return frames
+
+    def shutdown(self):
+        self.stop_event.set()
+        if self.process is not None:
+            self.process.join(2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(1.0)
+        if self.ring.lost:
+            print(f"CAN frame ring: {self.ring.lost} frames lost (reader fell behind)")
+        self.ring.close()
@@ -1,22 +1,54 @@
+import asyncio
 import can
 import platform
 from can.notifier import Notifier
-from can.listener import BufferedReader
+from can.listener import AsyncBufferedReader, BufferedReader
 from interfaces.simulator import CANGenerator
+from interfaces.recorder import CANRecorder, CANReplay
+from interfaces.frame_ring import IngestProcess
 
 
 class CANInterface:
     """Manages CAN bus interface with platform detection and background buffering"""
 
-    def __init__(self):
+    def __init__(self, replay_file=None, replay_speed=1.0, record_file=None, bus_stats=None,
+                 ingest_process=False, ring_frames=65536, ring_poll_interval=0.002):
         self.is_linux = platform.system() == "Linux"
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+        self.record_file = record_file
+        self.bus_stats = bus_stats  # interfaces.bus_stats.BusStatistics fed by batches()
+        self.ingest_process = ingest_process
+        self.ring_frames = ring_frames
+        self.ring_poll_interval = ring_poll_interval
+        self.ingest = None  # interfaces.frame_ring.IngestProcess
+        self.poll_interval = 0.01  # For polled sources, unless batches() is given one
         self.bus = None
         self.buffer = None
+        self.async_buffer = None
+        self.recorder = None
         self.notifier = None
         
-    def initialize(self):
-        """Initialize the appropriate CAN interface"""
-        if self.is_linux:
+    def initialize(self, loop=None):
+        """Initialize the appropriate CAN interface
+
+        With an event loop, the notifier delivers frames straight onto that loop
+        (read with batches() / async for); otherwise they are queued for recv().
+        A replay_file takes precedence over the hardware and is played back at
+        replay_speed; a record_file captures every raw frame from the real bus.
+        With ingest_process, all of that happens in a separate process that
+        hands frames over through a shared-memory ring (interfaces/frame_ring.py).
+        """
+        if self.ingest_process:
+            self.ingest = IngestProcess(self.ring_frames, self.replay_file, self.replay_speed, self.record_file)
+            self.bus = self.ingest.start()
+            self.poll_interval = self.ring_poll_interval
+            return self.is_real_bus()
+        if self.replay_file:
+            self.bus = CANReplay(self.replay_file, speed=self.replay_speed)
+            print(f"Using CAN replay of {self.replay_file} (speed: {self.replay_speed or 'max'})")
+            return False
+        elif self.is_linux:
             self.bus = can.interface.Bus(
                 bustype="socketcan",
                 channel="can0",
@@ -25,8 +57,20 @@ class CANInterface:
             print("Using real CAN bus interface (Linux)")
 
             # Create a background buffer (VERY important)
-            self.buffer = BufferedReader()
-            self.notifier = Notifier(self.bus, [self.buffer])
+            listeners = []
+            if loop is not None:
+                self.async_buffer = AsyncBufferedReader()
+                listeners.append(self.async_buffer)
+            else:
+                self.buffer = BufferedReader()
+                listeners.append(self.buffer)
+
+            if self.record_file:
+                self.recorder = CANRecorder(self.record_file)
+                listeners.append(self.recorder)
+                print(f"Recording raw CAN frames to {self.record_file}")
+
+            self.notifier = Notifier(self.bus, listeners, loop=loop)
 
             return True
         else:
@@ -42,11 +86,86 @@ class CANInterface:
             # Fallback for generator
             return self.bus.recv(timeout)
         return None
+
+    def recv_batch(self, max_frames=512, timeout=0.01):
+        """Return up to max_frames CAN messages in one call.
+
+        Waits at most `timeout` for the first frame, then drains whatever is
+        already queued without blocking. Returns an empty list on timeout.
+        """
+        if self.buffer:
+            msg = self.buffer.get_message(timeout)
+            if msg is None:
+                return []
+
+            batch = [msg]
+            get_message = self.buffer.get_message
+            while len(batch) < max_frames:
+                msg = get_message(0)
+                if msg is None:
+                    break
+                batch.append(msg)
+            return batch
+        elif self.bus:
+            # Generator already hands back everything it has produced
+            msgs = self.bus.recv(timeout)
+            if not msgs:
+                return []
+            return msgs if isinstance(msgs, list) else [msgs]
+        return []
+
+    async def batches(self, max_frames=512, poll_interval=None):
+        """Async iterator yielding lists of up to max_frames CAN messages.
+
+        On a real bus this waits on the AsyncBufferedReader queue, so it costs
+        nothing while the bus is silent. Polled sources like the generator are
+        checked every poll_interval instead. With bus_stats, every batch is
+        counted there first and error frames are left out.
+        """
+        async for batch in self._batches(max_frames, poll_interval or self.poll_interval):
+            if self.bus_stats is not None:
+                batch = self.bus_stats.add_batch(batch)
+                if not batch:
+                    continue
+            yield batch
+
+    async def _batches(self, max_frames, poll_interval):
+        if self.async_buffer:
+            queue = self.async_buffer.buffer
+            while True:
+                batch = [await queue.get()]
+                while len(batch) < max_frames and not queue.empty():
+                    batch.append(queue.get_nowait())
+                yield batch
+        elif self.buffer:
+            while True:
+                batch = await asyncio.to_thread(self.recv_batch, max_frames, poll_interval)
+                if batch:
+                    yield batch
+        elif self.bus:
+            while True:
+                batch = self.recv_batch(max_frames, 0)
+                if batch:
+                    yield batch
+                    # Fast replays may never run dry, so let other tasks in
+                    await asyncio.sleep(0)
+                else:
+                    await asyncio.sleep(poll_interval)
+
+    async def __aiter__(self):
+        """Iterate over received CAN messages one at a time"""
+        async for batch in self.batches():
+            for msg in batch:
+                yield msg
     
     def shutdown(self):
         """Clean shutdown"""
         if self.notifier:
             self.notifier.stop()
+        if self.async_buffer:
+            self.async_buffer.stop()
+        if self.recorder:
+            self.recorder.stop()
         
         if self.bus:
             try:
@@ -56,4 +175,6 @@ class CANInterface:
                 print(f"Error shutting down CAN interface: {e}")
     
     def is_real_bus(self):
-        return self.is_linux and not isinstance(self.bus, CANGenerator)
+        if self.ingest is not None:
+            return self.is_linux and not self.replay_file
+        return self.is_linux and not isinstance(self.bus, (CANGenerator, CANReplay))
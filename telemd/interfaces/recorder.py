@@ -0,0 +1,224 @@
+import argparse
+import struct
+import threading
+import time
+
+import can
+
+# File layout: 8-byte magic, then fixed 22-byte records of
+# timestamp (float64), arbitration_id (uint32), dlc (uint8), flags (uint8), data (8 bytes, zero padded)
+FRAME_FILE_MAGIC = b"BEVOCAN1"
+FRAME_RECORD = struct.Struct("<dIBB8s")
+
+FLAG_EXTENDED = 0x01
+FLAG_ERROR = 0x02
+FLAG_REMOTE = 0x04
+
+
+class RawFrame:
+    """Lightweight stand-in for can.Message carrying only what telemd reads"""
+
+    __slots__ = ("timestamp", "arbitration_id", "dlc", "data", "is_extended_id",
+                 "is_error_frame", "is_remote_frame")
+
+    def __init__(self, timestamp, arbitration_id, data, flags=0):
+        self.timestamp = timestamp
+        self.arbitration_id = arbitration_id
+        self.dlc = len(data)
+        self.data = data
+        self.is_extended_id = bool(flags & FLAG_EXTENDED)
+        self.is_error_frame = bool(flags & FLAG_ERROR)
+        self.is_remote_frame = bool(flags & FLAG_REMOTE)
+
+    def __repr__(self):
+        return f"RawFrame(0x{self.arbitration_id:03X}, {self.data.hex()}, t={self.timestamp:.6f})"
+
+
+def pack_frame(msg):
+    """Encode a can.Message (or anything shaped like one) as one file record"""
+    flags = 0
+    if getattr(msg, "is_extended_id", False):
+        flags |= FLAG_EXTENDED
+    if getattr(msg, "is_error_frame", False):
+        flags |= FLAG_ERROR
+    if getattr(msg, "is_remote_frame", False):
+        flags |= FLAG_REMOTE
+    data = bytes(msg.data[:8])
+    timestamp = msg.timestamp if msg.timestamp else time.time()
+    return FRAME_RECORD.pack(timestamp, msg.arbitration_id, len(data), flags, data)
+
+
+def unpack_frame(record, offset=0):
+    """Decode one file record into a RawFrame"""
+    timestamp, arbitration_id, dlc, flags, data = FRAME_RECORD.unpack_from(record, offset)
+    return RawFrame(timestamp, arbitration_id, data[:dlc], flags)
+
+
+def write_frames(path, frames):
+    """Write an iterable of frames to a new capture file; returns the frame count"""
+    count = 0
+    with open(path, "wb") as f:
+        f.write(FRAME_FILE_MAGIC)
+        for msg in frames:
+            f.write(pack_frame(msg))
+            count += 1
+    return count
+
+
+def read_frames(path, chunk_frames=4096):
+    """Stream RawFrames from a capture file without loading it all at once"""
+    with open(path, "rb") as f:
+        if f.read(len(FRAME_FILE_MAGIC)) != FRAME_FILE_MAGIC:
+            raise ValueError(f"{path} is not a CAN capture file")
+        size = FRAME_RECORD.size
+        while True:
+            chunk = f.read(size * chunk_frames)
+            # A trailing partial record means the recorder was cut off mid-write
+            usable = len(chunk) - len(chunk) % size
+            for offset in range(0, usable, size):
+                yield unpack_frame(chunk, offset)
+            if len(chunk) < size * chunk_frames:
+                break
+
+
+class CANRecorder(can.Listener):
+    """Notifier listener that appends every received frame to a capture file"""
+
+    def __init__(self, path, buffer_bytes=1 << 16):
+        self.path = path
+        self.file = open(path, "wb", buffering=buffer_bytes)
+        self.file.write(FRAME_FILE_MAGIC)
+        self.lock = threading.Lock()
+        self.frame_count = 0
+
+    def on_message_received(self, msg):
+        record = pack_frame(msg)
+        with self.lock:
+            if self.file:
+                self.file.write(record)
+                self.frame_count += 1
+
+    def stop(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+        print(f"CAN recorder stopped. Wrote {self.frame_count} frames to {self.path}")
+
+
+class CANReplay:
+    """Plays a capture file back through the same recv() interface as CANGenerator.
+
+    speed=1.0 replays in real time, speed=N replays N times faster, and
+    speed=0 (or None) hands out frames as fast as they are asked for, up to
+    batch_size per call. With loop=True the capture restarts when it ends.
+    """
+
+    def __init__(self, path, speed=1.0, batch_size=512, loop=False):
+        self.path = path
+        self.speed = speed or 0
+        self.batch_size = batch_size
+        self.loop = loop
+        self.message_count = 0
+        self.finished = False
+        self._restart()
+
+    def _restart(self):
+        self._frames = read_frames(self.path)
+        self._pending = next(self._frames, None)
+        self._first_timestamp = self._pending.timestamp if self._pending else 0.0
+        self._start_time = time.time()
+
+    def _due_time(self, frame):
+        """Wall-clock time at which a frame should be delivered"""
+        return self._start_time + (frame.timestamp - self._first_timestamp) / self.speed
+
+    def recv(self, timeout=0.01):
+        """Return the list of frames due by now (waiting up to timeout), or None"""
+        if self._pending is None:
+            if not self.loop:
+                self.finished = True
+                time.sleep(timeout)
+                return None
+            self._restart()
+            if self._pending is None:
+                return None
+
+        messages = []
+        if self.speed <= 0:
+            while self._pending is not None and len(messages) < self.batch_size:
+                messages.append(self._pending)
+                self._pending = next(self._frames, None)
+        else:
+            wait = self._due_time(self._pending) - time.time()
+            if wait > 0:
+                if wait > timeout:
+                    time.sleep(timeout)
+                    return None
+                time.sleep(wait)
+            now = time.time()
+            while (self._pending is not None and len(messages) < self.batch_size
+                   and self._due_time(self._pending) <= now):
+                messages.append(self._pending)
+                self._pending = next(self._frames, None)
+
+        self.message_count += len(messages)
+        return messages or None
+
+    def shutdown(self):
+        """Clean shutdown"""
+        print(f"CAN replay shutdown. Replayed {self.message_count} frames from {self.path}.")
+
+
+def record(path, channel="can0", seconds=None):
+    """Record raw frames from a socketcan channel until Ctrl+C or `seconds` elapse"""
+    bus = can.interface.Bus(bustype="socketcan", channel=channel, bitrate=1000000)
+    recorder = CANRecorder(path)
+    notifier = can.Notifier(bus, [recorder])
+    print(f"Recording {channel} to {path}... Press Ctrl+C to stop.")
+    try:
+        if seconds:
+            time.sleep(seconds)
+        else:
+            while True:
+                time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        notifier.stop()
+        recorder.stop()
+        bus.shutdown()
+
+
+def summarize(path):
+    """Print frame count, duration and per-ID counts of a capture file"""
+    counts = {}
+    first = last = None
+    total = 0
+    for frame in read_frames(path):
+        counts[frame.arbitration_id] = counts.get(frame.arbitration_id, 0) + 1
+        first = frame.timestamp if first is None else first
+        last = frame.timestamp
+        total += 1
+    duration = (last - first) if total else 0.0
+    print(f"{path}: {total} frames over {duration:.2f}s "
+          f"({total / duration if duration > 0 else 0:.0f} frames/s)")
+    for can_id in sorted(counts):
+        print(f"  0x{can_id:03X}: {counts[can_id]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record or inspect raw CAN capture files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Record frames from a socketcan channel")
+    record_parser.add_argument("path", help="Output capture file")
+    record_parser.add_argument("-c", "--channel", default="can0", help="socketcan channel (default: can0)")
+    record_parser.add_argument("-s", "--seconds", type=float, default=None, help="Stop after N seconds")
+    info_parser = subparsers.add_parser("info", help="Summarize a capture file")
+    info_parser.add_argument("path", help="Capture file to inspect")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.path, args.channel, args.seconds)
+    else:
+        summarize(args.path)
@@ -5,5 +5,10 @@ Contains MQTT client and network protocol modules.
 """
 
 from .client import MQTTManager
+from .spool import DiskSpool
+from .batch import PacketBatcher, encode_batch, decode_batch
+from .publisher import TelemetryPublisher
+from .captures import CaptureQueue
 
-__all__ = ['MQTTManager'] 
\ No newline at end of file
+__all__ = ['MQTTManager', 'DiskSpool', 'PacketBatcher', 'encode_batch', 'decode_batch', 'TelemetryPublisher',
+           'CaptureQueue'] 
\ No newline at end of file
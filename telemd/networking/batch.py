@@ -0,0 +1,103 @@
+import struct
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+# Envelope: magic, codec, packet count, then the compressed body. The body is
+# the packets back to back, each prefixed with its length (uint32).
+BATCH_MAGIC = b"BVB1"
+BATCH_HEADER = struct.Struct("<4sBH")
+PACKET_LENGTH = struct.Struct("<I")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+
+def encode_batch(payloads, codec=CODEC_ZLIB, level=6):
+    """Pack serialized packets into one compressed envelope"""
+    body = b"".join(PACKET_LENGTH.pack(len(payload)) + payload for payload in payloads)
+    if codec == CODEC_ZLIB:
+        body = zlib.compress(body, level)
+    elif codec == CODEC_ZSTD:
+        body = zstandard.ZstdCompressor(level=level).compress(body)
+    return BATCH_HEADER.pack(BATCH_MAGIC, codec, len(payloads)) + body
+
+
+def decode_batch(envelope):
+    """Unpack an envelope back into its list of serialized packets"""
+    magic, codec, count = BATCH_HEADER.unpack_from(envelope)
+    if magic != BATCH_MAGIC:
+        raise ValueError("not a telemetry batch envelope")
+    body = envelope[BATCH_HEADER.size:]
+    if codec == CODEC_ZLIB:
+        body = zlib.decompress(body)
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("batch is zstd compressed but zstandard is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body, max_output_size=1 << 26)
+    elif codec != CODEC_NONE:
+        raise ValueError(f"unknown batch codec {codec}")
+
+    payloads = []
+    offset = 0
+    for _ in range(count):
+        (length,) = PACKET_LENGTH.unpack_from(body, offset)
+        offset += PACKET_LENGTH.size
+        payloads.append(body[offset:offset + length])
+        offset += length
+    return payloads
+
+
+class PacketBatcher:
+    """Collects serialized packets until a batch is full or its deadline passes.
+
+    A batch is flushed once it holds `max_packets` packets or `max_bytes` of
+    payload, or once `max_delay` seconds have passed since its first packet.
+    """
+
+    def __init__(self, max_packets=10, max_bytes=64 * 1024, max_delay=1.0, codec="zlib", level=6):
+        self.max_packets = max_packets
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        if codec == "zstd" and zstandard is None:
+            print("[WARN] zstandard is not installed, batching with zlib instead")
+            codec = "zlib"
+        self.codec = CODECS[codec]
+        self.level = level
+        self.pending = []
+        self.pending_bytes = 0
+        self.started = 0.0
+
+    def add(self, payload, now=None):
+        """Queue a packet; returns the list of packets to send if the batch is now due"""
+        now = time.monotonic() if now is None else now
+        if not self.pending:
+            self.started = now
+        self.pending.append(payload)
+        self.pending_bytes += len(payload)
+        if len(self.pending) >= self.max_packets or self.pending_bytes >= self.max_bytes:
+            return self.take()
+        return self.due(now)
+
+    def due(self, now=None):
+        """Take the pending packets if the oldest has waited max_delay, else None"""
+        now = time.monotonic() if now is None else now
+        if self.pending and now - self.started >= self.max_delay:
+            return self.take()
+        return None
+
+    def take(self):
+        """Remove and return every pending packet"""
+        payloads = self.pending
+        self.pending = []
+        self.pending_bytes = 0
+        return payloads
+
+    def encode(self, payloads):
+        return encode_batch(payloads, self.codec, self.level)
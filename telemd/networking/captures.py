@@ -0,0 +1,41 @@
+import os
+
+
+class CaptureQueue:
+    """Fault captures waiting on disk for upload.
+
+    Each capture is written to `directory` atomically (write tmp, fsync,
+    rename), so it survives a crash or a long broker outage, and moved to
+    `directory`/sent once uploaded. Names start with the trigger time, so
+    sorting them gives upload order.
+    """
+
+    def __init__(self, directory="captures"):
+        self.directory = directory
+        self.sent_directory = os.path.join(directory, "sent")
+        os.makedirs(self.sent_directory, exist_ok=True)
+        self.written = 0
+        self.uploaded = 0
+
+    def add(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.written += 1
+        return path
+
+    def pending(self):
+        """Names of the captures not uploaded yet, oldest first"""
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".bin"))
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name), "rb") as f:
+            return f.read()
+
+    def mark_sent(self, name):
+        os.replace(os.path.join(self.directory, name), os.path.join(self.sent_directory, name))
+        self.uploaded += 1
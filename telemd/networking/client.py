@@ -4,14 +4,57 @@ import json
 import requests
 import time
 import threading
+import zlib
+from array import array
+from collections import deque, namedtuple
 from protobuf import publish_msg
+from protobuf.encoder import TelemetryEncoder
+from core.value_store import field_matches, merge_windows
+from core.metrics import REGISTRY
+
+# Updated on the publisher thread (see core/metrics.py)
+ENCODE_SECONDS = REGISTRY.histogram("telemd_mqtt_encode_seconds", "Protobuf encoding of one telemetry packet")
+CLIENT_PUBLISH_SECONDS = REGISTRY.histogram("telemd_mqtt_client_publish_seconds",
+                                            "paho client.publish() call for one live packet")
+FRAME_TO_UPLINK_SECONDS = REGISTRY.histogram(
+    "telemd_frame_to_uplink_seconds",
+    "Time from a value being written to the store to the live MQTT publish carrying it, per field")
+PACKETS_SENT = REGISTRY.counter("telemd_mqtt_packets_sent_total", "Telemetry packets published live")
+PACKETS_SPOOLED = REGISTRY.counter("telemd_mqtt_packets_spooled_total", "Telemetry packets queued on disk")
+PACKETS_BACKFILLED = REGISTRY.counter("telemd_mqtt_packets_backfilled_total", "Spooled packets sent after an outage")
+PUBLISH_FAILURES = REGISTRY.counter("telemd_mqtt_publish_failures_total",
+                                    "Live publishes that failed (retried next cycle or spooled)")
+
+# Immutable copy of the cache taken on the event loop and published from another thread:
+# store value/stamp array copies (None without a store), the complete fields outside it and
+# the finished core.value_store.SlotWindow when aggregating
+TelemetrySnapshot = namedtuple("TelemetrySnapshot", ["timestamp", "values", "stamps", "fields", "window"],
+                               defaults=(None,))
+
 
 class TelemetryCache:
-    """Caches telemetry data and publishes at fixed rate"""
+    """Caches telemetry data and publishes at fixed rate.
+
+    Given a core.value_store.SlotStore, fields it covers are read from the
+    shared slot arrays at publish time: a field goes out when any of its slots
+    has a newer timestamp than the last successful publish. Fields outside the
+    store use the per-field dict below.
+
+    Given a core.value_store.WindowAggregator fed by the writer, each packet
+    also carries count/min/max/mean of every slot sampled more than once since
+    the previous packet, so fast signals and short spikes survive decimation
+    to the publish rate. A window that fails to publish is merged into the next.
+    """
     
-    def __init__(self, mqtt_manager, publish_interval=0.003):  # 333Hz default
+    def __init__(self, mqtt_manager, publish_interval=0.003, store=None, window=None):  # 333Hz default
         self.mqtt_manager = mqtt_manager
-        self.cache = {}  # field_name -> latest_value
+        self.cache = {}  # field_name -> latest_value, fields outside the store
+        self.store = store
+        self.window = window
+        self._unsent_window = None  # Window of the last failed publish, folded into the next
+        # Slot timestamps as of the last successful publish
+        self._sent_stamps = array('d', [0.0]) * len(store.stamps) if store is not None else None
+        self._batched_stamps = []  # Store timestamps of fields waiting in the MQTT batcher
         self.last_publish_time = time.time()
         self.publish_interval = publish_interval
         self.lock = threading.Lock()
@@ -62,8 +105,11 @@ class TelemetryCache:
         except Exception as e:
             print(f"[WARN] Failed to write odometer to {path}: {e}")
         
-    def update_value(self, can_id, field_name, value, index=None, size=None):
+    def update_value(self, can_id, field_name, value, index=None, size=None, timestamp=None):
         """Cache a telemetry value, handling repeated fields."""
+        if self.store is not None and \
+                self.store.update(field_name, value, index, time.time() if timestamp is None else timestamp):
+            return
         with self.lock:
             if index is not None:
                 # It's a repeated field, store it in a list
@@ -88,98 +134,264 @@ class TelemetryCache:
         with self.lock:
             return current_time - self.last_publish_time >= self.publish_interval
         
-    def publish_cached_data(self, current_time):
-        """Publish all complete cached data to MQTT"""
+    def take_snapshot(self, current_time):
+        """Copy what a publish needs into an immutable TelemetrySnapshot (cheap; safe on the event loop)"""
         with self.lock:
-            if not self.cache:
-                return
+            self.last_publish_time = current_time
+            values = stamps = window = None
+            if self.store is not None:
+                values, stamps = self.store.snapshot()
+            if self.window is not None:
+                window = self.window.take()
 
-            complete_fields = {}
+            fields = {}
             for field_name, value in self.cache.items():
                 if isinstance(value, list):
                     if all(v is not None for v in value):
-                        complete_fields[field_name] = value
+                        fields[field_name] = list(value)
                 else:
-                    complete_fields[field_name] = value
+                    fields[field_name] = value
+        return TelemetrySnapshot(current_time, values, stamps, fields, window)
+
+    def window_stats(self, window):
+        """(field_name, index, count, min, max, mean) for every slot with more than one
+        sample in the window; a single sample is already the published value"""
+        count, minimum, maximum, total = window
+        stats = []
+        for (field_name, index), slot in self.store.layout.slots.items():
+            n = count[slot]
+            if n > 1:
+                stats.append((field_name, index, n, minimum[slot], maximum[slot], total[slot] / n))
+        return stats
+
+    def publish_snapshot(self, snapshot):
+        """Encode and publish the complete fields of a snapshot that changed since the last
+        successful publish. Only one thread at a time may publish."""
+        # A partly filled batch still goes out on its deadline when nothing new arrives
+        if self.mqtt_manager.flush_batch():
+            self._observe_uplink([])
+        elif self._batched_stamps and not self.mqtt_manager.batcher.pending:
+            self._batched_stamps = []  # The batch was spooled instead
 
-            if not complete_fields:
-                return
+        complete_fields = {}
+        if snapshot.stamps is not None:
+            changed = self.store.fields(snapshot.values, snapshot.stamps,
+                                        changed_since=self._sent_stamps, complete_only=True)
+            for field_name, (value, _) in changed.items():
+                complete_fields[field_name] = value
+        complete_fields.update(snapshot.fields)
 
-            #! TESTING REQUIRED ||| compute odometer value
-            # speed = complete_fields.get("dynamics.blw_speed")  #! dunno if this is the actual value
-            # if speed is not None:
-            #     delta_t = current_time - self.last_publish_time
-            #     self.odometer += speed * delta_t / 1000  # preserve original scaling
-            #     # Keep cache and snapshot in sync
-            #     self.cache["diagnostics.odometer"] = self.odometer
-            #     complete_fields["diagnostics.odometer"] = self.odometer
+        window = snapshot.window
+        if window is not None and self._unsent_window is not None:
+            window = merge_windows(self._unsent_window, window)
+        stats = self.window_stats(window) if window is not None else []
 
-            # Get current packet ID (local, not from server)
-            packet_id = self.mqtt_manager.get_packet_id()
+        if not complete_fields and not stats:
+            return True
+
+        #! TESTING REQUIRED ||| compute odometer value
+        # speed = complete_fields.get("dynamics.blw_speed")  #! dunno if this is the actual value
+        # if speed is not None:
+        #     delta_t = current_time - self.last_publish_time
+        #     self.odometer += speed * delta_t / 1000  # preserve original scaling
+        #     # Keep cache and snapshot in sync
+        #     self.cache["diagnostics.odometer"] = self.odometer
+        #     complete_fields["diagnostics.odometer"] = self.odometer
+
+        # Get current packet ID (local, not from server)
+        packet_id = self.mqtt_manager.get_packet_id()
 
-            telemetry_data = {
-                "timestamp": current_time,
-                "packet_id": packet_id,
-                "fields": complete_fields,
-            }
+        telemetry_data = {
+            "timestamp": snapshot.timestamp,
+            "packet_id": packet_id,
+            "fields": complete_fields,
+            "stats": stats,
+        }
 
         # Publish via MQTT (this will increment packet ID after successful publish)
         success = self.mqtt_manager.publish(telemetry_data, publish_msg)
 
         if success:
+            if snapshot.stamps is not None:
+                stamps = [stamp for _, stamp in changed.values()]
+                if self.mqtt_manager.last_publish_live:
+                    self._observe_uplink(stamps)
+                elif self.mqtt_manager.last_publish_buffered:
+                    self._batched_stamps.extend(stamps)
+                else:
+                    self._batched_stamps = []  # Spooled along with the batch: not a live uplink
             with self.lock:
-                # Clear only the published fields from the cache
-                for field_name in complete_fields:
-                    if field_name in self.cache:
+                # Clear only the published fields from the cache, unless they changed meanwhile
+                for field_name, value in snapshot.fields.items():
+                    if self.cache.get(field_name) == value:
                         del self.cache[field_name]
-
-                self.last_publish_time = current_time
+            if snapshot.stamps is not None:
+                self._sent_stamps = snapshot.stamps
+            self._unsent_window = None
 
             # Persist updated odometer value
             # self._save_odometer() // dont save ts
         else:
+            self._unsent_window = window
+            self._batched_stamps = []
             print(f"Failed to publish packet {packet_id}, will retry next cycle")
+        return success
+
+    def _observe_uplink(self, stamps):
+        """Frame-to-uplink latency of fields that just went out live, including any batched before them"""
+        now = time.time()
+        for stamp in self._batched_stamps:
+            FRAME_TO_UPLINK_SECONDS.observe(now - stamp)
+        for stamp in stamps:
+            FRAME_TO_UPLINK_SECONDS.observe(now - stamp)
+        self._batched_stamps = []
+
+    def publish_cached_data(self, current_time):
+        """Publish all complete cached data to MQTT"""
+        return self.publish_snapshot(self.take_snapshot(current_time))
 
 
 class MQTTManager:
-    """Manages MQTT connection and publishing"""
+    """Manages MQTT connection and publishing.
+
+    With a networking.spool.DiskSpool, packets that can't be sent (broker
+    unreachable or publish refused) are spooled instead of dropped, and the
+    spool is drained at up to `backfill_rate` packets/s once the broker is
+    back. While a backlog exists, live packets are spooled behind it too, so
+    the server receives packet IDs in order.
+
+    With a networking.batch.PacketBatcher, packets are collected and sent as
+    compressed envelopes on `batch_topic` instead of one message each (spool
+    backfill included).
+
+    Fault captures go out with publish_capture() on `capture_topic`/<name>,
+    zlib compressed, at QoS 1; capture_acked() tells when the broker has
+    acknowledged one (on_publish).
+
+    Given a core.history.SlotHistory, a {"type": "history", "patterns": [...],
+    "seconds": 10} (or "since": <timestamp>) message on server-communication
+    is answered on `history_topic` with the same JSON "history" message the
+    WebSocket sends. paho's network thread only queues the request; the
+    publisher thread builds the reply through answer_history_requests().
+    Patterns are required, and a reply over `history_max_bytes` is replaced
+    by a "history" message with an "error", so a request can't put the
+    whole history on the uplink.
+    """
     
-    def __init__(self, broker="192.168.1.109", port=1883, topic="angelique"):
+    def __init__(self, broker="192.168.1.109", port=1883, topic="angelique", spool=None, backfill_rate=50,
+                 batcher=None, batch_topic="angelique/batch", capture_topic="angelique/capture",
+                 history=None, history_topic="angelique/history", history_max_bytes=256 * 1024):
         self.broker = broker
         self.port = port
         self.topic = topic
         self.client = None
         self.connected = False
         self.packet_id = 0
+        self.encoder = TelemetryEncoder()
+        self.spool = spool
+        self.backfill_rate = backfill_rate
+        self._backfill_budget = 0.0
+        self._last_backfill = time.monotonic()
+        self.batcher = batcher
+        self.batch_topic = batch_topic
+        self.capture_topic = capture_topic
+        self.history = history
+        self.history_topic = history_topic
+        self.history_max_bytes = history_max_bytes
+        self.history_requests = deque(maxlen=8)  # Requests from paho's thread for the publisher thread
+        self.last_publish_live = False  # Whether the last publish() (or batch flush) went straight to the broker
+        self.last_publish_buffered = False  # Whether the last publish() is waiting in the batcher
+        # Capture acknowledgements; on_publish runs on paho's network thread
+        self._ack_lock = threading.Lock()
+        self._capture_mids = {}  # mid -> acknowledged yet
+        self._other_acks = deque(maxlen=64)  # Recent mids not (yet) known as captures
 
-    def on_connect(self, client, userdata, flags, rc):
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        # paho's VERSION2 callback API also passes MQTT v5 properties
         if rc == 0:
+            self.connected = True
             client.subscribe("server-communication")
             client.publish("client-connections", "BEVO-Angelique") # Server bookkeeping
         else:
             print(f"Failed to connect to MQTT broker, return code {rc}")
 
+    def on_publish(self, client, userdata, mid, reason_code=None, properties=None):
+        with self._ack_lock:
+            if mid in self._capture_mids:
+                self._capture_mids[mid] = True
+            else:
+                # The PUBACK can beat publish_capture() registering its mid
+                self._other_acks.append(mid)
+
     def on_message(self, client, userdata, msg):
         received_topic = msg.topic
-        received_message = json.loads(msg.payload.decode())
-        print(f"Received message on topic '{received_topic}': {received_message}")
+        try:
+            received_message = json.loads(msg.payload.decode())
+            print(f"Received message on topic '{received_topic}': {received_message}")
 
-        if (received_topic == "server-communication"):
-            if ("packet_id" in received_message):
-                self.packet_id = max(self.packet_id, int(received_message["packet_id"]) + 1)
-                print(f"Updated packet ID to {self.packet_id} based on server message")
-            else:
-                # TODO other server communciation as needed routing logic
-                pass
+            if (received_topic == "server-communication"):
+                if ("packet_id" in received_message):
+                    self.packet_id = max(self.packet_id, int(received_message["packet_id"]) + 1)
+                    print(f"Updated packet ID to {self.packet_id} based on server message")
+                elif received_message.get("type") == "history" and self.history is not None:
+                    self.history_requests.append(received_message)
+                else:
+                    # TODO other server communciation as needed routing logic
+                    pass
+        except (ValueError, TypeError, AttributeError) as e:
+            # paho re-raises callback exceptions, which would stop the network loop
+            print(f"Ignoring malformed message on topic '{received_topic}': {e}")
+
+    def answer_history_requests(self):
+        """Reply to the history requests received so far (called from the publisher thread)"""
+        while self.history_requests:
+            self._answer_history(self.history_requests.popleft())
+
+    def _answer_history(self, request):
+        """Publish the recent samples a history request asks for on history_topic"""
+        patterns = request.get("patterns") or ()
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        now = time.time()
+        try:
+            patterns = [str(pattern) for pattern in patterns]
+            since = float(request["since"]) if request.get("since") is not None \
+                else now - float(request.get("seconds") or self.history.seconds)
+        except (TypeError, ValueError):
+            print(f"Ignoring malformed history request: {request}")
+            return
+        if not patterns:
+            self._publish_history({"type": "history", "timestamp": now, "error": "patterns required"})
+            return
+        field_names = [field_name for field_name in self.history.layout.fields
+                       if field_matches(field_name, patterns)]
+        # Not the event loop: copy, and drop samples the CAN loop overwrites meanwhile
+        series = self.history.series(field_names, since, copy=True)
+        payload = json.dumps({"type": "history", "timestamp": now, "since": since, "series": series})
+        if len(payload) > self.history_max_bytes:
+            self._publish_history({
+                "type": "history", "timestamp": now, "since": since,
+                "error": f"reply of {len(payload)} bytes exceeds {self.history_max_bytes}; "
+                         "ask for fewer fields or a shorter window",
+            })
+            return
+        self._publish_history(payload)
+
+    def _publish_history(self, message):
+        if not self.is_connected():
+            return
+        self.client.publish(self.history_topic, message if isinstance(message, str) else json.dumps(message))
                         
     def initialize(self):
         """Initialize MQTT connection and fetch initial packet ID"""
         try:
             # Use the newer MQTT client API to avoid deprecation warning
             self.client = mqtt.Client( mqtt.CallbackAPIVersion.VERSION2, client_id = "BEVO-Angelique")
-            self.client.connect(self.broker, self.port, 60)
-            self.client.on_connect = self.on_connect # Route the message handlers
+            # Route the message handlers before connecting, so the connect_async retry below has them too
+            self.client.on_connect = self.on_connect
             self.client.on_message = self.on_message
+            self.client.on_publish = self.on_publish
+            self.client.connect(self.broker, self.port, 60)
             self.client.loop_start()  # Start the network loop
             self.connected = True
             print(f"Successfully connected to MQTT broker at {self.broker}:{self.port}")
@@ -191,6 +403,13 @@ class MQTTManager:
         except Exception as e:
             print(f"Warning: Could not connect to MQTT broker at {self.broker}:{self.port}")
             print(f"MQTT error: {e}")
+            if self.spool is not None and self.client is not None:
+                # Let the network loop keep retrying; packets are spooled until it gets through
+                self.client.connect_async(self.broker, self.port, 60)
+                self.client.loop_start()
+                self.connected = True
+                print("Spooling MQTT packets to disk until the broker is reachable...")
+                return False
             print("Continuing with WebSocket functionality only...")
             self.connected = False
             return False
@@ -228,70 +447,173 @@ class MQTTManager:
     
     def is_connected(self):
         """Check if MQTT is connected"""
-        return self.connected and self.client
+        return bool(self.connected and self.client and self.client.is_connected())
     
     def get_client(self):
         """Get the MQTT client instance"""
         return self.client
     
+    def _spool_packet(self, payload):
+        """Queue a packet on disk; it counts as handed off, so the packet ID moves on"""
+        self.spool.append(payload)
+        PACKETS_SPOOLED.inc()
+        self.increment_packet_id()
+        return True
+
+    def drain_spool(self):
+        """Send spooled packets, oldest first, at up to backfill_rate per second; returns how many went out"""
+        if self.spool is None or not self.spool.has_backlog():
+            return 0
+        now = time.monotonic()
+        # Budget refills at backfill_rate and is capped at one second's worth
+        self._backfill_budget = min(self._backfill_budget + (now - self._last_backfill) * self.backfill_rate,
+                                    self.backfill_rate)
+        self._last_backfill = now
+        if not self.is_connected():
+            return 0
+
+        payloads, position = self.spool.peek(int(self._backfill_budget))
+        sent = 0
+        try:
+            if self.batcher is None:
+                for payload in payloads:
+                    if self.client.publish(self.topic, payload).rc != 0:
+                        break
+                    sent += 1
+            else:
+                step = self.batcher.max_packets
+                for start in range(0, len(payloads), step):
+                    chunk = payloads[start:start + step]
+                    if self.client.publish(self.batch_topic, self.batcher.encode(chunk)).rc != 0:
+                        break
+                    sent += len(chunk)
+        except Exception as e:
+            print(f"MQTT backfill error: {e}")
+        if sent < len(payloads):
+            # Only commit what actually went out; the rest is retried next cycle
+            _, position = self.spool.peek(sent)
+        self.spool.commit(position, sent)
+        self._backfill_budget -= sent
+        PACKETS_BACKFILLED.inc(sent)
+        if sent and not self.spool.has_backlog():
+            print(f"MQTT spool drained ({self.spool.sent} packets backfilled)")
+        return sent
+
+    def publish_capture(self, name, data):
+        """Send one fault capture file; returns its message ID for capture_acked(), or None to retry later"""
+        if not self.is_connected():
+            return None
+        try:
+            result = self.client.publish(f"{self.capture_topic}/{name}", zlib.compress(data), qos=1)
+        except Exception as e:
+            print(f"MQTT capture publish error: {e}")
+            return None
+        if result.rc != 0:
+            return None
+        # Not under the lock around publish(): paho calls on_publish holding its own message lock
+        with self._ack_lock:
+            self._capture_mids[result.mid] = result.mid in self._other_acks
+        return result.mid
+
+    def capture_acked(self, mid):
+        """True once the broker has acknowledged capture message `mid` (forgets it then)"""
+        with self._ack_lock:
+            if self._capture_mids.get(mid):
+                del self._capture_mids[mid]
+                return True
+            return False
+
+    def forget_capture(self, mid):
+        """Stop waiting for an acknowledgement that isn't coming (the capture is sent again)"""
+        with self._ack_lock:
+            self._capture_mids.pop(mid, None)
+
+    def _publish_batch(self, payloads):
+        """Send packets as one envelope; spool them (or report the loss) if that fails.
+
+        Returns False only if the packets were lost.
+        """
+        sent = False
+        if self.spool is None or not self.spool.has_backlog():
+            try:
+                sent = self.is_connected() and \
+                    self.client.publish(self.batch_topic, self.batcher.encode(payloads)).rc == 0
+            except Exception as e:
+                print(f"MQTT batch publish error: {e}")
+        self.last_publish_live = sent
+        if sent:
+            PACKETS_SENT.inc(len(payloads))
+            return True
+        if self.spool is not None:
+            for payload in payloads:
+                self.spool.append(payload)
+            PACKETS_SPOOLED.inc(len(payloads))
+            return True
+        print(f"[ERROR] MQTT batch publish failed, dropped {len(payloads)} packets")
+        PUBLISH_FAILURES.inc()
+        return False
+
+    def flush_batch(self, force=False):
+        """Send the pending batch if its deadline has passed (or now, with force); True if it went out live"""
+        if self.batcher is None:
+            return False
+        payloads = self.batcher.take() if force else self.batcher.due()
+        if not payloads:
+            return False
+        self._publish_batch(payloads)
+        return self.last_publish_live
+
+    def _encode(self, telemetry_data):
+        """Serialize a telemetry_data dict with the cached encoder"""
+        start = time.perf_counter()
+        payload = self.encoder.encode(telemetry_data.get('fields', {}),
+                                      telemetry_data.get('packet_id', self.packet_id),
+                                      telemetry_data.get('timestamp', time.time()),
+                                      telemetry_data.get('stats', ()))
+        ENCODE_SECONDS.observe(time.perf_counter() - start)
+        return payload
+
     def publish(self, telemetry_data, protobuf_func):
         """Publish telemetry data via MQTT"""
+        self.last_publish_live = False
+        self.last_publish_buffered = False
+        if self.spool is not None:
+            self.drain_spool()
+            if not self.is_connected() or self.spool.has_backlog():
+                # Nothing goes out live while older packets are still waiting
+                if self.batcher is not None:
+                    for payload in self.batcher.take():
+                        self.spool.append(payload)
+                return self._spool_packet(self._encode(telemetry_data))
+
+        if self.batcher is not None:
+            payload = self._encode(telemetry_data)
+            # Handed to the batcher, so the next snapshot gets the next ID
+            self.increment_packet_id()
+            payloads = self.batcher.add(payload)
+            if not payloads:
+                self.last_publish_buffered = True
+                return True
+            return self._publish_batch(payloads)
+
         if not self.is_connected():
             print(f"MQTT not connected, skipping publish for packet {telemetry_data.get('packet_id', 'unknown')}")
+            PUBLISH_FAILURES.inc()
             return False
         
+        payload = None
         try:
             packet_id = telemetry_data.get('packet_id', self.packet_id)
             fields = telemetry_data.get('fields', {})
             print(f"Attempting to publish packet {packet_id} with {len(fields)} fields")
             
-            # Import protobuf directly to populate with telemetry data
-            from protobuf import generated as pb
-            
-            # Create protobuf message and populate with telemetry data
-            sensor_msg = pb.AngeliqueSensorData()
-            sensor_msg.time = int(telemetry_data.get('timestamp', time.time()) * 1000)
-            sensor_msg.packet_id = packet_id
-            
-            # Set each field in the protobuf
-            for field_name, value in fields.items():
-                try:
-                    # Navigate to the nested object and set the field
-                    obj = sensor_msg
-                    parts = field_name.split('.')
-                    for part in parts[:-1]:
-                        obj = getattr(obj, part)
-                    
-                    field_name_on_obj = parts[-1]
-                    field_descriptor = obj.DESCRIPTOR.fields_by_name[field_name_on_obj]
-                    is_integer_field = field_descriptor.type in [
-                        field_descriptor.TYPE_INT32, field_descriptor.TYPE_INT64,
-                        field_descriptor.TYPE_UINT32, field_descriptor.TYPE_UINT64,
-                        field_descriptor.TYPE_SINT32, field_descriptor.TYPE_SINT64,
-                        field_descriptor.TYPE_FIXED32, field_descriptor.TYPE_FIXED64,
-                        field_descriptor.TYPE_SFIXED32, field_descriptor.TYPE_SFIXED64
-                    ]
-                    
-                    if isinstance(value, list):
-                        field = getattr(obj, field_name_on_obj)
-                        if is_integer_field:
-                            field.extend([int(item) for item in value if item is not None])
-                        else:
-                            field.extend([float(item) for item in value if item is not None])
-                    else: 
-                        if is_integer_field:
-                            setattr(obj, field_name_on_obj, int(value))
-                        else:
-                            setattr(obj, field_name_on_obj, float(value))
-
-                except Exception as e:
-                    print(f"[WARN] Failed to set {field_name}: {e}")
-            
-            # Serialize and publish
-            payload = sensor_msg.SerializeToString()
+            # Serialize with the cached field resolution and reused message
+            payload = self._encode(telemetry_data)
             # print(f"[DEBUG] Protobuf message size: {len(payload)} bytes")
             
+            start = time.perf_counter()
             result = self.client.publish(self.topic, payload)
+            CLIENT_PUBLISH_SECONDS.observe(time.perf_counter() - start)
             # print(f"[DEBUG] MQTT publish result: {result}")
             # print(f"[DEBUG] MQTT publish return code: {result.rc}")
             # print(f"[DEBUG] MQTT publish message ID: {result.mid}")
@@ -301,18 +623,29 @@ class MQTTManager:
                 # Only increment packet ID after successful publish
                 self.increment_packet_id()
                 # print(f"Successfully published packet {packet_id}")
+                PACKETS_SENT.inc()
+                self.last_publish_live = True
                 return True
             else:
                 print(f"[ERROR] MQTT publish failed with return code: {result.rc}")
+                PUBLISH_FAILURES.inc()
+                if self.spool is not None:
+                    return self._spool_packet(payload)
                 return False
                 
         except Exception as e:
+            # Connection state is left to paho's own reconnect (is_connected() asks the client)
             print(f"MQTT publish error: {e}")
-            self.connected = False
+            PUBLISH_FAILURES.inc()
+            if self.spool is not None and payload is not None:
+                return self._spool_packet(payload)
             return False
     
     def shutdown(self):
         """Clean shutdown of MQTT connection"""
+        self.flush_batch(force=True)
+        if self.spool is not None:
+            self.spool.close()
         if self.client:
             try:
                 self.client.loop_stop()  # Stop the network loop
@@ -0,0 +1,165 @@
+import collections
+import queue
+import threading
+import time
+
+from core.value_store import merge_windows
+from core.metrics import REGISTRY
+
+SNAPSHOT_WAIT_SECONDS = REGISTRY.histogram("telemd_publish_queue_wait_seconds",
+                                           "Time a snapshot waited in the publisher queue")
+SNAPSHOT_PUBLISH_SECONDS = REGISTRY.histogram("telemd_publish_seconds",
+                                              "Publishing one snapshot: diff, encode, spool or send")
+CAPTURE_ACK_TIMEOUT = 30.0  # s to wait for the broker's PUBACK before sending a capture again
+
+
+class TelemetryPublisher:
+    """Runs MQTT encoding and publishing on one dedicated thread.
+
+    The event loop only calls submit() with an immutable snapshot from
+    TelemetryCache.take_snapshot(). Snapshots wait in a bounded queue, and the
+    oldest is dropped when it is full. That loses nothing but an intermediate
+    sample, because every publish sends whatever changed since the last
+    successful one. Aggregation windows of dropped snapshots are merged into
+    the incoming one, so their samples still count. A slow or hung broker
+    therefore never blocks the event loop or ties up default-executor
+    threads that CAN ingestion relies on.
+
+    Fault captures handed to submit_capture() are never dropped. With a
+    networking.captures.CaptureQueue they are written to disk on this thread
+    and uploaded ahead of the next snapshot, one at a time, while the
+    broker is connected. A capture is only marked sent once the broker has
+    acknowledged it; one not acknowledged within CAPTURE_ACK_TIMEOUT is
+    sent again.
+
+    History requests that MQTTManager received over MQTT are answered here
+    too, so their replies are built off paho's network thread.
+    """
+
+    def __init__(self, telemetry_cache, max_queue=16, captures=None):
+        self.telemetry_cache = telemetry_cache
+        self.captures = captures
+        self.new_captures = collections.deque()  # (name, data) not written to disk yet
+        self.capture_in_flight = None  # (name, mid, sent at) waiting for the broker's acknowledgement
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self._run, name="mqtt-publisher", daemon=True)
+        self.submitted = 0
+        self.dropped = 0
+        self.published = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.last_publish_seconds = 0.0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, snapshot):
+        """Queue a snapshot without blocking; drops the oldest queued one if full"""
+        while True:
+            try:
+                self.queue.put_nowait(snapshot)
+                break
+            except queue.Full:
+                try:
+                    dropped = self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    continue
+                if snapshot is not None and snapshot.window is not None and \
+                        dropped is not None and dropped.window is not None:
+                    snapshot = snapshot._replace(window=merge_windows(dropped.window, snapshot.window))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def submit_capture(self, name, data):
+        """Hand over a finished fault capture (written and uploaded on the publisher thread)"""
+        self.new_captures.append((name, data))
+
+    def _handle_captures(self):
+        while self.new_captures:
+            name, data = self.new_captures.popleft()
+            if self.captures is None:
+                print(f"No capture queue, dropped fault capture {name}")
+                continue
+            try:
+                self.captures.add(name, data)
+            except OSError as e:
+                print(f"Failed to write fault capture {name}: {e}")
+        if self.captures is None:
+            return
+        mqtt_manager = self.telemetry_cache.mqtt_manager
+        try:
+            if self.capture_in_flight is not None:
+                name, mid, sent_at = self.capture_in_flight
+                if mqtt_manager.capture_acked(mid):
+                    self.capture_in_flight = None
+                    self.captures.mark_sent(name)
+                    print(f"Uploaded fault capture {name}")
+                    return
+                if time.monotonic() - sent_at < CAPTURE_ACK_TIMEOUT:
+                    return
+                print(f"Fault capture {name} not acknowledged by the broker, sending it again")
+                mqtt_manager.forget_capture(mid)
+                self.capture_in_flight = None
+            pending = self.captures.pending()
+            if pending:
+                mid = mqtt_manager.publish_capture(pending[0], self.captures.read(pending[0]))
+                if mid is not None:
+                    self.capture_in_flight = (pending[0], mid, time.monotonic())
+        except OSError as e:
+            print(f"Fault capture upload error: {e}")
+
+    def _handle_history_requests(self):
+        mqtt_manager = self.telemetry_cache.mqtt_manager
+        if mqtt_manager is None or not mqtt_manager.history_requests:
+            return
+        try:
+            mqtt_manager.answer_history_requests()
+        except Exception as e:
+            print(f"History request error: {e}")
+
+    def _run(self):
+        while True:
+            snapshot = self.queue.get()
+            # Fault captures and history requests take priority over live telemetry
+            self._handle_captures()
+            self._handle_history_requests()
+            if snapshot is None:
+                break
+            SNAPSHOT_WAIT_SECONDS.observe(max(0.0, time.time() - snapshot.timestamp))
+            start = time.perf_counter()
+            try:
+                if self.telemetry_cache.publish_snapshot(snapshot):
+                    self.published += 1
+                else:
+                    self.failed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"MQTT publisher error: {e}")
+            self.last_publish_seconds = time.perf_counter() - start
+            SNAPSHOT_PUBLISH_SECONDS.observe(self.last_publish_seconds)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_depth': self.max_depth,
+            'submitted': self.submitted,
+            'published': self.published,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'last_publish_ms': self.last_publish_seconds * 1000,
+        }
+
+    def stop(self, timeout=5.0):
+        """Let queued snapshots go out, then stop the thread"""
+        if not self.thread.is_alive():
+            return
+        try:
+            # Wait for room rather than submit(), which would drop the oldest snapshot
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print("MQTT publisher did not stop in time (broker unresponsive?)")
@@ -0,0 +1,185 @@
+import os
+import struct
+import threading
+import zlib
+
+# Each record: payload length (uint32), crc32 of the payload (uint32), payload
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".seg"
+CURSOR_FILE = "cursor"
+CURSOR = struct.Struct("<QQ")  # segment number, byte offset of the next unsent record
+
+
+class DiskSpool:
+    """Bounded, crash-safe FIFO of serialized packets on disk.
+
+    Packets are appended to numbered segment files as length + crc32 + payload
+    records. A cursor file, replaced atomically, holds the segment and offset
+    of the oldest unsent packet. After a crash, at most the last uncommitted
+    batch is resent. A torn or corrupt record ends its segment, and reading
+    continues in the next one. Every run writes to a fresh segment, so new
+    packets never land behind a torn tail. Once the spool holds more than
+    `max_bytes`, the oldest segment is dropped.
+    """
+
+    def __init__(self, directory="spool", max_bytes=256 << 20, segment_bytes=4 << 20, sync_every=32):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.sync_every = sync_every
+        self.lock = threading.Lock()
+        self.appended = 0
+        self.sent = 0
+        self.dropped_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+        )
+        self.read_segment, self.read_offset = self._load_cursor()
+
+        # Segments wholly before the cursor were sent before the last shutdown
+        while self.segments and self.segments[0] < self.read_segment:
+            os.remove(self._path(self.segments.pop(0)))
+        if not self.segments or self.read_segment not in self.segments:
+            self.read_segment = self.segments[0] if self.segments else 0
+            self.read_offset = 0
+        self.total_bytes = sum(os.path.getsize(self._path(segment)) for segment in self.segments)
+
+        self.write_file = None
+        self.write_segment = self.segments[-1] if self.segments else -1
+        self.write_size = 0
+        self._roll()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE), "rb") as f:
+                return CURSOR.unpack(f.read(CURSOR.size))
+        except (FileNotFoundError, struct.error):
+            return 0, 0
+
+    def _save_cursor(self):
+        """Persist the read position atomically (write tmp, fsync, replace)"""
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(CURSOR.pack(self.read_segment, self.read_offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _roll(self):
+        """Start a new segment for writing"""
+        if self.write_file:
+            self.write_file.flush()
+            os.fsync(self.write_file.fileno())
+            self.write_file.close()
+        self.write_segment += 1
+        self.segments.append(self.write_segment)
+        self.write_file = open(self._path(self.write_segment), "ab")
+        self.write_size = 0
+        if self.read_segment not in self.segments:
+            self.read_segment, self.read_offset = self.segments[0], 0
+
+    def _drop_oldest(self):
+        segment = self.segments.pop(0)
+        path = self._path(segment)
+        size = os.path.getsize(path)
+        os.remove(path)
+        self.total_bytes -= size
+        if segment == self.read_segment:
+            self.dropped_bytes += size - self.read_offset
+            self.read_segment, self.read_offset = self.segments[0], 0
+            self._save_cursor()
+        else:
+            self.dropped_bytes += size
+        print(f"[WARN] MQTT spool over {self.max_bytes} bytes, dropped segment {segment} ({size} bytes)")
+
+    def append(self, payload):
+        """Add one packet to the back of the spool"""
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.lock:
+            if self.write_size >= self.segment_bytes:
+                self._roll()
+            self.write_file.write(record)
+            self.write_file.flush()
+            self.write_size += len(record)
+            self.total_bytes += len(record)
+            self.appended += 1
+            if self.appended % self.sync_every == 0:
+                os.fsync(self.write_file.fileno())
+            while self.total_bytes > self.max_bytes and len(self.segments) > 1:
+                self._drop_oldest()
+
+    def has_backlog(self):
+        """True while any appended packet hasn't been committed as sent"""
+        with self.lock:
+            return self.read_segment != self.write_segment or self.read_offset < self.write_size
+
+    def peek(self, max_packets=1):
+        """Return (payloads, position) for up to max_packets of the oldest unsent packets.
+
+        Nothing is removed until commit(position) is called.
+        """
+        with self.lock:
+            self.write_file.flush()
+            payloads = []
+            segment, offset = self.read_segment, self.read_offset
+            while len(payloads) < max_packets:
+                index = self.segments.index(segment)
+                with open(self._path(segment), "rb") as f:
+                    f.seek(offset)
+                    while len(payloads) < max_packets:
+                        header = f.read(RECORD_HEADER.size)
+                        if len(header) < RECORD_HEADER.size:
+                            break
+                        length, crc = RECORD_HEADER.unpack(header)
+                        payload = f.read(length)
+                        if len(payload) < length or zlib.crc32(payload) != crc:
+                            # Torn write from a crash; nothing after it in this segment is trustworthy
+                            print(f"[WARN] MQTT spool segment {segment} is corrupt at byte {offset}, skipping rest")
+                            offset = float("inf")
+                            break
+                        payloads.append(payload)
+                        offset += RECORD_HEADER.size + length
+                if len(payloads) >= max_packets or segment == self.write_segment:
+                    break
+                # Segment exhausted; carry on in the next one
+                segment, offset = self.segments[index + 1], 0
+            if offset == float("inf"):
+                offset = os.path.getsize(self._path(segment))
+            return payloads, (segment, offset)
+
+    def commit(self, position, count):
+        """Mark everything before `position` (from peek) as sent"""
+        with self.lock:
+            segment, offset = position
+            if segment < self.segments[0]:
+                # Dropped for space while it was being sent; the cursor has already moved on
+                self.sent += count
+                return
+            while self.segments[0] < segment:
+                old = self.segments.pop(0)
+                path = self._path(old)
+                self.total_bytes -= os.path.getsize(path)
+                os.remove(path)
+            self.read_segment, self.read_offset = segment, offset
+            self.sent += count
+            self._save_cursor()
+
+    def pending_bytes(self):
+        """Approximate size of the unsent backlog"""
+        with self.lock:
+            return self.total_bytes - self.read_offset
+
+    def close(self):
+        with self.lock:
+            if self.write_file:
+                self.write_file.flush()
+                os.fsync(self.write_file.fileno())
+                self.write_file.close()
+                self.write_file = None
@@ -5,5 +5,6 @@ Contains the protobuf schema and message publishing functionality.
 """
 
 from .interface import publish_msg
+from .encoder import TelemetryEncoder
 
-__all__ = ['publish_msg'] 
\ No newline at end of file
+__all__ = ['publish_msg', 'TelemetryEncoder'] 
\ No newline at end of file
@@ -0,0 +1,107 @@
+import time
+
+from google.protobuf.descriptor import FieldDescriptor
+
+from . import generated as pb
+
+_INTEGER_TYPES = {
+    FieldDescriptor.TYPE_INT32, FieldDescriptor.TYPE_INT64,
+    FieldDescriptor.TYPE_UINT32, FieldDescriptor.TYPE_UINT64,
+    FieldDescriptor.TYPE_SINT32, FieldDescriptor.TYPE_SINT64,
+    FieldDescriptor.TYPE_FIXED32, FieldDescriptor.TYPE_FIXED64,
+    FieldDescriptor.TYPE_SFIXED32, FieldDescriptor.TYPE_SFIXED64,
+}
+
+
+
+def _is_repeated(field_descriptor):
+    """FieldDescriptor.label was replaced by is_repeated in newer protobuf releases"""
+    try:
+        return field_descriptor.is_repeated
+    except AttributeError:
+        return field_descriptor.label == FieldDescriptor.LABEL_REPEATED
+
+
+class TelemetryEncoder:
+    """Serializes telemetry snapshots into one reused AngeliqueSensorData.
+
+    Every dotted field name ("pack.hv_pack_v") is resolved once against the
+    descriptors into (submessage path, leaf name, repeated?, int/float cast,
+    field number) and cached. Each encode clears the message and sets fields
+    from that cache.
+
+    Per-window statistics go into the repeated field_stats message, keyed by
+    the leaf's field number, which is unique across the schema.
+    """
+
+    def __init__(self, message_class=pb.AngeliqueSensorData):
+        self.message = message_class()
+        self._resolved = {}  # field_name -> (parents, leaf, repeated, cast, number), or None if unknown
+
+    def resolve(self, field_name):
+        """Resolve a dotted field name to its setter info, or None if it isn't in the schema"""
+        if field_name in self._resolved:
+            return self._resolved[field_name]
+
+        entry = None
+        try:
+            descriptor = self.message.DESCRIPTOR
+            parts = field_name.split('.')
+            for part in parts[:-1]:
+                descriptor = descriptor.fields_by_name[part].message_type
+            field_descriptor = descriptor.fields_by_name[parts[-1]]
+            entry = (
+                tuple(parts[:-1]),
+                parts[-1],
+                _is_repeated(field_descriptor),
+                int if field_descriptor.type in _INTEGER_TYPES else float,
+                field_descriptor.number,
+            )
+        except (KeyError, AttributeError):
+            print(f"[WARN] Failed to set {field_name}: not a field of {self.message.DESCRIPTOR.name}")
+
+        self._resolved[field_name] = entry
+        return entry
+
+    def encode(self, fields, packet_id, timestamp=None, stats=()):
+        """Return the serialized message for a {field_name: value} snapshot.
+
+        stats holds (field_name, index, count, min, max, mean) tuples for the
+        window since the previous packet.
+        """
+        msg = self.message
+        msg.Clear()
+        msg.time = int((timestamp if timestamp is not None else time.time()) * 1000)
+        msg.packet_id = packet_id
+
+        for field_name, value in fields.items():
+            try:
+                entry = self._resolved[field_name]
+            except KeyError:
+                entry = self.resolve(field_name)
+            if entry is None:
+                continue
+            parents, leaf, repeated, cast, _ = entry
+            try:
+                obj = msg
+                for part in parents:
+                    obj = getattr(obj, part)
+
+                if repeated:
+                    getattr(obj, leaf).extend([cast(item) for item in value if item is not None])
+                else:
+                    setattr(obj, leaf, cast(value))
+            except Exception as e:
+                print(f"[WARN] Failed to set {field_name}: {e}")
+
+        for field_name, index, count, minimum, maximum, mean in stats:
+            try:
+                entry = self._resolved[field_name]
+            except KeyError:
+                entry = self.resolve(field_name)
+            if entry is None:
+                continue
+            msg.field_stats.add(field=entry[4], index=index or 0, count=int(count),
+                                min=minimum, max=maximum, mean=mean)
+
+        return msg.SerializeToString()
@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0etemplate.proto\"\xf0\x01\n\x13\x41ngeliqueSensorData\x12\x0c\n\x04time\x18\x01 \x01(\x03\x12\x11\n\tpacket_id\x18\x02 \x01(\x03\x12$\n\x08\x64ynamics\x18\x03 \x01(\x0b\x32\x12.AngeliqueDynamics\x12$\n\x08\x63ontrols\x18\x04 \x01(\x0b\x32\x12.AngeliqueControls\x12\x1c\n\x04pack\x18\x05 \x01(\x0b\x32\x0e.AngeliquePack\x12*\n\x0b\x64iagnostics\x18\x06 \x01(\x0b\x32\x15.AngeliqueDiagnostics\x12\"\n\x07thermal\x18\x07 \x01(\x0b\x32\x11.AngeliqueThermal\"\x8c\x04\n\x11\x41ngeliqueDynamics\x12\x16\n\x0etorque_request\x18\x08 \x01(\x02\x12\x14\n\x0cvcu_position\x18\t \x03(\x02\x12\x14\n\x0cvcu_velocity\x18\n \x03(\x02\x12\x11\n\tvcu_accel\x18\x0b \x03(\x02\x12\x0b\n\x03gps\x18\x0c \x03(\x02\x12\x14\n\x0cgps_velocity\x18\r \x01(\x02\x12\x13\n\x0bgps_heading\x18\x0e \x01(\x02\x12\x13\n\x0b\x62ody1_accel\x18\x0f \x03(\x02\x12\x13\n\x0b\x62ody2_accel\x18\x10 \x03(\x02\x12\x13\n\x0b\x62ody3_accel\x18\x11 \x03(\x02\x12\x11\n\tflw_accel\x18\x12 \x03(\x02\x12\x11\n\tfrw_accel\x18\x13 \x03(\x02\x12\x11\n\tblw_accel\x18\x14 \x03(\x02\x12\x11\n\tbrw_accel\x18\x15 \x03(\x02\x12\x12\n\nbody1_gyro\x18\x16 \x03(\x02\x12\x12\n\nbody2_gyro\x18\x17 \x03(\x02\x12\x12\n\nbody3_gyro\x18\x18 \x03(\x02\x12\x11\n\tflw_speed\x18\x19 \x01(\x02\x12\x11\n\tfrw_speed\x18\x1a \x01(\x02\x12\x11\n\tblw_speed\x18\x1b \x01(\x02\x12\x11\n\tbrw_speed\x18\x1c \x01(\x02\x12\x12\n\ninverter_v\x18\x1d \x01(\x02\x12\x12\n\ninverter_c\x18\x1e \x01(\x02\x12\x14\n\x0cinverter_rpm\x18\x1f \x01(\x05\x12\x17\n\x0finverter_torque\x18  \x01(\x02\"\xb1\x01\n\x11\x41ngeliqueControls\x12\x11\n\tvcu_flags\x18! \x01(\x0c\x12\x16\n\x0evcu_flags_json\x18\" \x01(\t\x12\x0f\n\x07\x61pps1_v\x18# \x01(\x02\x12\x0f\n\x07\x61pps2_v\x18$ \x01(\x02\x12\x0e\n\x06\x62se1_v\x18% \x01(\x02\x12\x0e\n\x06\x62se2_v\x18& \x01(\x02\x12\x0e\n\x06sus1_v\x18\' \x01(\x02\x12\x0e\n\x06sus2_v\x18( \x01(\x02\x12\x0f\n\x07steer_v\x18) \x01(\x02\"\xa7\x01\n\rAngeliquePack\x12\x11\n\thv_pack_v\x18* \x01(\x02\x12\x15\n\rhv_tractive_v\x18+ \x01(\x02\x12\x0c\n\x04hv_c\x18, \x01(\x02\x12\x0c\n\x04lv_v\x18- \x01(\x02\x12\x0c\n\x04lv_c\x18. \x01(\x02\x12\x17\n\x0f\x63ontactor_state\x18/ \x01(\x05\x12\x12\n\navg_cell_v\x18\x30 \x01(\x02\x12\x15\n\ravg_cell_temp\x18\x31 \x01(\x02\"\xd7\x01\n\x14\x41ngeliqueDiagnostics\x12\x16\n\x0e\x63urrent_errors\x18\x32 \x01(\x0c\x12\x1b\n\x13\x63urrent_errors_json\x18\x33 \x01(\t\x12\x17\n\x0flatching_faults\x18\x34 \x01(\x0c\x12\x1c\n\x14latching_faults_json\x18\x35 \x01(\t\x12\x0f\n\x07\x63\x65lls_v\x18\x36 \x03(\x02\x12\x17\n\x0fhv_charge_state\x18\x37 \x01(\x02\x12\x17\n\x0flv_charge_state\x18\x38 \x01(\x02\x12\x10\n\x08odometer\x18\x39 \x01(\x02\"\x9f\x02\n\x10\x41ngeliqueThermal\x12\x12\n\ncells_temp\x18: \x03(\x05\x12\x14\n\x0c\x61mbient_temp\x18; \x01(\x05\x12\x15\n\rinverter_temp\x18< \x01(\x05\x12\x12\n\nmotor_temp\x18= \x01(\x05\x12\x18\n\x10water_motor_temp\x18> \x01(\x05\x12\x1b\n\x13water_inverter_temp\x18? \x01(\x05\x12\x16\n\x0ewater_rad_temp\x18@ \x01(\x05\x12\x13\n\x0brad_fan_set\x18\x41 \x01(\x05\x12\x13\n\x0brad_fan_rpm\x18\x42 \x01(\x03\x12\x14\n\x0c\x62\x61tt_fan_set\x18\x43 \x01(\x05\x12\x14\n\x0c\x62\x61tt_fan_rpm\x18\x44 \x01(\x05\x12\x11\n\tflow_rate\x18\x45 \x01(\x05\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0etemplate.proto\"\x9b\x02\n\x13\x41ngeliqueSensorData\x12\x0c\n\x04time\x18\x01 \x01(\x03\x12\x11\n\tpacket_id\x18\x02 \x01(\x03\x12$\n\x08\x64ynamics\x18\x03 \x01(\x0b\x32\x12.AngeliqueDynamics\x12$\n\x08\x63ontrols\x18\x04 \x01(\x0b\x32\x12.AngeliqueControls\x12\x1c\n\x04pack\x18\x05 \x01(\x0b\x32\x0e.AngeliquePack\x12*\n\x0b\x64iagnostics\x18\x06 \x01(\x0b\x32\x15.AngeliqueDiagnostics\x12\"\n\x07thermal\x18\x07 \x01(\x0b\x32\x11.AngeliqueThermal\x12)\n\x0b\x66ield_stats\x18\x46 \x03(\x0b\x32\x14.AngeliqueFieldStats\"\x8c\x04\n\x11\x41ngeliqueDynamics\x12\x16\n\x0etorque_request\x18\x08 \x01(\x02\x12\x14\n\x0cvcu_position\x18\t \x03(\x02\x12\x14\n\x0cvcu_velocity\x18\n \x03(\x02\x12\x11\n\tvcu_accel\x18\x0b \x03(\x02\x12\x0b\n\x03gps\x18\x0c \x03(\x02\x12\x14\n\x0cgps_velocity\x18\r \x01(\x02\x12\x13\n\x0bgps_heading\x18\x0e \x01(\x02\x12\x13\n\x0b\x62ody1_accel\x18\x0f \x03(\x02\x12\x13\n\x0b\x62ody2_accel\x18\x10 \x03(\x02\x12\x13\n\x0b\x62ody3_accel\x18\x11 \x03(\x02\x12\x11\n\tflw_accel\x18\x12 \x03(\x02\x12\x11\n\tfrw_accel\x18\x13 \x03(\x02\x12\x11\n\tblw_accel\x18\x14 \x03(\x02\x12\x11\n\tbrw_accel\x18\x15 \x03(\x02\x12\x12\n\nbody1_gyro\x18\x16 \x03(\x02\x12\x12\n\nbody2_gyro\x18\x17 \x03(\x02\x12\x12\n\nbody3_gyro\x18\x18 \x03(\x02\x12\x11\n\tflw_speed\x18\x19 \x01(\x02\x12\x11\n\tfrw_speed\x18\x1a \x01(\x02\x12\x11\n\tblw_speed\x18\x1b \x01(\x02\x12\x11\n\tbrw_speed\x18\x1c \x01(\x02\x12\x12\n\ninverter_v\x18\x1d \x01(\x02\x12\x12\n\ninverter_c\x18\x1e \x01(\x02\x12\x14\n\x0cinverter_rpm\x18\x1f \x01(\x05\x12\x17\n\x0finverter_torque\x18  \x01(\x02\"\xb1\x01\n\x11\x41ngeliqueControls\x12\x11\n\tvcu_flags\x18! \x01(\x0c\x12\x16\n\x0evcu_flags_json\x18\" \x01(\t\x12\x0f\n\x07\x61pps1_v\x18# \x01(\x02\x12\x0f\n\x07\x61pps2_v\x18$ \x01(\x02\x12\x0e\n\x06\x62se1_v\x18% \x01(\x02\x12\x0e\n\x06\x62se2_v\x18& \x01(\x02\x12\x0e\n\x06sus1_v\x18\' \x01(\x02\x12\x0e\n\x06sus2_v\x18( \x01(\x02\x12\x0f\n\x07steer_v\x18) \x01(\x02\"\xa7\x01\n\rAngeliquePack\x12\x11\n\thv_pack_v\x18* \x01(\x02\x12\x15\n\rhv_tractive_v\x18+ \x01(\x02\x12\x0c\n\x04hv_c\x18, \x01(\x02\x12\x0c\n\x04lv_v\x18- \x01(\x02\x12\x0c\n\x04lv_c\x18. \x01(\x02\x12\x17\n\x0f\x63ontactor_state\x18/ \x01(\x05\x12\x12\n\navg_cell_v\x18\x30 \x01(\x02\x12\x15\n\ravg_cell_temp\x18\x31 \x01(\x02\"\xd7\x01\n\x14\x41ngeliqueDiagnostics\x12\x16\n\x0e\x63urrent_errors\x18\x32 \x01(\x0c\x12\x1b\n\x13\x63urrent_errors_json\x18\x33 \x01(\t\x12\x17\n\x0flatching_faults\x18\x34 \x01(\x0c\x12\x1c\n\x14latching_faults_json\x18\x35 \x01(\t\x12\x0f\n\x07\x63\x65lls_v\x18\x36 \x03(\x02\x12\x17\n\x0fhv_charge_state\x18\x37 \x01(\x02\x12\x17\n\x0flv_charge_state\x18\x38 \x01(\x02\x12\x10\n\x08odometer\x18\x39 \x01(\x02\"\x9f\x02\n\x10\x41ngeliqueThermal\x12\x12\n\ncells_temp\x18: \x03(\x05\x12\x14\n\x0c\x61mbient_temp\x18; \x01(\x05\x12\x15\n\rinverter_temp\x18< \x01(\x05\x12\x12\n\nmotor_temp\x18= \x01(\x05\x12\x18\n\x10water_motor_temp\x18> \x01(\x05\x12\x1b\n\x13water_inverter_temp\x18? \x01(\x05\x12\x16\n\x0ewater_rad_temp\x18@ \x01(\x05\x12\x13\n\x0brad_fan_set\x18\x41 \x01(\x05\x12\x13\n\x0brad_fan_rpm\x18\x42 \x01(\x03\x12\x14\n\x0c\x62\x61tt_fan_set\x18\x43 \x01(\x05\x12\x14\n\x0c\x62\x61tt_fan_rpm\x18\x44 \x01(\x05\x12\x11\n\tflow_rate\x18\x45 \x01(\x05\"j\n\x13\x41ngeliqueFieldStats\x12\r\n\x05\x66ield\x18G \x01(\x05\x12\r\n\x05index\x18H \x01(\x05\x12\r\n\x05\x63ount\x18I \x01(\x05\x12\x0b\n\x03min\x18J \x01(\x02\x12\x0b\n\x03max\x18K \x01(\x02\x12\x0c\n\x04mean\x18L \x01(\x02\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'template_pb2', globals())
@@ -21,15 +21,17 @@ if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
   _ANGELIQUESENSORDATA._serialized_start=19
-  _ANGELIQUESENSORDATA._serialized_end=259
-  _ANGELIQUEDYNAMICS._serialized_start=262
-  _ANGELIQUEDYNAMICS._serialized_end=786
-  _ANGELIQUECONTROLS._serialized_start=789
-  _ANGELIQUECONTROLS._serialized_end=966
-  _ANGELIQUEPACK._serialized_start=969
-  _ANGELIQUEPACK._serialized_end=1136
-  _ANGELIQUEDIAGNOSTICS._serialized_start=1139
-  _ANGELIQUEDIAGNOSTICS._serialized_end=1354
-  _ANGELIQUETHERMAL._serialized_start=1357
-  _ANGELIQUETHERMAL._serialized_end=1644
+  _ANGELIQUESENSORDATA._serialized_end=302
+  _ANGELIQUEDYNAMICS._serialized_start=305
+  _ANGELIQUEDYNAMICS._serialized_end=829
+  _ANGELIQUECONTROLS._serialized_start=832
+  _ANGELIQUECONTROLS._serialized_end=1009
+  _ANGELIQUEPACK._serialized_start=1012
+  _ANGELIQUEPACK._serialized_end=1179
+  _ANGELIQUEDIAGNOSTICS._serialized_start=1182
+  _ANGELIQUEDIAGNOSTICS._serialized_end=1397
+  _ANGELIQUETHERMAL._serialized_start=1400
+  _ANGELIQUETHERMAL._serialized_end=1687
+  _ANGELIQUEFIELDSTATS._serialized_start=1689
+  _ANGELIQUEFIELDSTATS._serialized_end=1795
 # @@protoc_insertion_point(module_scope)
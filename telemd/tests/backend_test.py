@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import core  # noqa: F401  (networking and core import each other; core has to load first)
+from benchmarks.stages import FiniteReplayInterface, OfflineMQTTManager, scratch_directory
+from benchmarks.traffic import write_capture
+from core import backend
+from core.field_mappings import CellDataAggregator
+from core.value_store import SlotStore, build_field_layout
+from data_logging.logger import LatestValuesCache
+
+
+class FlakyAggregator(CellDataAggregator):
+    """Raises on the first cell voltage frame only"""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+
+    def process_voltage(self, can_id, data):
+        if not self.failed:
+            self.failed = True
+            raise ValueError("bad cell frame")
+        return super().process_voltage(can_id, data)
+
+
+class ProcessCanMessagesTest(unittest.TestCase):
+    def test_failing_frame_skips_only_itself(self):
+        overrides = {
+            "CSV_LOGGING_ENABLED": False, "HISTORY_ENABLED": False, "TRIGGERS_ENABLED": False,
+            "MQTT_AGGREGATE_ENABLED": False, "MQTT_SPOOL_ENABLED": False, "BUS_STATS_ENABLED": False,
+            "SHARED_VALUES_ENABLED": False, "CAN_REPLAY_SPEED": 0,
+            "CellDataAggregator": FlakyAggregator, "CANInterface": FiniteReplayInterface,
+            "MQTTManager": OfflineMQTTManager,
+        }
+        cache = LatestValuesCache(SlotStore(build_field_layout()))
+        errors = backend.CAN_FRAME_ERRORS.value
+        with scratch_directory() as directory, mock.patch.multiple(backend, **overrides):
+            path = os.path.join(directory, "capture.bin")
+            count = write_capture(path, 0.5)
+            with mock.patch.object(backend, "CAN_REPLAY_FILE", path):
+                asyncio.run(backend.process_can_messages(cache))
+        frames, _ = FiniteReplayInterface.runs.pop()
+
+        self.assertEqual(frames, count)
+        self.assertEqual(backend.CAN_FRAME_ERRORS.value - errors, 1)
+        # Frames in the same batch after the failing one still reached the store
+        self.assertTrue(cache.store.stamps[cache.store.layout.slot("pack.avg_cell_v")])
+        self.assertTrue(cache.store.stamps[cache.store.layout.slot("pack.hv_pack_v")])
+
+
+if __name__ == '__main__':
+    unittest.main()
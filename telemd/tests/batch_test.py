@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import core  # noqa: F401  (networking and core import each other; core has to load first)
+from networking.batch import (
+    BATCH_HEADER, BATCH_MAGIC, CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD, PacketBatcher, decode_batch, encode_batch,
+    zstandard,
+)
+
+PAYLOADS = [b"", b"\x08\x01", bytes(range(256)) * 4, b"last packet"]
+
+
+class BatchCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        for codec in (CODEC_NONE, CODEC_ZLIB):
+            envelope = encode_batch(PAYLOADS, codec)
+            self.assertEqual(BATCH_HEADER.unpack_from(envelope), (BATCH_MAGIC, codec, len(PAYLOADS)))
+            self.assertEqual(decode_batch(envelope), PAYLOADS)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_round_trip_zstd(self):
+        self.assertEqual(decode_batch(encode_batch(PAYLOADS, CODEC_ZSTD, 3)), PAYLOADS)
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            decode_batch(b"XXXX" + encode_batch(PAYLOADS)[4:])
+        with self.assertRaises(ValueError):
+            decode_batch(BATCH_HEADER.pack(BATCH_MAGIC, 9, 0))
+
+
+class PacketBatcherTest(unittest.TestCase):
+    def test_flushes_when_full(self):
+        batcher = PacketBatcher(max_packets=3, max_delay=10.0)
+        self.assertIsNone(batcher.add(b"a", now=0.0))
+        self.assertIsNone(batcher.add(b"b", now=0.1))
+        self.assertEqual(batcher.add(b"c", now=0.2), [b"a", b"b", b"c"])
+        self.assertEqual(batcher.pending, [])
+
+    def test_flushes_by_size(self):
+        batcher = PacketBatcher(max_packets=100, max_bytes=10, max_delay=10.0)
+        self.assertIsNone(batcher.add(bytes(6), now=0.0))
+        self.assertEqual(len(batcher.add(bytes(6), now=0.0)), 2)
+
+    def test_flushes_after_delay(self):
+        batcher = PacketBatcher(max_packets=100, max_delay=1.0)
+        batcher.add(b"a", now=5.0)
+        self.assertIsNone(batcher.due(now=5.5))
+        self.assertEqual(batcher.add(b"b", now=6.0), [b"a", b"b"])
+        self.assertIsNone(batcher.due(now=100.0))  # Nothing pending
+
+    def test_encode_uses_its_codec(self):
+        batcher = PacketBatcher(codec="none")
+        envelope = batcher.encode(PAYLOADS)
+        self.assertEqual(BATCH_HEADER.unpack_from(envelope)[1], CODEC_NONE)
+        self.assertEqual(decode_batch(envelope), PAYLOADS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import json
+import os
+import sys
+import unittest
+
+import msgpack
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.broadcaster import TelemetryBroadcaster, select_subprotocol
+from core.history import SlotHistory
+from core.value_store import FieldLayout, SlotStore
+from data_logging.logger import LatestValuesCache
+from protobuf import generated as pb
+
+
+class TelemetryBroadcasterTest(unittest.TestCase):
+    def setUp(self):
+        self.store = SlotStore(FieldLayout([("pack.hv_pack_v", None), ("thermal.cells_temp", 2),
+                                            ("dynamics.flw_speed", None), ("dynamics.frw_speed", None)]))
+        self.cache = LatestValuesCache(self.store)
+        self.history = SlotHistory(self.store.layout)
+        self.broadcaster = TelemetryBroadcaster(self.cache, rate=30.0, history=self.history)
+        self.store.update("pack.hv_pack_v", 400.0, timestamp=1.0)
+        self.store.update("dynamics.flw_speed", 20.0, timestamp=1.0)
+
+    def send(self, client, message):
+        return self.broadcaster.handle_message(client, json.dumps(message))
+
+    def test_full_frame(self):
+        self.cache.update_value("vehicle.gear", "D", timestamp=1.0)  # Outside the store
+        frame = json.loads(self.broadcaster.build_frame(timestamp=5.0))
+        self.assertEqual((frame["type"], frame["timestamp"]), ("telemetry_update", 5.0))
+        self.assertEqual(frame["data"], {"pack": {"hv_pack_v": 400.0}, "dynamics": {"flw_speed": 20.0},
+                                         "vehicle": {"gear": "D"}})
+
+    def test_one_frame_per_tick_shared_by_clients(self):
+        broadcaster = self.broadcaster
+        slow, fast = broadcaster.register(), broadcaster.register()
+        broadcaster._tick(0.0, broadcaster.interval)
+        self.assertEqual(broadcaster.frames_built, 1)
+        self.assertIs(slow.queue.get_nowait()[2], fast.queue.get_nowait()[2])
+
+        broadcaster._tick(broadcaster.interval, broadcaster.interval)
+        fast.queue.get_nowait()
+        self.store.update("pack.hv_pack_v", 401.0, timestamp=2.0)
+        broadcaster._tick(2 * broadcaster.interval, broadcaster.interval)
+        # The slow client's unsent frame was replaced by the newer one
+        self.assertEqual(broadcaster.frames_dropped, 1)
+        seq, _, frame = slow.queue.get_nowait()
+        self.assertEqual((seq, json.loads(frame)["data"]["pack"]), (broadcaster.seq, {"hv_pack_v": 401.0}))
+
+    def test_nothing_to_send(self):
+        broadcaster = TelemetryBroadcaster(LatestValuesCache(SlotStore(FieldLayout([("pack.lv_v", None)]))))
+        self.assertIsNone(broadcaster.build_frame())
+
+    def test_deltas_against_any_earlier_tick(self):
+        broadcaster = self.broadcaster
+        broadcaster._advance()
+        base = broadcaster.seq
+        self.store.update("thermal.cells_temp", 31.0, index=1, timestamp=2.0)
+        broadcaster._advance()
+        delta = json.loads(broadcaster.build_delta(base))
+        self.assertEqual((delta["type"], delta["base_seq"], delta["seq"]), ("telemetry_delta", base, base + 1))
+        self.assertEqual(delta["data"], {"thermal": {"cells_temp": [None, 31.0]}})
+
+        broadcaster._advance()
+        self.assertIsNone(broadcaster.build_delta(base + 1))  # Nothing changed since
+        self.assertEqual(json.loads(broadcaster.build_delta(base))["data"], delta["data"])
+
+    def test_delta_clients_get_changes_and_keyframes(self):
+        broadcaster = self.broadcaster
+        client = broadcaster.register()
+        self.assertTrue(self.send(client, {"type": "set_mode", "mode": "delta"}))
+        self.assertFalse(self.send(client, {"type": "set_mode", "mode": "sometimes"}))
+        broadcaster._tick(0.0, broadcaster.interval)
+        seq, base, _ = client.queue.get_nowait()
+        self.assertIsNone(base)  # Starts with a keyframe
+        client.last_seq = seq  # As send_to() does once it is sent
+
+        self.store.update("dynamics.frw_speed", 21.0, timestamp=2.0)
+        broadcaster._tick(1.0, broadcaster.interval)
+        seq, base, frame = client.queue.get_nowait()
+        self.assertEqual(base, client.last_seq)
+        self.assertEqual(json.loads(frame)["data"], {"dynamics": {"frw_speed": 21.0}})
+        client.last_seq = seq
+
+        broadcaster._tick(2.0, broadcaster.interval)
+        self.assertTrue(client.queue.empty())  # Nothing changed
+        self.assertEqual(client.last_seq, broadcaster.seq)
+        broadcaster._tick(1.0 + broadcaster.keyframe_interval, broadcaster.interval)
+        self.assertIsNone(client.queue.get_nowait()[1])
+
+        self.assertTrue(self.send(client, {"type": "resync"}))
+        broadcaster._tick(2.0 + broadcaster.keyframe_interval, broadcaster.interval)
+        self.assertIsNone(client.queue.get_nowait()[1])
+
+    def test_msgpack_uses_field_ids(self):
+        broadcaster = self.broadcaster
+        fields = msgpack.unpackb(broadcaster.field_dictionary())
+        self.assertEqual(fields["fields"][:3], ["pack.hv_pack_v", "thermal.cells_temp", "dynamics.flw_speed"])
+        self.assertEqual(fields["sizes"][:2], [0, 2])
+        frame = msgpack.unpackb(broadcaster.build_frame(format="msgpack"), strict_map_key=False)
+        self.assertEqual(frame["data"], {0: 400.0, 2: 20.0})
+
+    def test_protobuf_frames(self):
+        self.assertEqual(select_subprotocol(None, ["chat", "telemd.protobuf", "telemd.msgpack"]), "telemd.protobuf")
+        self.assertIsNone(select_subprotocol(None, ["chat"]))
+        client = self.broadcaster.register("telemd.protobuf")
+        self.assertEqual(client.format, "protobuf")
+        self.assertFalse(self.send(client, {"type": "set_mode", "mode": "delta"}))  # Full frames only
+
+        self.store.update("thermal.cells_temp", 31.0, index=0, timestamp=2.0)
+        self.broadcaster._tick(0.0, self.broadcaster.interval)
+        message = pb.AngeliqueSensorData.FromString(client.queue.get_nowait()[2])
+        self.assertEqual((message.pack.hv_pack_v, message.dynamics.flw_speed), (400.0, 20.0))
+        self.assertEqual(list(message.thermal.cells_temp), [])  # Not sent until every cell is known
+
+    def test_subscriptions(self):
+        broadcaster = self.broadcaster
+        client = broadcaster.register()
+        self.assertTrue(self.send(client, {"type": "subscribe", "patterns": ["dynamics.*_speed"], "rate": 500}))
+        self.assertEqual(client.patterns, ("dynamics.*_speed",))
+        self.assertAlmostEqual(client.interval, 1.0 / broadcaster.max_rate)
+        self.assertFalse(self.send(client, {"type": "subscribe", "rate": "fast"}))
+        self.assertFalse(self.send(client, {"type": "unknown"}))
+        self.assertFalse(broadcaster.handle_message(client, "not json"))
+
+        broadcaster._tick(0.0, broadcaster.interval)
+        seq, base, frame = client.queue.get_nowait()
+        self.assertIsNone(base)
+        self.assertEqual(json.loads(frame)["data"], {"dynamics": {"flw_speed": 20.0}})
+
+        # A bare category means all of it; an empty list means everything
+        self.assertTrue(self.send(client, {"type": "subscribe", "patterns": ["pack"]}))
+        broadcaster._tick(1.0, broadcaster.interval)
+        self.assertEqual(json.loads(client.queue.get_nowait()[2])["data"], {"pack": {"hv_pack_v": 400.0}})
+        self.assertTrue(self.send(client, {"type": "subscribe", "patterns": []}))
+        self.assertIsNone(client.patterns)
+
+    def test_clients_due_at_their_own_rate(self):
+        broadcaster = self.broadcaster
+        fast, slow = broadcaster.register(), broadcaster.register()
+        self.send(fast, {"type": "subscribe", "patterns": ["pack"], "rate": 20})
+        self.send(slow, {"type": "subscribe", "patterns": ["pack"], "rate": 5})
+        received = {fast: 0, slow: 0}
+        for tick in range(20):
+            broadcaster._tick(tick * 0.05, 0.05)
+            for client in received:
+                if not client.queue.empty():
+                    client.queue.get_nowait()
+                    received[client] += 1
+        self.assertEqual((received[fast], received[slow]), (20, 5))
+        self.assertEqual(broadcaster.frames_built, 20)  # The slow client shares the fast one's frame
+
+    def test_match_cache_follows_subscriptions(self):
+        broadcaster = self.broadcaster
+        client, other = broadcaster.register(), broadcaster.register()
+        self.send(other, {"type": "subscribe", "patterns": ["pack"]})
+        for i in range(20):
+            self.send(client, {"type": "subscribe", "patterns": [f"dynamics.{i}*"]})
+            broadcaster._tick(float(i), broadcaster.interval)
+        self.assertEqual(set(broadcaster._matchers), {("pack",), ("dynamics.19*",)})
+        broadcaster.unregister(client)
+        self.assertEqual(set(broadcaster._matchers), {("pack",)})
+
+    def test_history_request(self):
+        broadcaster = self.broadcaster
+        slot = self.store.layout.slot("thermal.cells_temp", 0)
+        for i in range(5):
+            self.history.add(slot, 30.0 + i, 10.0 + i)
+        client = broadcaster.register()
+        reply = json.loads(self.send(client, {"type": "history", "patterns": ["thermal"], "since": 12.0}))
+        self.assertEqual(reply["type"], "history")
+        self.assertEqual(reply["series"], {"thermal.cells_temp[0]": {"t": [13.0, 14.0], "v": [33.0, 34.0]}})
+        self.assertFalse(self.send(client, {"type": "history", "since": "yesterday"}))
+        self.assertEqual(broadcaster._matchers, {})  # One-off patterns aren't cached
+
+        msgpack_client = broadcaster.register("telemd.msgpack")
+        reply = msgpack.unpackb(self.send(msgpack_client, {"type": "history", "patterns": "thermal", "since": 13.0}))
+        self.assertEqual(reply["series"], {"thermal.cells_temp[0]": {"t": [14.0], "v": [34.0]}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from interfaces.bus_stats import CAN_ERR_BUSERROR, CAN_ERR_CRTL, STANDARD_FRAME_BITS, BusStatistics
+from interfaces.recorder import FLAG_ERROR, FLAG_EXTENDED, RawFrame
+
+
+def _frames(can_id, rate, start, seconds):
+    """Evenly spaced 8-byte frames of one ID"""
+    count = int(rate * seconds)
+    return [RawFrame(start + i / rate, can_id, bytes(8)) for i in range(count)]
+
+
+class BusStatisticsTest(unittest.TestCase):
+    def test_flags_a_slowed_id(self):
+        stats = BusStatistics(known_ids=(0x100, 0x200), slow_ratio=0.5)
+        self.assertIsNone(stats.roll(0.0))
+        for second in range(3):
+            stats.add_batch(_frames(0x100, 100, second, 1.0) + _frames(0x200, 10, second, 1.0))
+            period = stats.roll(second + 1.0)
+            self.assertEqual(period.slow_ids, [])
+        self.assertAlmostEqual(stats.rates[0x100], 100.0)
+
+        # 0x100 drops to 5 Hz; 0x200 carries on
+        stats.add_batch(_frames(0x100, 5, 3.0, 1.0) + _frames(0x200, 10, 3.0, 1.0))
+        period = stats.roll(4.0)
+        self.assertEqual(period.slow_ids, [0x100])
+        self.assertAlmostEqual(stats.baseline_rates[0x100], 100.0)  # Not dragged down by the slow period
+        self.assertEqual(period.frames, 15)
+
+        stats.add_batch(_frames(0x100, 100, 4.0, 1.0))
+        self.assertEqual(stats.roll(5.0).slow_ids, [0x200])  # 0x200 went quiet instead
+
+    def test_rates_gaps_and_load(self):
+        stats = BusStatistics(known_ids=(0x100,), bitrate=500000)
+        stats.roll(0.0)
+        frames = _frames(0x100, 100, 0.0, 1.0)
+        del frames[50:55]  # A 60 ms gap
+        stats.add_batch(frames + [RawFrame(0.5, 0x321, bytes(2))])
+        period = stats.roll(1.0)
+        self.assertEqual((period.frames, period.unmapped_ids), (96, 1))
+        self.assertAlmostEqual(period.load, (95 * STANDARD_FRAME_BITS[8] + STANDARD_FRAME_BITS[2]) / 500000)
+
+        row = {row.can_id: row for row in stats.ids()}[0x100]
+        self.assertAlmostEqual(row.last_max_gap, 0.06)
+        self.assertAlmostEqual(row.interval, 0.01, places=2)
+        self.assertTrue(row.mapped)
+        self.assertEqual(stats.unmapped_ids(), [0x321])
+        self.assertEqual(stats.unmapped_frames(), 1)
+
+    def test_error_and_extended_frames(self):
+        stats = BusStatistics()
+        error = RawFrame(1.0, CAN_ERR_CRTL | CAN_ERR_BUSERROR, bytes([0, 0x10, 0, 0, 0, 0, 0, 0]), FLAG_ERROR)
+        extended = RawFrame(1.0, 0x18FF0001, bytes(8), FLAG_EXTENDED)
+        frame = RawFrame(1.0, 0x100, bytes(8))
+        self.assertEqual(stats.add_batch([frame, error, extended]), [frame, extended])
+        self.assertEqual((stats.error_frames, stats.extended_frames, stats.total_frames), (1, 1, 2))
+        self.assertEqual(stats.errors["controller"], 1)
+        self.assertEqual(stats.errors["bus_error"], 1)
+        self.assertEqual(stats.errors["error_passive"], 1)
+        self.assertEqual(stats.frames[0x100], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
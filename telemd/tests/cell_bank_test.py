@@ -0,0 +1,70 @@
+import os
+import random
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.field_mappings import CELL_TEMPERATURE_IDS, CELL_VOLTAGE_IDS, CellBank, CellDataAggregator
+
+
+def _frame(*raw):
+    return struct.pack(f'<{len(raw)}H', *raw)
+
+
+class CellBankTest(unittest.TestCase):
+    def assertMatchesRescan(self, bank, cells):
+        """bank.stats() against a from-scratch pass over every cell seen so far"""
+        stats = bank.stats()
+        units = list(cells.values())
+        self.assertEqual(stats['count'], len(cells))
+        self.assertEqual(stats['avg'], sum(units) * bank.unit_scale / len(units))
+        self.assertEqual((stats['min'], stats['max']), (min(units) * bank.unit_scale, max(units) * bank.unit_scale))
+        self.assertEqual(stats['spread'], (max(units) - min(units)) * bank.unit_scale)
+        self.assertEqual(cells[stats['min_cell']], min(units))
+        self.assertEqual(cells[stats['max_cell']], max(units))
+
+    def test_short_frames_are_zero_padded(self):
+        bank = CellBank(range(0x10, 0x12), 0.5)
+        # Three bytes: the second cell only has its low byte
+        self.assertEqual(bank.update(0x11, _frame(10, 0x0114)[:3]), (4, [5.0, 10.0, 0.0, 0.0]))
+        self.assertEqual(bank.update(0x10, b''), (0, [0.0, 0.0, 0.0, 0.0]))
+        self.assertEqual(bank.stats()['max_cell'], 5)
+        self.assertEqual(bank.values(), [0.0] * 4 + [5.0, 10.0, 0.0, 0.0])
+
+    def test_extremes_moving_inward(self):
+        bank = CellBank(range(0x10, 0x12), 1.0)
+        bank.update(0x10, _frame(5, 9, 5, 5))
+        bank.update(0x11, _frame(1, 5, 5, 5))
+        bank.update(0x10, _frame(5, 6, 5, 5))  # The max cell drops, so it is rescanned
+        bank.update(0x11, _frame(4, 7, 5, 5))  # The min cell rises and a new max appears
+        self.assertEqual(bank.stats(), {'count': 8, 'avg': 42 / 8, 'min': 4.0, 'max': 7.0, 'spread': 3.0,
+                                        'min_cell': 4, 'max_cell': 5})
+
+    def test_random_frames_out_of_order(self):
+        rng = random.Random(7)
+        for can_ids, scale, truncate in ((CELL_VOLTAGE_IDS, 0.0001, False), (CELL_TEMPERATURE_IDS, 0.1, True)):
+            bank = CellBank(can_ids, scale, truncate)
+            cells = {}
+            for _ in range(2000):
+                can_id = rng.choice(can_ids)
+                raw = [rng.choice([rng.randint(30000, 42000), rng.randint(0, 65535)]) for _ in range(4)]
+                data = _frame(*raw)[:rng.choice([8, 8, 8, rng.randint(0, 7)])]
+                offset, values = bank.update(can_id, data)
+                self.assertEqual(offset, (can_id - can_ids.start) * 4)
+                padded = struct.unpack('<4H', data.ljust(8, b'\0'))
+                units = [int(r * scale) for r in padded] if truncate else list(padded)
+                cells.update(zip(range(offset, offset + 4), units))
+                self.assertEqual(values, [unit * bank.unit_scale for unit in units])
+                self.assertMatchesRescan(bank, cells)
+            self.assertEqual(bank.values(), [cells[cell] * bank.unit_scale for cell in sorted(cells)])
+
+    def test_empty_bank(self):
+        self.assertEqual(CellBank(CELL_VOLTAGE_IDS, 0.0001).stats()['count'], 0)
+        self.assertEqual(CellDataAggregator().process_voltage(CELL_VOLTAGE_IDS.start, _frame(37000, 0, 0, 0))[2],
+                         37000 * 0.0001 / 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
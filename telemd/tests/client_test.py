@@ -0,0 +1,201 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import core  # noqa: F401  (networking and core import each other; core has to load first)
+from core.history import SlotHistory
+from core.value_store import FieldLayout, SlotStore, WindowAggregator
+from networking import client as client_module
+from networking.client import MQTTManager, TelemetryCache
+from networking.publisher import TelemetryPublisher
+from networking.spool import DiskSpool
+
+
+class UnreachableBrokerClient:
+    """paho Client stand-in whose blocking connect() fails, as with the broker down at boot"""
+
+    def __init__(self, *args, **kwargs):
+        self.on_connect = self.on_message = self.on_publish = None
+        self.calls = []
+        self.subscribed = []
+
+    def connect(self, host, port, keepalive):
+        self.calls.append("connect")
+        raise ConnectionRefusedError("broker down")
+
+    def connect_async(self, host, port, keepalive):
+        self.calls.append("connect_async")
+
+    def loop_start(self):
+        self.calls.append("loop_start")
+
+    def subscribe(self, topic):
+        self.subscribed.append(topic)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        pass
+
+    def is_connected(self):
+        return False
+
+
+class MQTTManagerInitializeTest(unittest.TestCase):
+    def test_callbacks_set_when_first_connect_fails(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(client_module.mqtt, "Client", UnreachableBrokerClient):
+            manager = MQTTManager(spool=DiskSpool(os.path.join(directory, "spool")))
+            self.assertFalse(manager.initialize())
+
+        client = manager.client
+        self.assertEqual(client.calls, ["connect", "connect_async", "loop_start"])
+        self.assertEqual((client.on_connect, client.on_message, client.on_publish),
+                         (manager.on_connect, manager.on_message, manager.on_publish))
+
+        # Once the retry gets through, the subscription is made as on a normal start
+        client.on_connect(client, None, {}, 0)
+        self.assertEqual(client.subscribed, ["server-communication"])
+
+    def test_without_spool_gives_up(self):
+        with mock.patch.object(client_module.mqtt, "Client", UnreachableBrokerClient):
+            manager = MQTTManager()
+            self.assertFalse(manager.initialize())
+        self.assertEqual(manager.client.calls, ["connect"])
+        self.assertFalse(manager.connected)
+
+
+class ConnectedClient(UnreachableBrokerClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.published = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+    def is_connected(self):
+        return True
+
+
+class Message:
+    def __init__(self, payload, topic="server-communication"):
+        self.topic = topic
+        self.payload = payload
+
+
+class MQTTHistoryTest(unittest.TestCase):
+    def setUp(self):
+        layout = FieldLayout([("dynamics.flw_speed", None), ("pack.lv_v", None)])
+        self.history = SlotHistory(layout, seconds=10.0, default_rate=10)
+        self.start = time.time() - 5.0
+        for i in range(50):
+            self.history.add(0, float(i), self.start + i * 0.1)
+        self.manager = MQTTManager(history=self.history, history_max_bytes=4096)
+        self.manager.client = self.client = ConnectedClient()
+        self.manager.connected = True
+
+    def request(self, **request):
+        self.manager.on_message(self.client, None, Message(json.dumps(dict(type="history", **request)).encode()))
+        self.manager.answer_history_requests()
+        topic, payload = self.client.published.pop()
+        self.assertEqual(topic, "angelique/history")
+        return json.loads(payload)
+
+    def test_bad_payloads_do_not_raise(self):
+        for payload in (b"not json", b"\xff\xfe", b"[1, 2]", b'{"packet_id": "next"}', b'"history"'):
+            self.manager.on_message(self.client, None, Message(payload))
+        self.assertEqual((self.manager.packet_id, list(self.manager.history_requests)), (0, []))
+
+    def test_answered_on_the_publisher_thread(self):
+        self.manager.on_message(self.client, None, Message(b'{"type": "history", "patterns": ["dynamics"]}'))
+        self.assertEqual(self.client.published, [])  # Only queued on paho's thread
+
+        publisher = TelemetryPublisher(TelemetryCache(self.manager)).start()
+        publisher.submit(None)  # Wakes the thread, which answers before stopping
+        publisher.thread.join(5.0)
+        reply = json.loads(self.client.published[0][1])
+        self.assertEqual(len(reply["series"]["dynamics.flw_speed"]["v"]), 50)
+
+    def test_since_and_patterns(self):
+        reply = self.request(patterns="dynamics.*", since=self.start + 4.75)
+        self.assertEqual(list(reply["series"]), ["dynamics.flw_speed"])
+        self.assertEqual(reply["series"]["dynamics.flw_speed"]["v"], [48.0, 49.0])
+        self.assertNotIn("error", reply)
+
+    def test_patterns_required(self):
+        self.assertEqual(self.request(seconds=5)["error"], "patterns required")
+
+    def test_oversized_reply_refused(self):
+        self.manager.history_max_bytes = 200
+        reply = self.request(patterns=["*"])
+        self.assertNotIn("series", reply)
+        self.assertIn("exceeds 200", reply["error"])
+
+
+class RecordingMQTTManager:
+    """Just enough of MQTTManager for TelemetryCache: records packets, failing when told to"""
+
+    batcher = None
+    last_publish_live = True
+    last_publish_buffered = False
+
+    def __init__(self):
+        self.packets = []
+        self.fail = False
+
+    def flush_batch(self):
+        return False
+
+    def get_packet_id(self):
+        return len(self.packets)
+
+    def publish(self, telemetry_data, protobuf_func):
+        if self.fail:
+            return False
+        self.packets.append(telemetry_data)
+        return True
+
+
+class TelemetryCacheWindowTest(unittest.TestCase):
+    def setUp(self):
+        self.store = SlotStore(FieldLayout([("pack.lv_v", None), ("diagnostics.cells_v", 2)]))
+        self.window = WindowAggregator(len(self.store.layout))
+        self.manager = RecordingMQTTManager()
+        self.cache = TelemetryCache(self.manager, store=self.store, window=self.window)
+
+    def sample(self, slot, value, timestamp):
+        self.store.set(slot, value, timestamp)
+        self.window.add(slot, value)
+
+    def test_stats_only_for_slots_sampled_more_than_once(self):
+        for i, value in enumerate((12.0, 12.6, 12.3)):
+            self.sample(0, value, 1.0 + i)
+        self.sample(2, 3.7, 1.0)
+        self.assertTrue(self.cache.publish_cached_data(5.0))
+        packet = self.manager.packets[0]
+        self.assertEqual(packet["fields"], {"pack.lv_v": 12.3})  # cells_v[0] is still unknown
+        self.assertEqual(len(packet["stats"]), 1)
+        field_name, index, count, minimum, maximum, mean = packet["stats"][0]
+        self.assertEqual((field_name, index, count, minimum, maximum), ("pack.lv_v", None, 3, 12.0, 12.6))
+        self.assertAlmostEqual(mean, 12.3)
+
+    def test_failed_window_merges_into_the_next(self):
+        self.sample(0, 12.0, 1.0)
+        self.sample(0, 14.0, 2.0)
+        self.manager.fail = True
+        self.assertFalse(self.cache.publish_cached_data(3.0))
+        self.manager.fail = False
+        self.sample(0, 11.0, 4.0)
+        self.assertTrue(self.cache.publish_cached_data(5.0))
+        self.assertEqual(self.manager.packets[0]["stats"], [("pack.lv_v", None, 3, 11.0, 14.0, 37.0 / 3)])
+
+        self.assertTrue(self.cache.publish_cached_data(6.0))  # Nothing new: no packet
+        self.assertEqual(len(self.manager.packets), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
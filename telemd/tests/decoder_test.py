@@ -0,0 +1,85 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.decoder import FrameDecoder, Signal, compile_decoders, process_can_data
+from core.field_mappings import CAN_DECODERS, CAN_MAPPING, CAN_SIGNALS
+from tests.baseline_can_mapping import CAN_MAPPING as BASELINE_CAN_MAPPING
+
+
+def _payloads(seed=1234, count=500):
+    """Random frames of every DLC plus all-zero / all-ones / sign-bit patterns."""
+    rng = random.Random(seed)
+    frames = []
+    for length in range(0, 9):
+        frames.append(bytes(length))
+        frames.append(b'\xff' * length)
+        frames.append(b'\x80' * length)
+        frames.append(b'\x7f' * length)
+    for _ in range(count):
+        length = rng.choice([8, 8, 8, 8, rng.randint(0, 8)])
+        frames.append(bytes(rng.getrandbits(8) for _ in range(length)))
+    return frames
+
+
+class DecoderParityTest(unittest.TestCase):
+    def assertSameValues(self, expected, actual, context):
+        self.assertEqual(len(expected), len(actual), context)
+        for exp, act in zip(expected, actual):
+            # Compare type as well so ints/floats don't silently diverge
+            self.assertEqual((type(exp), exp), (type(act), act), context)
+
+    def test_matches_baseline_mapping(self):
+        # The baseline's hand-written lambdas, not CAN_MAPPING (which is generated from CAN_SIGNALS)
+        self.assertEqual(set(CAN_DECODERS), set(BASELINE_CAN_MAPPING))
+        for can_id, mapping in BASELINE_CAN_MAPPING.items():
+            decoder = CAN_DECODERS[can_id]
+            names = tuple(name for name, _ in mapping)
+            self.assertEqual(decoder.names, names)
+            self.assertEqual(tuple(name for name, _ in CAN_MAPPING[can_id]), names)
+            for data in _payloads():
+                for payload in (data, bytearray(data)):
+                    expected = [converter(payload) for _, converter in mapping]
+                    context = f"0x{can_id:03X} {data.hex()}"
+                    self.assertSameValues(expected, decoder.decode(payload), context)
+                    self.assertSameValues(expected, [converter(payload) for _, converter in CAN_MAPPING[can_id]],
+                                          context)
+
+    def test_matches_process_can_data(self):
+        for can_id, signals in CAN_SIGNALS.items():
+            decoder = CAN_DECODERS[can_id]
+            for data in _payloads(seed=99):
+                expected = [
+                    process_can_data(data, s.start, s.end, signed=s.signed, scale=s.scale,
+                                     operation=s.operation, chunk_size=s.chunk_size)
+                    for s in signals
+                ]
+                self.assertSameValues(expected, decoder.decode(data), f"0x{can_id:03X} {data.hex()}")
+
+    def test_irregular_layouts_fall_back(self):
+        signals = [
+            Signal("three_bytes", 0, 3, signed=True, scale=0.5),
+            Signal("overlap", 2, 4, scale=0.1),
+            Signal("byte_mean", 4, 7, operation='mean'),
+            Signal("signed_min", 4, 8, signed=True, operation='min'),
+            Signal("chunk_max", 4, 8, operation='max', chunk_size=2),
+            Signal("bad_chunks", 0, 3, operation='mean', chunk_size=2),
+            Signal("unsigned_long", 0, 8, scale=1e-3),
+        ]
+        decoder = compile_decoders({0x123: signals})[0x123]
+        self.assertIsInstance(decoder, FrameDecoder)
+        for data in _payloads(seed=7):
+            for payload in (data, list(data)):
+                expected = [
+                    process_can_data(payload, s.start, s.end, signed=s.signed, scale=s.scale,
+                                     operation=s.operation, chunk_size=s.chunk_size)
+                    for s in signals
+                ]
+                self.assertSameValues(expected, decoder.decode(payload), data.hex())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import math
+import os
+import random
+import sys
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import core  # noqa: F401  (networking and core import each other; core has to load first)
+from core.value_store import build_field_layout
+from protobuf import generated as pb
+from protobuf.encoder import TelemetryEncoder
+
+
+def baseline_payload(telemetry_data, packet_id):
+    """The body of MQTTManager.publish at the baseline (e7fe022), kept verbatim up to SerializeToString"""
+    fields = telemetry_data.get('fields', {})
+
+    # Create protobuf message and populate with telemetry data
+    sensor_msg = pb.AngeliqueSensorData()
+    sensor_msg.time = int(telemetry_data.get('timestamp', time.time()) * 1000)
+    sensor_msg.packet_id = packet_id
+
+    # Set each field in the protobuf
+    for field_name, value in fields.items():
+        try:
+            # Navigate to the nested object and set the field
+            obj = sensor_msg
+            parts = field_name.split('.')
+            for part in parts[:-1]:
+                obj = getattr(obj, part)
+
+            field_name_on_obj = parts[-1]
+            field_descriptor = obj.DESCRIPTOR.fields_by_name[field_name_on_obj]
+            is_integer_field = field_descriptor.type in [
+                field_descriptor.TYPE_INT32, field_descriptor.TYPE_INT64,
+                field_descriptor.TYPE_UINT32, field_descriptor.TYPE_UINT64,
+                field_descriptor.TYPE_SINT32, field_descriptor.TYPE_SINT64,
+                field_descriptor.TYPE_FIXED32, field_descriptor.TYPE_FIXED64,
+                field_descriptor.TYPE_SFIXED32, field_descriptor.TYPE_SFIXED64
+            ]
+
+            if isinstance(value, list):
+                field = getattr(obj, field_name_on_obj)
+                if is_integer_field:
+                    field.extend([int(item) for item in value if item is not None])
+                else:
+                    field.extend([float(item) for item in value if item is not None])
+            else:
+                if is_integer_field:
+                    setattr(obj, field_name_on_obj, int(value))
+                else:
+                    setattr(obj, field_name_on_obj, float(value))
+
+        except Exception as e:
+            print(f"[WARN] Failed to set {field_name}: {e}")
+
+    # Serialize and publish
+    return sensor_msg.SerializeToString()
+
+
+def _snapshots(seed=2025, count=40):
+    """Snapshots shaped like TelemetryCache's: every layout field, a random subset set, some odd values"""
+    rng = random.Random(seed)
+    layout = build_field_layout()
+    snapshots = []
+    for _ in range(count):
+        fields = {}
+        for field_name, (_, size) in layout.fields.items():
+            if rng.random() < 0.3:
+                continue
+            if size is None:
+                fields[field_name] = rng.choice([rng.uniform(-500, 500), rng.randint(0, 255), True, 0.0])
+            else:
+                fields[field_name] = [rng.choice([None, rng.uniform(0, 5), rng.randint(0, 60)])
+                                      for _ in range(size)]
+        fields["pack.no_such_field"] = 1.0
+        fields["not_a_message.value"] = 2.0
+        fields[rng.choice(list(layout.fields))] = math.nan  # int() of NaN fails in both paths
+        snapshots.append(fields)
+    return snapshots
+
+
+class TelemetryEncoderParityTest(unittest.TestCase):
+    def test_matches_baseline_bytes(self):
+        encoder = TelemetryEncoder()  # One encoder for every packet, as MQTTManager keeps it
+        with redirect_stdout(StringIO()):
+            for packet_id, fields in enumerate(_snapshots()):
+                timestamp = 1760000000.0 + packet_id * 0.1
+                expected = baseline_payload({'timestamp': timestamp, 'fields': fields}, packet_id)
+                self.assertEqual(encoder.encode(fields, packet_id, timestamp), expected, packet_id)
+
+    def test_empty_snapshot(self):
+        encoder = TelemetryEncoder()
+        self.assertEqual(encoder.encode({}, 7, 1.5), baseline_payload({'timestamp': 1.5, 'fields': {}}, 7))
+
+    def test_unknown_fields_warn_once(self):
+        encoder = TelemetryEncoder()
+        output = StringIO()
+        with redirect_stdout(output):
+            for packet_id in range(3):
+                encoder.encode({"pack.no_such_field": 1.0}, packet_id, 1.0)
+        self.assertEqual(output.getvalue().count("pack.no_such_field"), 1)
+
+
+class FieldStatsTest(unittest.TestCase):
+    def test_stats_keyed_by_field_number(self):
+        encoder = TelemetryEncoder()
+        stats = [("pack.hv_pack_v", None, 12, 398.5, 401.25, 400.0),
+                 ("diagnostics.cells_v", 3, 2.0, 3.5, 3.75, 3.625),
+                 ("pack.no_such_field", None, 5, 0.0, 1.0, 0.5)]
+        with redirect_stdout(StringIO()):
+            message = pb.AngeliqueSensorData.FromString(encoder.encode({"pack.hv_pack_v": 400.5}, 3, 1.0, stats))
+
+        self.assertEqual(message.pack.hv_pack_v, 400.5)
+        pack = pb.AngeliqueSensorData.DESCRIPTOR.fields_by_name["pack"].message_type
+        diagnostics = pb.AngeliqueSensorData.DESCRIPTOR.fields_by_name["diagnostics"].message_type
+        self.assertEqual([(s.field, s.index, s.count, s.min, s.max, s.mean) for s in message.field_stats], [
+            (pack.fields_by_name["hv_pack_v"].number, 0, 12, 398.5, 401.25, 400.0),
+            (diagnostics.fields_by_name["cells_v"].number, 3, 2, 3.5, 3.75, 3.625),
+        ])
+
+        # The reused message doesn't carry stats into the next packet
+        message = pb.AngeliqueSensorData.FromString(encoder.encode({"pack.hv_pack_v": 400.5}, 4, 1.1))
+        self.assertEqual(len(message.field_stats), 0)
+
+    def test_field_numbers_are_unique(self):
+        numbers = []
+
+        def collect(descriptor):
+            for field in descriptor.fields:
+                numbers.append(field.number)
+                if field.message_type is not None and field.message_type is not descriptor:
+                    collect(field.message_type)
+        for field in pb.AngeliqueSensorData.DESCRIPTOR.fields:
+            if field.message_type is not None and field.name != "field_stats":
+                collect(field.message_type)
+        self.assertEqual(len(numbers), len(set(numbers)))
+
+
+if __name__ == '__main__':
+    unittest.main()
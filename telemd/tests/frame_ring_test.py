@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from interfaces.frame_ring import RING_WRITE_BATCH, FrameRing
+from interfaces.recorder import RawFrame
+
+CAPACITY = 4 * RING_WRITE_BATCH
+
+
+def _frames(first, count):
+    """Frames numbered by timestamp (n + 0.5; a zero timestamp means "now"), and in the payload"""
+    return [RawFrame(n + 0.5, 0x100 + n % 0x100, n.to_bytes(4, 'little')) for n in range(first, first + count)]
+
+
+def _numbers(frames):
+    for frame in frames:
+        number = int(frame.timestamp)
+        # A torn record would pair one frame's timestamp with another's data
+        assert int.from_bytes(frame.data, 'little') == number and frame.arbitration_id == 0x100 + number % 0x100
+    return [int(frame.timestamp) for frame in frames]
+
+
+class LappingRing(FrameRing):
+    """Ring whose writer races ahead while the reader is copying records out"""
+
+    def __init__(self, *args, **kwargs):
+        self.race = 0  # Frames the writer adds right after the next index check
+        super().__init__(*args, **kwargs)
+
+    def _published_index(self):
+        index = super()._published_index()
+        if self.race:
+            race, self.race = self.race, 0
+            self.write(_frames(self.write_index, race))
+        return index
+
+
+class FrameRingTest(unittest.TestCase):
+    def setUp(self):
+        self.ring = LappingRing(capacity=CAPACITY, create=True)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_round_trip(self):
+        self.ring.write(_frames(0, 700))
+        self.assertEqual(self.ring.pending(), 700)
+        self.assertEqual(_numbers(self.ring.read(512)), list(range(512)))
+        self.assertEqual(_numbers(self.ring.read(512)), list(range(512, 700)))
+        self.assertEqual(self.ring.read(), [])
+        self.assertEqual(self.ring.lost, 0)
+
+    def test_reader_lapped_before_reading(self):
+        self.ring.write(_frames(0, 3 * CAPACITY))
+        frames = self.ring.read(CAPACITY)
+        numbers = _numbers(frames)
+        # Only records the writer can't be rewriting are returned, newest last
+        self.assertEqual(numbers[-1], 3 * CAPACITY - 1)
+        self.assertEqual(numbers, list(range(numbers[0], 3 * CAPACITY)))
+        self.assertEqual(self.ring.lost, numbers[0])
+        self.assertEqual(self.ring.pending(), 0)
+
+    def test_reader_lapped_while_copying(self):
+        self.ring.write(_frames(0, CAPACITY - RING_WRITE_BATCH))
+        self.ring.race = 2 * RING_WRITE_BATCH  # Overwrites the oldest records mid-read
+        numbers = _numbers(self.ring.read(CAPACITY))
+        self.assertEqual(self.ring.lost, 2 * RING_WRITE_BATCH)
+        self.assertEqual(numbers, list(range(2 * RING_WRITE_BATCH, CAPACITY - RING_WRITE_BATCH)))
+        # The racing frames are still there for the next read
+        self.assertEqual(_numbers(self.ring.read(CAPACITY)),
+                         list(range(CAPACITY - RING_WRITE_BATCH, CAPACITY + RING_WRITE_BATCH)))
+
+
+if __name__ == '__main__':
+    unittest.main()
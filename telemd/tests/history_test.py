@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.history import MIN_CAPACITY, SlotHistory
+from core.value_store import FieldLayout
+
+
+def _history():
+    layout = FieldLayout([("dynamics.flw_speed", None), ("diagnostics.cells_v", 2), ("pack.lv_v", None)])
+    # dynamics: 10 Hz * 2 s * 1.5 = 30 samples; everything else the minimum
+    return SlotHistory(layout, seconds=2.0, rates={"dynamics.*": 10}, default_rate=1.0)
+
+
+class SlotHistoryTest(unittest.TestCase):
+    def test_sizes_rings_from_rates(self):
+        history = _history()
+        self.assertEqual(history.capacities, [30, MIN_CAPACITY, MIN_CAPACITY, MIN_CAPACITY])
+        self.assertEqual(history.nbytes(), 2 * 8 * (30 + 3 * MIN_CAPACITY))
+
+    def test_window(self):
+        history = _history()
+        times, values = history.window(0)
+        self.assertEqual(len(times), 0)
+        for i in range(10):
+            history.add(0, i * 2.0, 100.0 + i)
+        times, values = history.window(0)
+        self.assertEqual(list(times), [100.0 + i for i in range(10)])
+        self.assertEqual(list(values), [i * 2.0 for i in range(10)])
+        times, values = history.window(0, since=106.5)
+        self.assertEqual(list(times), [107.0, 108.0, 109.0])
+        self.assertEqual(list(values), [14.0, 16.0, 18.0])
+
+    def test_window_after_wrapping(self):
+        history = _history()
+        for i in range(75):
+            history.add(0, float(i), float(i))
+        times, values = history.window(0)
+        self.assertEqual(list(values), [float(i) for i in range(45, 75)])  # The newest 30, oldest first
+        times, values = history.window(0, since=70.0)
+        self.assertEqual(list(values), [71.0, 72.0, 73.0, 74.0])
+        self.assertEqual(history.window(0, since=74.0)[0].size, 0)
+
+    def test_views_until_copied(self):
+        history = _history()
+        for i in range(3):
+            history.add(0, float(i), float(i))
+        view, _ = history.window(0)
+        copied, _ = history.window(0, copy=True)
+        history.times[0] = -1.0  # As if the writer had wrapped around onto it
+        self.assertEqual(view[0], -1.0)
+        self.assertEqual(copied[0], 0.0)
+
+    def test_read_and_series(self):
+        history = _history()
+        history.add(history.layout.slot("diagnostics.cells_v", 1), 3.7, 5.0)
+        history.add(history.layout.slot("pack.lv_v"), 12.5, 6.0)
+        times, values = history.read("diagnostics.cells_v", 1)
+        self.assertEqual((list(times), list(values)), ([5.0], [3.7]))
+        self.assertIsNone(history.read("no.such_field"))
+        self.assertEqual(history.series(["diagnostics.cells_v", "pack.lv_v"]), {
+            "diagnostics.cells_v[1]": {"t": [5.0], "v": [3.7]},
+            "pack.lv_v": {"t": [6.0], "v": [12.5]},
+        })
+        self.assertEqual(history.series(["pack.lv_v"], since=6.0), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
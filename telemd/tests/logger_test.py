@@ -0,0 +1,179 @@
+import csv
+import math
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_logging.logger import BINARY_RECORD, BinaryLogReader, BinaryTimeSeriesLogger, CSVTimeSeriesLogger
+
+
+class _BrokenFile:
+    """Stands in for the CSV handle and fails every write"""
+
+    def write(self, data):
+        raise RuntimeError("disk gone")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class LoggerTestCase(unittest.TestCase):
+    """Runs each test in a temporary directory, since the loggers write to ./logs"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory(prefix="telemd-logger-")
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def csv_logger(self, **kwargs):
+        kwargs.setdefault("flush_interval", 60.0)  # Flushed by hand unless a test wants the thread
+        logger = CSVTimeSeriesLogger(**kwargs)
+        self.addCleanup(logger.shutdown)
+        return logger
+
+
+class CSVTimeSeriesLoggerTest(LoggerTestCase):
+    def test_round_trip(self):
+        logger = self.csv_logger()
+        logger.log_value("pack.hv_pack_v", 401.25, 100.0)
+        logger.log_value("pack.contactor_state", True, 100.0)
+        logger.log_value("diagnostics.cells_v", [3.7, 3.8], 100.5)
+        logger.log_value("vehicle.note", 'says "hi", twice', 101.0)
+        logger._flush_buffer()
+
+        with open(logger.filename, newline='') as csvfile:
+            rows = list(csv.reader(csvfile))
+        self.assertEqual(rows[0], CSVTimeSeriesLogger.FIELDNAMES)
+        self.assertEqual([(row[0], row[2], row[3]) for row in rows[1:]], [
+            ("100.0", "pack.hv_pack_v", "401.25"),
+            ("100.0", "pack.contactor_state", "True"),
+            ("100.5", "diagnostics.cells_v", "3.7,3.8"),
+            ("101.0", "vehicle.note", 'says "hi", twice'),
+        ])
+        self.assertEqual(logger.get_field_history("diagnostics.cells_v", 0.0, 200.0),
+                         [{'timestamp': 100.5, 'datetime': rows[3][1], 'value': "3.7,3.8"}])
+        self.assertEqual(logger.get_latest_values()["pack.hv_pack_v"]["value"], "401.25")
+
+    def test_writer_survives_a_failed_flush(self):
+        logger = self.csv_logger(flush_interval=0.01)
+        csvfile, logger.csvfile = logger.csvfile, _BrokenFile()
+        logger.log_value("pack.lv_v", 12.5, 1.0)
+        while not logger.write_errors:
+            time.sleep(0.01)
+        self.assertTrue(logger.writer_thread.is_alive())
+
+        logger.csvfile = csvfile
+        logger.log_value("pack.lv_v", 12.6, 2.0)
+        while logger.buffer:
+            time.sleep(0.01)
+        with logger.write_lock:  # Wait for the flush that emptied the buffer to finish
+            self.assertEqual([row['value'] for row in logger.get_field_history("pack.lv_v", 0.0, 10.0)], ["12.6"])
+
+    def test_drops_oldest_rows_when_the_writer_falls_behind(self):
+        logger = self.csv_logger(max_buffer=5)
+        for i in range(8):
+            logger.log_value("pack.lv_v", float(i), float(i))
+        self.assertEqual(logger.dropped_rows, 3)
+        logger._flush_buffer()
+        values = [row['value'] for row in logger.get_field_history("pack.lv_v", 0.0, 10.0)]
+        self.assertEqual(values, ["3.0", "4.0", "5.0", "6.0", "7.0"])
+
+
+class CSVTimeIndexTest(LoggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.logger = self.csv_logger(index_interval=0.5, index_rows=7)
+        for flush in range(10):  # Several flushes, so the index spans appended chunks
+            for i in range(40):
+                timestamp = flush * 4.0 + i * 0.1
+                self.logger.log_value(f"field_{i % 3}", 'x,y' if i % 11 == 0 else timestamp, timestamp)
+            self.logger._flush_buffer()
+
+    def full_scan(self, start_time, end_time):
+        with open(self.logger.filename, newline='') as csvfile:
+            rows = list(csv.reader(csvfile))[1:]
+        return [dict(zip(CSVTimeSeriesLogger.FIELDNAMES, [float(row[0])] + row[1:]))
+                for row in rows if start_time <= float(row[0]) <= end_time]
+
+    def test_index_query_matches_a_full_scan(self):
+        self.assertGreater(len(self.logger.index_times), 20)
+        for start_time, end_time in [(-1.0, 100.0), (0.0, 0.0), (3.95, 4.05), (7.3, 21.1), (39.0, 50.0),
+                                     (50.0, 60.0), (12.35, 12.35)]:
+            self.assertEqual(self.logger.get_time_range_data(start_time, end_time, max_rows=10 ** 6),
+                             self.full_scan(start_time, end_time), (start_time, end_time))
+
+    def test_max_rows(self):
+        self.assertEqual(self.logger.get_time_range_data(10.0, 30.0, max_rows=5), self.full_scan(10.0, 30.0)[:5])
+        history = self.logger.get_field_history("field_1", 10.0, 30.0, max_rows=3)
+        self.assertEqual([row['timestamp'] for row in history],
+                         [row['timestamp'] for row in self.full_scan(10.0, 30.0) if row['field'] == "field_1"][:3])
+
+
+class BinaryTimeSeriesLoggerTest(LoggerTestCase):
+    def test_round_trip(self):
+        logger = BinaryTimeSeriesLogger("session", flush_interval=60.0)
+        self.assertTrue(logger.log_value("pack.hv_pack_v", 400.5, 1.0))
+        self.assertTrue(logger.log_value("pack.contactor_state", True, 1.0))
+        self.assertFalse(logger.log_value("vehicle.note", "text", 1.0))
+        self.assertFalse(logger.log_rows([(2.0, "pack.hv_pack_v", 401), (2.0, "diagnostics.cells_v", [3.7])]))
+        self.assertTrue(logger.log_rows([(3.0, "pack.hv_pack_v", 402.25)]))
+        logger.shutdown()
+
+        reader = BinaryLogReader("session")
+        self.assertEqual(set(reader.fields()), {"pack.hv_pack_v", "pack.contactor_state"})
+        column = reader.column("pack.hv_pack_v")
+        self.assertEqual(column['timestamp'].tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(column['value'].tolist(), [400.5, 401.0, 402.25])
+        self.assertEqual(reader.window("pack.contactor_state")['value'].tolist(), [1.0])
+        self.assertEqual(reader.window("pack.hv_pack_v", 1.5, 3.0)['timestamp'].tolist(), [2.0, 3.0])
+        self.assertEqual(reader.statistics("pack.hv_pack_v", 2.0)['avg'], 401.625)
+        self.assertEqual(len(reader.column("no.such_field")), 0)
+
+    def test_file_names_stay_unique(self):
+        logger = BinaryTimeSeriesLogger("session")
+        logger.log_rows([(1.0, "a/b", 1.0), (1.0, "a_b", 2.0)])
+        logger.shutdown()
+        self.assertEqual(BinaryLogReader("session").fields(), {"a/b": "a_b.bin", "a_b": "a_b_1.bin"})
+
+    def test_values_beyond_float32_become_infinite(self):
+        logger = BinaryTimeSeriesLogger("session")
+        logger.log_rows([(1.0, "pack.lv_v", 1e39), (2.0, "pack.lv_v", -10 ** 400), (3.0, "pack.lv_v", 12.5)])
+        logger.log_value("pack.lv_v", 1e39, 4.0)
+        logger.shutdown()
+        self.assertEqual(logger.overflows, 3)
+        self.assertEqual(BinaryLogReader("session").column("pack.lv_v")['value'].tolist(),
+                         [math.inf, -math.inf, 12.5, math.inf])
+
+    def test_reader_ignores_a_partial_record(self):
+        logger = BinaryTimeSeriesLogger("session")
+        logger.log_rows([(1.0, "pack.lv_v", 12.5)])
+        logger.shutdown()
+        with open(os.path.join("session", "pack.lv_v.bin"), "ab") as column:
+            column.write(BINARY_RECORD.pack(2.0, 12.6)[:7])  # A write caught halfway
+        self.assertEqual(BinaryLogReader("session").column("pack.lv_v")['value'].tolist(), [12.5])
+
+    def test_csv_logger_answers_from_the_columns(self):
+        logger = self.csv_logger(binary=True)
+        logger.log_value("pack.hv_pack_v", 400.5, 100.0)
+        logger.log_value("vehicle.note", "text", 100.0)
+        logger._flush_buffer()
+        self.assertFalse(logger.binary_complete)  # The note only made it into the CSV
+        self.assertEqual(logger.get_field_history("pack.hv_pack_v", 0.0, 200.0)[0]['value'], 400.5)
+        self.assertEqual(logger.get_field_history("vehicle.note", 0.0, 200.0)[0]['value'], "text")
+        self.assertEqual([row['field'] for row in logger.get_time_range_data(0.0, 200.0)],
+                         ["pack.hv_pack_v", "vehicle.note"])
+
+
+if __name__ == '__main__':
+    unittest.main()
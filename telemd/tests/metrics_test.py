@@ -0,0 +1,88 @@
+import math
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.metrics import Histogram, MetricsRegistry, exponential_buckets
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets_and_quantiles(self):
+        histogram = Histogram("test_seconds", "Test", buckets=[1.0, 2.0, 4.0])
+        self.assertTrue(math.isnan(histogram.quantile(0.5)))
+        for value in (0.5, 1.5, 1.5, 3.0, 10.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual((histogram.count, histogram.sum), (5, 16.5))
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.75)  # Rank 2.5 of 5, halfway through (1, 2]
+        self.assertEqual(histogram.quantile(0.99), 4.0)  # Beyond the last bound
+
+    def test_rolling_window(self):
+        histogram = Histogram("test_seconds", "Test", buckets=[1.0, 2.0])
+        histogram.observe(0.5)
+        histogram.rotate()
+        histogram.observe(1.5)
+        self.assertEqual(histogram.quantile(0.0, histogram.counts), 0.0)
+        self.assertAlmostEqual(histogram.quantile(1.0), 2.0)
+        histogram.rotate()
+        self.assertAlmostEqual(histogram.quantile(0.0), 1.0)  # Only the 1.5 is left in the window
+        histogram.rotate()
+        self.assertTrue(math.isnan(histogram.quantile(0.5)))
+        self.assertEqual(histogram.count, 2)  # The cumulative counts keep everything
+
+    def test_observe_while_rotating(self):
+        histogram = Histogram("test_seconds", "Test")
+        stop = threading.Event()
+
+        def rotate():
+            while not stop.is_set():
+                histogram.rotate()
+        rotator = threading.Thread(target=rotate)
+        rotator.start()
+        try:
+            for _ in range(50000):
+                histogram.observe(1e-3)
+        finally:
+            stop.set()
+            rotator.join()
+        self.assertEqual(histogram.count, 50000)
+        self.assertEqual(sum(histogram.counts), 50000)
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def test_render(self):
+        registry = MetricsRegistry()
+        frames = registry.counter("test_frames_total", "Frames")
+        frames.inc(3)
+        registry.gauge("test_rate", "Rate per ID", lambda: {"0x100": 10.5}, label="id")
+        registry.gauge("test_broken", "Fails to read", lambda: 1 / 0)
+        histogram = registry.histogram("test_seconds", "Latency", exponential_buckets(0.001, 10, 2))
+        histogram.observe(0.005)
+        self.assertIs(registry.counter("test_frames_total", "Frames"), frames)  # Registered once
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE test_frames_total counter", lines)
+        self.assertIn("test_frames_total 3", lines)
+        self.assertIn('test_rate{id="0x100"} 10.5', lines)
+        self.assertIn("test_broken NaN", lines)
+        self.assertIn('test_seconds_bucket{le="0.001"} 0', lines)
+        self.assertIn('test_seconds_bucket{le="0.01"} 1', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn("test_seconds_count 1", lines)
+        recent = [line for line in lines if line.startswith('test_seconds_recent{quantile="0.5"}')]
+        self.assertAlmostEqual(float(recent[0].split()[1]), 0.0055)
+
+    def test_rotate(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "Latency")
+        histogram.observe(0.1)
+        registry.rotate()
+        registry.rotate()
+        self.assertTrue(math.isnan(histogram.quantile(0.5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import core  # noqa: F401  (networking and core import each other; core has to load first)
+from core.value_store import WindowAggregator
+from networking.client import TelemetrySnapshot
+from networking.publisher import TelemetryPublisher
+
+
+class BlockingCache:
+    """TelemetryCache stand-in whose publishes wait until released, like a hung broker"""
+
+    mqtt_manager = None
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.published = []
+
+    def publish_snapshot(self, snapshot):
+        self.release.wait(5.0)
+        self.published.append(snapshot)
+        return True
+
+
+def _snapshot(timestamp, *samples):
+    window = WindowAggregator(1)
+    for sample in samples:
+        window.add(0, sample)
+    return TelemetrySnapshot(timestamp, None, None, {"pack.lv_v": timestamp}, window.take())
+
+
+class TelemetryPublisherTest(unittest.TestCase):
+    def test_drops_oldest_and_keeps_its_samples(self):
+        publisher = TelemetryPublisher(BlockingCache(), max_queue=2)  # Not started: nothing drains the queue
+        for i in range(5):
+            publisher.submit(_snapshot(float(i), 10.0 * i))
+        self.assertEqual((publisher.submitted, publisher.dropped, publisher.max_depth), (5, 3, 2))
+
+        queued = [publisher.queue.get_nowait() for _ in range(2)]
+        self.assertEqual([snapshot.timestamp for snapshot in queued], [3.0, 4.0])
+        # The dropped snapshots' windows rode along with the ones that replaced them
+        self.assertEqual([snapshot.window.count[0] for snapshot in queued], [2, 3])
+        self.assertEqual(sum(snapshot.window.total[0] for snapshot in queued), 100.0)
+        self.assertEqual(queued[1].window.minimum[0], 0.0)  # The very first sample
+        self.assertEqual(queued[1].window.maximum[0], 40.0)
+
+    def test_submit_never_waits_for_the_broker(self):
+        cache = BlockingCache()
+        publisher = TelemetryPublisher(cache, max_queue=4).start()
+        start = time.perf_counter()
+        for i in range(100):
+            publisher.submit(_snapshot(float(i), 1.0))
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+        cache.release.set()
+        publisher.stop()
+        self.assertFalse(publisher.thread.is_alive())
+        self.assertEqual(publisher.published, len(cache.published))
+        self.assertEqual(cache.published[-1].timestamp, 99.0)
+        self.assertEqual(sum(snapshot.window.count[0] for snapshot in cache.published), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import can
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from interfaces.recorder import FRAME_RECORD, CANRecorder, CANReplay, read_frames
+
+MESSAGES = [
+    can.Message(timestamp=100.0, arbitration_id=0x376, data=bytes(range(8)), is_extended_id=False),
+    can.Message(timestamp=100.01, arbitration_id=0x18FF50E5, data=b'\x01\x02\x03', is_extended_id=True),
+    can.Message(timestamp=100.02, arbitration_id=0x20000080, data=b'', is_error_frame=True),
+    can.Message(timestamp=100.03, arbitration_id=0x100, dlc=4, is_remote_frame=True, is_extended_id=False),
+    can.Message(timestamp=100.04, arbitration_id=0x7FF, data=b'\xff' * 8, is_extended_id=False),
+]
+
+
+class RecorderReplayTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(prefix="telemd-recorder-")
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "capture.bin")
+        recorder = CANRecorder(self.path)
+        for msg in MESSAGES:
+            recorder.on_message_received(msg)
+        recorder.stop()
+        recorder.on_message_received(MESSAGES[0])  # Late frames after stop() are ignored
+        self.assertEqual(recorder.frame_count, len(MESSAGES))
+
+    def assertSameFrames(self, frames, messages):
+        self.assertEqual(len(frames), len(messages))
+        for frame, msg in zip(frames, messages):
+            self.assertEqual((frame.timestamp, frame.arbitration_id, frame.data, frame.is_extended_id,
+                              frame.is_error_frame, frame.is_remote_frame),
+                             (msg.timestamp, msg.arbitration_id, bytes(msg.data), msg.is_extended_id,
+                              msg.is_error_frame, msg.is_remote_frame))
+
+    def test_round_trip_with_torn_tail(self):
+        with open(self.path, "ab") as capture:
+            capture.write(FRAME_RECORD.pack(100.05, 0x123, 8, 0, bytes(8))[:FRAME_RECORD.size - 5])
+
+        self.assertSameFrames(list(read_frames(self.path)), MESSAGES)
+        self.assertSameFrames(list(read_frames(self.path, chunk_frames=2)), MESSAGES)  # Across chunk ends
+
+        replay = CANReplay(self.path, speed=0, batch_size=2)
+        batches = []
+        while not replay.finished:
+            batch = replay.recv(timeout=0)
+            if batch:
+                batches.append(batch)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertSameFrames([frame for batch in batches for frame in batch], MESSAGES)
+        self.assertEqual(replay.message_count, len(MESSAGES))
+
+    def test_loop_restarts_the_capture(self):
+        replay = CANReplay(self.path, speed=0, loop=True)
+        self.assertEqual(len(replay.recv()), len(MESSAGES))
+        self.assertSameFrames(replay.recv(), MESSAGES)
+        self.assertFalse(replay.finished)
+
+    def test_real_time_replay_waits_for_due_frames(self):
+        replay = CANReplay(self.path, speed=1.0)
+        self.assertEqual(len(replay.recv(timeout=0)), 1)  # Only the first frame is due straight away
+        self.assertIsNone(replay.recv(timeout=0))
+        rest = []
+        while len(rest) < len(MESSAGES) - 1:
+            rest.extend(replay.recv(timeout=0.01) or [])
+        self.assertSameFrames(rest, MESSAGES[1:])
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as capture:
+            capture.write(b"timestamp,id\n")
+        with self.assertRaises(ValueError):
+            list(read_frames(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
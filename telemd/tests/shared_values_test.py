@@ -0,0 +1,93 @@
+import math
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import shared_values
+from core.shared_values import SEQUENCE, SEQUENCE_OFFSET, SharedValueReader, SharedValueTable
+from core.value_store import FieldLayout, SlotStore
+
+
+def _scripted_sequence(script):
+    """Stand-in for SEQUENCE whose first reads return the scripted sequence numbers"""
+    script = list(script)
+    reads = []
+
+    def unpack_from(buffer, offset=0):
+        reads.append(offset)
+        return (script.pop(0),) if script else SEQUENCE.unpack_from(buffer, offset)
+    return mock.Mock(wraps=SEQUENCE, unpack_from=unpack_from), reads
+
+
+class SharedValuesTest(unittest.TestCase):
+    def setUp(self):
+        self.name = f"telemd_test_values_{os.getpid()}"
+        self.store = SlotStore(FieldLayout([("pack.hv_pack_v", None), ("diagnostics.cells_v", 2),
+                                            ("pack.lv_v", None)]))
+        self.table = SharedValueTable(self.store.layout, self.name)
+
+    def tearDown(self):
+        self.table.close()
+
+    def test_snapshot(self):
+        reader = SharedValueReader(self.name)
+        try:
+            self.assertEqual(reader.snapshot(), {})
+            self.store.update("pack.hv_pack_v", 401.5, timestamp=10.0)
+            self.store.update("diagnostics.cells_v", 3.7, index=1, timestamp=11.0)
+            self.table.publish(self.store.values, self.store.stamps)
+
+            self.assertEqual(reader.get("pack.hv_pack_v"), (401.5, 10.0))
+            values, stamps = reader.get("diagnostics.cells_v")
+            self.assertTrue(math.isnan(values[0]))
+            self.assertEqual((values[1], stamps), (3.7, [0.0, 11.0]))
+            self.assertEqual(set(reader.snapshot()), {"pack.hv_pack_v", "diagnostics.cells_v"})
+            self.assertEqual(list(reader.snapshot(["pack.*"])), ["pack.hv_pack_v"])
+            self.assertEqual(list(reader.snapshot(["pack"])), ["pack.hv_pack_v"])  # A bare category means all of it
+            self.assertEqual(reader.snapshot(["pac"]), {})
+            self.assertEqual(reader.sequence, self.table.sequence)
+            self.assertTrue(reader.is_current())
+        finally:
+            reader.close()
+
+    def test_retries_while_writer_is_copying(self):
+        self.store.update("pack.lv_v", 12.5, timestamp=1.0)
+        self.table.publish(self.store.values, self.store.stamps)
+        reader = SharedValueReader(self.name)
+        # Odd twice (mid-copy), then a publish lands between the two checks, then stable
+        sequence, reads = _scripted_sequence([3, 3, 2, 4])
+        try:
+            with mock.patch.object(shared_values, "SEQUENCE", sequence):
+                self.assertEqual(reader.get("pack.lv_v"), (12.5, 1.0))
+            self.assertEqual(len(reads), 6)
+            self.assertEqual(reader.sequence, self.table.sequence)
+        finally:
+            reader.close()
+
+    def test_gives_up_if_the_writer_never_finishes(self):
+        reader = SharedValueReader(self.name, retries=10)
+        try:
+            SEQUENCE.pack_into(self.table.shm.buf, SEQUENCE_OFFSET, self.table.sequence + 1)
+            with self.assertRaises(TimeoutError):
+                reader.read()
+            SEQUENCE.pack_into(self.table.shm.buf, SEQUENCE_OFFSET, self.table.sequence)
+            values, stamps = reader.read()
+            self.assertEqual(len(values), len(self.store.layout))
+        finally:
+            reader.close()
+
+    def test_closed_table(self):
+        reader = SharedValueReader(self.name)
+        self.table.close()
+        try:
+            self.assertFalse(reader.is_current())
+        finally:
+            reader.close()
+            self.table = SharedValueTable(self.store.layout, self.name)  # For tearDown
+
+
+if __name__ == '__main__':
+    unittest.main()
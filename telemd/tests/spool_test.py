@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import core  # noqa: F401  (networking and core import each other; core has to load first)
+from networking.spool import RECORD_HEADER, DiskSpool
+
+
+class DiskSpoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "spool")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fifo(self):
+        spool = DiskSpool(self.directory)
+        self.assertFalse(spool.has_backlog())
+        for i in range(5):
+            spool.append(b"packet %d" % i)
+        self.assertTrue(spool.has_backlog())
+
+        payloads, position = spool.peek(3)
+        self.assertEqual(payloads, [b"packet 0", b"packet 1", b"packet 2"])
+        self.assertEqual(spool.peek(3)[0], payloads)  # Nothing removed before commit
+        spool.commit(position, len(payloads))
+
+        payloads, position = spool.peek(10)
+        self.assertEqual(payloads, [b"packet 3", b"packet 4"])
+        spool.commit(position, len(payloads))
+        self.assertFalse(spool.has_backlog())
+        self.assertEqual(spool.sent, 5)
+        spool.close()
+
+    def test_resumes_at_cursor_after_crash(self):
+        spool = DiskSpool(self.directory)
+        for i in range(4):
+            spool.append(b"packet %d" % i)
+        payloads, position = spool.peek(2)
+        spool.commit(position, len(payloads))
+        spool.peek(1)  # Peeked but never committed, so sent again
+        spool.write_file.flush()  # Simulated crash: no close()
+
+        reopened = DiskSpool(self.directory)
+        reopened.append(b"packet 4")
+        self.assertEqual(reopened.peek(10)[0], [b"packet 2", b"packet 3", b"packet 4"])
+        reopened.close()
+        spool.close()
+
+    def test_torn_record_ends_its_segment(self):
+        spool = DiskSpool(self.directory)
+        spool.append(b"complete")
+        spool.close()
+        path = spool._path(spool.write_segment)
+        with open(path, "ab") as f:
+            f.write(RECORD_HEADER.pack(100, 0) + b"torn")
+
+        reopened = DiskSpool(self.directory)
+        reopened.append(b"after restart")
+        payloads, position = reopened.peek(10)
+        self.assertEqual(payloads, [b"complete", b"after restart"])
+        reopened.commit(position, len(payloads))
+        self.assertFalse(reopened.has_backlog())
+        reopened.close()
+
+    def test_drops_oldest_segment_over_limit(self):
+        spool = DiskSpool(self.directory, max_bytes=400, segment_bytes=100)
+        for i in range(40):
+            spool.append(b"%02d" % i + bytes(30))
+        self.assertLessEqual(spool.total_bytes, 400 + 100)
+        self.assertGreater(spool.dropped_bytes, 0)
+        payloads, _ = spool.peek(100)
+        self.assertEqual(payloads[-1][:2], b"39")
+        numbers = [int(payload[:2]) for payload in payloads]
+        self.assertEqual(numbers, list(range(numbers[0], 40)))  # Oldest dropped, order kept
+        spool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.triggers import (
+    FieldTrigger, FrameTrigger, TriggerEngine, above, below, changed, default_triggers, legs_opened,
+)
+from core.value_store import FieldLayout, SlotStore
+from interfaces.recorder import FRAME_FILE_MAGIC, FRAME_RECORD, RawFrame
+
+CONTACTOR_ID = 0x200
+CELLS_ID = 0x300
+SOURCES = {"pack.contactor_state": {CONTACTOR_ID}, "diagnostics.cells_v": {CELLS_ID}}
+
+
+class PredicateTest(unittest.TestCase):
+    def test_predicates(self):
+        self.assertFalse(changed(1, None))
+        self.assertTrue(changed(1, 0))
+        self.assertTrue(above(4.2)([4.1, 4.3], None))
+        self.assertFalse(above(4.2)([4.1, math.nan], None))
+        self.assertTrue(below(4.15)([4.1, math.nan], None))
+        self.assertFalse(below(4.15)([4.1, 4.16], None))
+        opened = legs_opened(2, 4)
+        self.assertFalse(opened(bytes([0, 0, 1, 0]), None))
+        self.assertTrue(opened(bytes([0, 0, 1, 0]), bytes([0, 0, 1, 1])))
+        self.assertFalse(opened(bytes([1, 0, 1, 1]), bytes([0, 1, 1, 1])))  # Outside the leg bytes
+
+    def test_shutdown_legs_off_by_default(self):
+        self.assertFalse(any(isinstance(trigger, FrameTrigger) for trigger in default_triggers()))
+        legs = [trigger for trigger in default_triggers(shutdown_legs=True) if isinstance(trigger, FrameTrigger)]
+        self.assertEqual(len(legs), 2)
+
+
+class TriggerEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.store = SlotStore(FieldLayout([("pack.contactor_state", None), ("diagnostics.cells_v", 3)]))
+        self.captures = []
+        triggers = [
+            FieldTrigger("contactor_change", "pack.contactor_state", changed),
+            FieldTrigger("cell_over_voltage", "diagnostics.cells_v", above(4.2), below(4.15)),
+        ]
+        self.engine = TriggerEngine(self.store, triggers, lambda name, data: self.captures.append((name, data)),
+                                    pre_seconds=1.0, post_seconds=1.0, max_frame_rate=100,
+                                    sources=SOURCES, cooldown=10.0)
+
+    def frame(self, timestamp, can_id, field_name, value, index=None):
+        msg = RawFrame(timestamp, can_id, bytes(8))
+        self.engine.record(msg)
+        self.store.update(field_name, value, index, timestamp)
+        self.engine.check(msg)
+
+    def cells(self, timestamp, *values):
+        for index, value in enumerate(values):
+            self.frame(timestamp, CELLS_ID, "diagnostics.cells_v", value, index)
+
+    def test_edge_triggered_with_hysteresis(self):
+        self.cells(1.0, 4.1, 4.1, 4.1)
+        self.assertEqual(self.engine.fired, 0)
+        self.cells(2.0, 4.1, 4.25, 4.1)
+        self.assertEqual(self.engine.fired, 1)
+        self.cells(3.0, 4.1, 4.25, 4.1)
+        self.cells(4.0, 4.1, 4.18, 4.1)  # Below the limit but not the clear level: stays active
+        self.assertTrue(self.engine.watchers[CELLS_ID][0].active)
+        self.cells(5.0, 4.1, 4.25, 4.1)
+        self.assertEqual((self.engine.fired, self.engine.suppressed), (1, 0))
+
+        self.cells(6.0, 4.1, 4.1, 4.1)  # Cleared, re-armed, but within the cooldown
+        self.cells(7.0, 4.1, 4.3, 4.1)
+        self.assertEqual((self.engine.fired, self.engine.suppressed), (1, 1))
+        self.cells(13.0, 4.1, 4.1, 4.1)
+        self.cells(14.0, 4.1, 4.3, 4.1)
+        self.assertEqual(self.engine.fired, 2)
+
+    def test_capture_window(self):
+        for i in range(50):
+            self.frame(i * 0.1, CONTACTOR_ID, "pack.contactor_state", 0)
+        self.frame(5.0, CONTACTOR_ID, "pack.contactor_state", 1)
+        self.assertEqual(self.engine.fired, 1)
+        for i in range(1, 15):
+            self.frame(5.0 + i * 0.1, CONTACTOR_ID, "pack.contactor_state", 1)
+
+        self.assertEqual(len(self.captures), 1)
+        name, data = self.captures[0]
+        self.assertTrue(name.startswith("fault_") and name.endswith("_contactor_change.bin"))
+        self.assertTrue(data.startswith(FRAME_FILE_MAGIC))
+        timestamps = [record[0] for record in FRAME_RECORD.iter_unpack(data[len(FRAME_FILE_MAGIC):])]
+        self.assertGreaterEqual(min(timestamps), 4.0)
+        self.assertLessEqual(max(timestamps), 6.0)
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(len(timestamps), 21)  # 4.0 to 6.0 at 10 Hz
+        self.assertIsNone(self.engine.capture)
+
+    def test_poll_finishes_a_capture_on_a_quiet_bus(self):
+        self.frame(1.0, CONTACTOR_ID, "pack.contactor_state", 0)
+        self.frame(1.1, CONTACTOR_ID, "pack.contactor_state", 1)
+        self.engine.poll(self.engine.capture.deadline - 0.5)
+        self.assertEqual(self.captures, [])
+        self.engine.poll(self.engine.capture.deadline)
+        self.assertEqual(len(self.captures), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.value_store import FieldLayout, SlotStore, WindowAggregator, field_matches, merge_windows
+from data_logging.logger import LatestValuesCache
+
+
+def _store():
+    return SlotStore(FieldLayout([("pack.hv_pack_v", None), ("diagnostics.cells_v", 3), ("pack.lv_v", None)]))
+
+
+class FieldLayoutTest(unittest.TestCase):
+    def test_slots(self):
+        layout = _store().layout
+        self.assertEqual(len(layout), 5)
+        self.assertEqual(layout.slot("pack.hv_pack_v"), 0)
+        self.assertEqual(layout.slot("diagnostics.cells_v", 2), 3)
+        self.assertIsNone(layout.slot("diagnostics.cells_v", 3))
+        self.assertEqual(layout.slot_names[1], "diagnostics.cells_v[0]")
+        self.assertEqual(layout.add("pack.hv_pack_v"), 0)  # Already laid out
+
+    def test_field_matches(self):
+        self.assertTrue(field_matches("thermal.cells_temp", ["thermal"]))
+        self.assertTrue(field_matches("dynamics.flw_speed", ["pack", "dynamics.*_speed"]))
+        self.assertFalse(field_matches("thermal_x.y", ["thermal"]))
+        self.assertFalse(field_matches("Pack.lv_v", ["pack"]))  # Case-sensitive
+        self.assertFalse(field_matches("pack.lv_v", []))
+
+
+class SlotStoreTest(unittest.TestCase):
+    def test_update_and_field(self):
+        store = _store()
+        self.assertIsNone(store.field("pack.hv_pack_v"))
+        self.assertTrue(store.update("pack.hv_pack_v", 401.5, timestamp=1.0))
+        self.assertTrue(store.update("diagnostics.cells_v", 3.7, index=1, timestamp=2.0))
+        self.assertFalse(store.update("diagnostics.cells_v", 3.7, index=3, timestamp=2.0))
+        self.assertFalse(store.update("unknown.field", 1.0))
+        self.assertEqual(store.field("pack.hv_pack_v"), (401.5, 1.0))
+        self.assertEqual(store.field("diagnostics.cells_v"), ([None, 3.7, None], 2.0))
+        self.assertTrue(math.isnan(store.values[store.layout.slot("pack.lv_v")]))
+
+    def test_fields_changed_since(self):
+        store = _store()
+        store.update("pack.hv_pack_v", 400.0, timestamp=1.0)
+        store.update("diagnostics.cells_v", [3.6, 3.7, 3.8], timestamp=1.0)
+        _, stamps = store.snapshot()
+        self.assertEqual(store.fields(changed_since=stamps), {})
+
+        store.update("diagnostics.cells_v", 3.9, index=2, timestamp=2.0)
+        store.update("pack.lv_v", 12.5, timestamp=2.0)
+        self.assertEqual(store.fields(changed_since=stamps), {
+            "diagnostics.cells_v": ([3.6, 3.7, 3.9], 2.0),
+            "pack.lv_v": (12.5, 2.0),
+        })
+
+    def test_fields_complete_only(self):
+        store = _store()
+        store.update("diagnostics.cells_v", 3.7, index=0, timestamp=1.0)
+        self.assertIn("diagnostics.cells_v", store.fields())
+        self.assertNotIn("diagnostics.cells_v", store.fields(complete_only=True))
+
+    def test_snapshot_is_a_copy(self):
+        store = _store()
+        store.update("pack.hv_pack_v", 400.0, timestamp=1.0)
+        values, stamps = store.snapshot()
+        store.update("pack.hv_pack_v", 410.0, timestamp=2.0)
+        self.assertEqual((values[0], stamps[0]), (400.0, 1.0))
+
+
+class WindowAggregatorTest(unittest.TestCase):
+    def test_take_and_merge(self):
+        window = WindowAggregator(2)
+        for value in (3.0, 1.0, 2.0, math.nan):
+            window.add(0, value)
+        first = window.take()
+        self.assertEqual((first.count[0], first.minimum[0], first.maximum[0], first.total[0]), (3, 1.0, 3.0, 6.0))
+        self.assertEqual(first.count[1], 0)
+        self.assertEqual(window.take().count[0], 0)  # take() started a fresh window
+
+        window.add(0, 5.0)
+        window.add(1, -1.0)
+        merged = merge_windows(first, window.take())
+        self.assertEqual(list(merged.count), [4.0, 1.0])
+        self.assertEqual(list(merged.minimum), [1.0, -1.0])
+        self.assertEqual(list(merged.maximum), [5.0, -1.0])
+        self.assertEqual(list(merged.total), [11.0, -1.0])
+
+
+class LatestValuesCacheTest(unittest.TestCase):
+    def test_store_first_dict_for_the_rest(self):
+        cache = LatestValuesCache(_store())
+        cache.update_value("diagnostics.cells_v", 3.7, index=2, size=3, timestamp=1.0)
+        cache.update_value("vehicle.gear", "D", timestamp=2.0)  # Not in the layout
+        cache.update_value("vehicle.wheels", 1.0, index=1, size=4, timestamp=3.0)
+        self.assertEqual(cache.latest_values, {"vehicle.gear": ("D", 2.0),
+                                               "vehicle.wheels": ([None, 1.0, None, None], 3.0)})
+        self.assertEqual(cache.get_field_value("diagnostics.cells_v"), [None, None, 3.7])
+        self.assertEqual(cache.get_field_timestamp("vehicle.gear"), 2.0)
+        self.assertIsNone(cache.get_field_value("pack.lv_v"))
+        self.assertEqual(set(cache.get_latest_values()), {"diagnostics.cells_v", "vehicle.gear", "vehicle.wheels"})
+
+
+if __name__ == '__main__':
+    unittest.main()